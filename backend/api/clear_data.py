@@ -1,6 +1,8 @@
 from fastapi import APIRouter, Depends, HTTPException
 from auth import get_current_user
-from db.duck import execute_update
+from db.duck import execute_update, transaction
+from services.rules_engine import invalidate_rule_cache
+from services.result_cache import bump_data_version
 from typing import Dict, Any
 
 router = APIRouter()
@@ -21,12 +23,16 @@ async def clear_user_data(current_user: dict = Depends(get_current_user)) -> Dic
     ]
     
     cleared = {}
-    for table, user_column in tables_to_clear:
-        count = execute_update(
-            f"DELETE FROM {table} WHERE {user_column} = ?",
-            [user_id]
-        )
-        cleared[table] = count
+    # All or nothing: a failed delete must not leave half the user's data behind
+    with transaction() as conn:
+        for table, user_column in tables_to_clear:
+            count = execute_update(
+                f"DELETE FROM {table} WHERE {user_column} = ?",
+                [user_id], conn=conn
+            )
+            cleared[table] = count
+    invalidate_rule_cache()
+    bump_data_version()
     
     return {
         "message": "All data cleared successfully",
@@ -1,14 +1,117 @@
 from fastapi import APIRouter, HTTPException, Depends
 from models.dto import ImportCommitRequest, ImportCommitResponse
-from services.rules_engine import apply_rules
-from services.rollup import rebuild_rollup_monthly, get_uncategorized_count
-from db.duck import get_conn, execute_update
+from services.rules_engine import apply_rules, categorize_sql, resolve_overrides_sql
+from services.rollup import mark_rollup_dirty, refresh_dirty_rollups, get_uncategorized_count
+from services.result_cache import bump_data_version
+from services.metrics import commit_stage_duration
+from services.transfers import auto_confirm_transfers
+from db.duck import get_conn, iter_record_batches, transaction
 from auth import get_current_user
+from config import settings
+from logger import logger
+import hashlib
+import pandas as pd
 import uuid
-from typing import List, Dict, Any
+from datetime import date
+from typing import List, Dict, Any, Set, Tuple
 
 router = APIRouter()
 
+DERIVED_COLUMNS = ['raw_id', 'ts', 'account_id', 'account_label', 'description', 'merchant',
+                   'category', 'subcategory', 'amount', 'currency', 'balance', 'is_transfer',
+                   'source_file', 'import_batch_id']
+
+def _derive_with_sql(conn, raw_query: str, params: List[Any]) -> Tuple[str, List[Any]]:
+    """Derived rows as one query over the raw rows: they never leave DuckDB."""
+    return categorize_sql(raw_query, conn=conn), params
+
+def _derive_with_python(conn, raw_query: str, params: List[Any]) -> Tuple[str, List[Any]]:
+    """Categorize with apply_rules; the derived batch is exposed to SQL as a view.
+
+    Raw rows are streamed in Arrow record batches and turned into dicts one
+    batch at a time, so a large import never holds all of them as Python objects.
+    """
+    derived_chunks = []
+    for batch in iter_record_batches(raw_query, params):
+        # Apply rules to generate derived transactions
+        derived_transactions = apply_rules(batch.to_pylist())
+        derived_chunks.append(pd.DataFrame({column: [d.get(column) for d in derived_transactions]
+                                            for column in DERIVED_COLUMNS}))
+    
+    derived_batch = (pd.concat(derived_chunks, ignore_index=True) if derived_chunks
+                     else pd.DataFrame(columns=DERIVED_COLUMNS))
+    for column in ('raw_id', 'import_batch_id'):
+        derived_batch[column] = derived_batch[column].astype(str)
+    conn.register("derived_batch", derived_batch)
+    return "SELECT * REPLACE (raw_id::UUID AS raw_id, import_batch_id::UUID AS import_batch_id) FROM derived_batch", []
+
+def derived_txn_id(raw_id: Any) -> uuid.UUID:
+    """Deterministic derived transaction id for a raw row (see DERIVED_ID_SQL)."""
+    return uuid.UUID(hashlib.md5(f"txn:{raw_id}".encode()).hexdigest())
+
+# SQL equivalent of derived_txn_id: recommits produce the same ids
+DERIVED_ID_SQL = "md5('txn:' || raw_id::VARCHAR)::UUID"
+
+def _write_derived(conn, derived_query: str, params: List[Any], user_id: str,
+                   scope_query: str, scope_params: List[Any]) -> Tuple[int, int]:
+    """Merge the derived rows into transactions. Returns (rows, categorized).
+
+    Only rows whose fields changed are written. scope_query selects the ids of
+    the existing derived rows this commit replaces; those no longer derived are
+    deleted.
+    """
+    try:
+        conn.execute(f"""
+            CREATE OR REPLACE TEMP TABLE derived_commit AS
+            SELECT COALESCE(txn_id, {DERIVED_ID_SQL}) AS id, * EXCLUDE (txn_id),
+                   DATE_TRUNC('month', ts)::DATE AS month
+            FROM ({resolve_overrides_sql(derived_query)})
+        """, params)
+    finally:
+        conn.unregister("derived_batch")  # registered by _derive_with_python
+    
+    # Rows carrying overrides stay: the override FK references them
+    deleted = conn.execute(f"""
+        DELETE FROM transactions
+        WHERE id IN ({scope_query})
+          AND id NOT IN (SELECT id FROM derived_commit)
+          AND id NOT IN (SELECT txn_id FROM txn_overrides)
+    """, scope_params).fetchone()[0]
+    
+    columns = ', '.join(DERIVED_COLUMNS + ['month'])
+    # raw_id/import_batch_id never change for an id and, as foreign keys, would
+    # turn the update into a delete + insert that the override FK rejects
+    refreshed = [c for c in DERIVED_COLUMNS + ['month'] if c not in ('raw_id', 'import_batch_id')]
+    # New rows go in (user_id, month, account_id) order so row groups stay month-clustered
+    written = conn.execute(f"""
+        INSERT INTO transactions (id, {columns}, user_id)
+        SELECT id, {columns}, ?
+        FROM derived_commit
+        ORDER BY month, account_id
+        ON CONFLICT (id) DO UPDATE
+        SET {', '.join(f'{c} = EXCLUDED.{c}' for c in refreshed)}
+        WHERE {' OR '.join(f'transactions.{c} IS DISTINCT FROM EXCLUDED.{c}' for c in refreshed)}
+    """, [user_id]).fetchone()[0]
+    
+    # Count rules applied (approximate based on categorized transactions)
+    derived, rules_applied = conn.execute("""
+        SELECT COUNT(*), COUNT(*) FILTER (WHERE category IS NOT NULL AND category <> '')
+        FROM derived_commit
+    """).fetchone()
+    conn.execute("DROP TABLE derived_commit")
+    
+    logger.info("derived_transactions_merged", derived=derived, written=written, deleted=deleted)
+    return derived, rules_applied
+
+def _rollup_cells(conn, scope_query: str, params: List[Any]) -> Set[Tuple[str, date]]:
+    """(account_id, month) rollup cells of the derived rows selected by scope_query."""
+    rows = conn.execute(f"""
+        SELECT DISTINCT account_id, month
+        FROM transactions
+        WHERE id IN ({scope_query})
+    """, params).fetchall()
+    return set(rows)
+
 @router.post("/api/import/commit", response_model=ImportCommitResponse)
 async def commit_import(
     request: ImportCommitRequest,
@@ -18,18 +121,34 @@ async def commit_import(
     Commit imported raw data by applying rules and building derived transactions.
     
     This endpoint:
-    1. Gets raw transactions for the period
+    1. Gets raw transactions for the period (or only the given import batches)
     2. Applies category rules in priority order
     3. Builds derived transactions table
-    4. Rebuilds materialized rollups
+    4. Optionally confirms confident transfers touching the committed rows
+       (detect_transfers, defaulting to AUTO_TRANSFERS)
+    5. Rebuilds the affected (account, month) cells of the materialized rollups
     """
     
     try:
         conn = get_conn()
+        batch_ids = request.import_batch_ids or []
+        
+        if batch_ids:
+            # Import-batch-scoped commit: derive only these imports' rows
+            batches_sql = f"SELECT id FROM imports WHERE id IN ({','.join(['?' for _ in batch_ids])})"
+            batches_params = list(batch_ids)
+        elif not request.period_month:
+            raise HTTPException(status_code=400, detail="period_month or import_batch_ids is required")
         
         # Convert period_month string to date
         from datetime import datetime
-        if isinstance(request.period_month, str):
+        if not request.period_month:
+            # Period of the committed batches
+            period_month = conn.execute(f"SELECT MIN(period_month) FROM imports WHERE id IN ({batches_sql})",
+                                        batches_params).fetchone()[0]
+            if period_month is None:
+                raise HTTPException(status_code=404, detail="Import batches not found")
+        elif isinstance(request.period_month, str):
             # Handle both "2025-07" and "2025-07-01" formats
             if len(request.period_month) == 7:  # YYYY-MM format
                 period_month = datetime.strptime(request.period_month + "-01", "%Y-%m-%d").date()
@@ -38,17 +157,21 @@ async def commit_import(
         else:
             period_month = request.period_month
         
+        if not batch_ids:
+            batches_sql = "SELECT id FROM imports WHERE period_month = ?"
+            batches_params = [period_month]
+        
         # Get accounts to process
         if request.accounts:
             accounts_filter = f"AND bank IN ({','.join(['?' for _ in request.accounts])})"
             accounts_params = request.accounts
         else:
-            # Get all banks for the period
-            accounts_result = conn.execute("""
+            # Get all banks for the period (or batches)
+            accounts_result = conn.execute(f"""
                 SELECT DISTINCT bank 
                 FROM imports 
-                WHERE period_month = ?
-            """, [period_month]).fetchall()
+                WHERE id IN ({batches_sql})
+            """, batches_params).fetchall()
             
             accounts_params = [row[0] for row in accounts_result]
             accounts_filter = f"AND bank IN ({','.join(['?' for _ in accounts_params])})" if accounts_params else ""
@@ -59,74 +182,64 @@ async def commit_import(
                amount_raw, amount, currency, account_label, extra
         FROM transactions_raw
         WHERE import_batch_id IN (
-            SELECT id FROM imports 
-            WHERE period_month = ?
+            {batches_sql}
         ) {accounts_filter}
         """
         
-        params = [period_month] + accounts_params
-        raw_result = conn.execute(raw_query, params).fetchall()
+        params = batches_params + accounts_params
+        raw_count = conn.execute(f"SELECT COUNT(*) FROM ({raw_query})", params).fetchone()[0]
         
-        if not raw_result:
+        if not raw_count:
             raise HTTPException(status_code=404, detail=f"No raw transactions found for period {period_month}")
         
-        # Convert to dict format for rules engine
-        raw_transactions = []
-        columns = ['id', 'import_batch_id', 'bank', 'ts', 'description', 'merchant',
-                  'amount_raw', 'amount', 'currency', 'account_label', 'extra']
-        
-        for row in raw_result:
-            raw_txn = dict(zip(columns, row))
-            raw_transactions.append(raw_txn)
-        
-        # Apply rules to generate derived transactions
-        derived_transactions = apply_rules(raw_transactions)
-        
-        # Clear existing derived transactions for this period
-        execute_update("""
-            DELETE FROM transactions 
+        # Merge the derived transactions in one transaction: stale rows are
+        # deleted and changed rows written together or not at all
+        account_filter = accounts_filter.replace("bank IN", "account_id IN")
+        scope_query = f"""
+            SELECT id FROM transactions
             WHERE import_batch_id IN (
-                SELECT id FROM imports WHERE period_month = ?
-            )
-        """, [period_month])
-        
-        # Insert derived transactions
-        transactions_inserted = 0
-        for derived in derived_transactions:
-            txn_id = str(uuid.uuid4())
+                {batches_sql}
+            ) {account_filter}
+        """
+        if settings.rules_engine != "python":
+            # Compiled before BEGIN: a regex rule RE2 rejects registers a Python
+            # function, which DuckDB refuses inside (or hides from) a transaction
+            with commit_stage_duration.time(stage="derive"):
+                derived_query, derived_params = _derive_with_sql(conn, raw_query, params)
+        with commit_stage_duration.time(stage="transaction"), transaction() as conn:
+            cells_before = _rollup_cells(conn, scope_query, params)
             
-            execute_update("""
-                INSERT INTO transactions (
-                    id, raw_id, ts, account_id, account_label, description, merchant,
-                    category, subcategory, amount, currency, balance, is_transfer,
-                    source_file, import_batch_id, user_id
-                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """, [
-                txn_id,
-                derived['raw_id'],
-                derived['ts'],
-                derived['account_id'],
-                derived['account_label'],
-                derived['description'],
-                derived['merchant'],
-                derived['category'],
-                derived['subcategory'],
-                derived['amount'],
-                derived['currency'],
-                derived.get('balance'),
-                derived['is_transfer'],
-                derived['source_file'],
-                derived['import_batch_id'],
-                current_user['id']
-            ])
+            # Apply rules, then overrides, and merge derived transactions
+            if settings.rules_engine == "python":
+                with commit_stage_duration.time(stage="derive"):
+                    derived_query, derived_params = _derive_with_python(conn, raw_query, params)
+            with commit_stage_duration.time(stage="write"):
+                transactions_inserted, rules_applied = _write_derived(
+                    conn, derived_query, derived_params, current_user['id'], scope_query, params
+                )
             
-            transactions_inserted += 1
-        
-        # Rebuild rollups for the month
-        rollup_result = rebuild_rollup_monthly(period_month, current_user['id'], accounts_params)
+            cells = cells_before | _rollup_cells(conn, scope_query, params)
+            if not batch_ids:
+                cells |= {(account, period_month) for account in accounts_params}
+            # Marked in the same transaction: a failed rebuild below is
+            # repaired by the next P&L read
+            mark_rollup_dirty(cells, conn=conn)
+            
+            # Match the committed rows against unmatched rows within the window;
+            # the other leg may be in an account this commit didn't touch
+            transfers_confirmed = 0
+            detect_transfers = (settings.auto_transfers if request.detect_transfers is None
+                                else request.detect_transfers)
+            if detect_transfers:
+                with commit_stage_duration.time(stage="transfers"):
+                    transfers_confirmed, transfer_cells = auto_confirm_transfers(conn, scope_query, params)
+                cells |= transfer_cells
+                logger.info("transfers_auto_confirmed", pairs=transfers_confirmed)
+        bump_data_version()
         
-        # Count rules applied (approximate based on categorized transactions)
-        rules_applied = sum(1 for t in derived_transactions if t['category'])
+        # Rebuild only the (account, month) rollup cells the commit touched
+        with commit_stage_duration.time(stage="rollup"):
+            refresh_dirty_rollups(accounts=sorted({account for account, _ in cells} | set(accounts_params)))
         
         # Get uncategorized count
         uncategorized = get_uncategorized_count(period_month, accounts_params)
@@ -137,9 +250,12 @@ async def commit_import(
             transactions_derived=transactions_inserted,
             rules_applied=rules_applied,
             rollup_updated=True,
-            uncategorized_count=uncategorized
+            uncategorized_count=uncategorized,
+            transfers_confirmed=transfers_confirmed
         )
         
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"Import commit error: {e}")
         raise HTTPException(status_code=500, detail=f"Error committing import: {str(e)}")
\ No newline at end of file
@@ -0,0 +1,14 @@
+# backend/api/metrics.py
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+from services.metrics import render_metrics
+
+router = APIRouter()
+
+# Prometheus text exposition format
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+@router.get("/api/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Process metrics for Prometheus scraping (requests, queries, imports, caches, DuckDB memory)."""
+    return PlainTextResponse(render_metrics(), media_type=CONTENT_TYPE)
@@ -1,44 +1,132 @@
 # backend/api/pl.py
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Header, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
 from pydantic import BaseModel, Field
-from typing import List, Optional, Dict, Any
-from datetime import date
-from services.rollup import rebuild_rollup_monthly, get_rollup_summary
+from typing import Callable, Hashable, List, Literal, Optional, Dict, Any, Tuple
+from datetime import date, datetime
+from services.rollup import refresh_dirty_rollups, get_rollup_summary, get_period_summary, period_bounds, add_months
+from services.result_cache import LRUCache, etag_matches, get_data_version
+from services.metrics import register_cache
 from db.duck import execute_query
 from etl.common import detect_period
+from config import settings
 
 router = APIRouter()
 
+# Responses keyed on (data version, endpoint, its parameters); any committed
+# write bumps the version, so stale entries are never looked up again and age out
+_summary_cache = LRUCache(settings.pl_cache_size)
+register_cache("pl_summary", lambda: _summary_cache.stats())
+
 class PLSummaryIn(BaseModel):
     month: str = Field(..., description="YYYY-MM")
     accounts: Optional[List[str]] = None  # ['BNP','Boursorama','Revolut']
     exclude_transfers: bool = True  # already excluded in rollup for MVP
     currency_view: str = "native"   # placeholder
 
+class PLPeriodIn(BaseModel):
+    grain: Literal['week', 'quarter', 'year', 'ttm']
+    date: str = Field(..., description="YYYY-MM-DD or YYYY-MM inside the period (ttm: its last month)")
+    accounts: Optional[List[str]] = None
+    currency_view: str = "native"   # placeholder
+
+class PLRangeIn(BaseModel):
+    start: str = Field(..., description="YYYY-MM")
+    end: str = Field(..., description="YYYY-MM")
+    accounts: Optional[List[str]] = None
+    currency_view: str = "native"   # placeholder
+
+# Widest month range /api/pl/range accepts (the matrix is dense)
+MAX_RANGE_MONTHS = 120
+
+class PLSeriesIn(BaseModel):
+    grain: Literal['month', 'week', 'quarter', 'year', 'ttm']
+    start: str = Field(..., description="YYYY-MM-DD or YYYY-MM")
+    end: str = Field(..., description="YYYY-MM-DD or YYYY-MM")
+    accounts: Optional[List[str]] = None
+    currency_view: str = "native"   # placeholder
+
+def _parse_day(value: str) -> date:
+    try:
+        return datetime.strptime(value.strip(), "%Y-%m-%d").date()
+    except ValueError:
+        pass
+    try:
+        return detect_period(value)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+def _cached_response(key: Tuple[Hashable, ...], build: Callable[[], Dict[str, Any]],
+                     if_none_match: Optional[str]) -> Response:
+    """Serve build() through the result cache, with ETag / 304 revalidation."""
+    key = (get_data_version(), *key)
+    cached = _summary_cache.get(key)
+    if cached is None:
+        payload = jsonable_encoder(build())
+        etag = _summary_cache.put(key, payload)
+    else:
+        payload, etag = cached
+
+    # no-cache: clients may keep the body but must revalidate with If-None-Match
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+    return JSONResponse(payload, headers=headers)
+
 @router.post("/api/pl/summary")
-def pl_summary(req: PLSummaryIn) -> Dict[str, Any]:
+def pl_summary(req: PLSummaryIn, if_none_match: Optional[str] = Header(default=None)) -> Response:
     month = detect_period(req.month)
+    accounts = sorted(set(req.accounts)) if req.accounts else None
 
-    # Ensure rollup exists (idempotent; cheap)
-    rebuild_rollup_monthly(month, req.accounts)
+    # Pure read unless a requested cell was marked dirty by a write (which bumps the version)
+    refresh_dirty_rollups(month, accounts)
 
-    acc_sql = ""
-    params = [month]
-    if req.accounts:
-        acc_sql = "AND account_id IN (" + ",".join("?"*len(req.accounts)) + ")"
-        params += req.accounts
+    key = ("summary", month, tuple(accounts or ()), req.currency_view, req.exclude_transfers)
+    return _cached_response(key, lambda: build_pl_summary(month, accounts), if_none_match)
 
-    rows = execute_query(f"""
-        SELECT account_id, category, subcategory, SUM(income), SUM(expense), SUM(net)
-        FROM rollup_monthly
-        WHERE month = ?
-          {acc_sql if req.accounts else ""}
-        GROUP BY 1,2,3
-        ORDER BY category, subcategory;
-    """, params)
+@router.post("/api/pl/period")
+def pl_period(req: PLPeriodIn, if_none_match: Optional[str] = Header(default=None)) -> Response:
+    """Week / quarter / year / trailing-12 P&L, read from the materialized rollup_period tier."""
+    start, _ = period_bounds(req.grain, _parse_day(req.date))
+    accounts = sorted(set(req.accounts)) if req.accounts else None
+    refresh_dirty_rollups(accounts=accounts)
+
+    key = ("period", req.grain, start, tuple(accounts or ()), req.currency_view)
+    return _cached_response(key, lambda: build_pl_period(req.grain, start, accounts), if_none_match)
+
+@router.post("/api/pl/series")
+def pl_series(req: PLSeriesIn, if_none_match: Optional[str] = Header(default=None)) -> Response:
+    """Income / expense / net per period of one grain between two dates."""
+    first, last = _parse_day(req.start), _parse_day(req.end)
+    if req.grain == 'month':
+        first, last = detect_period(first), detect_period(last)
+    else:
+        first, last = period_bounds(req.grain, first)[0], period_bounds(req.grain, last)[0]
+    accounts = sorted(set(req.accounts)) if req.accounts else None
+    refresh_dirty_rollups(accounts=accounts)
 
+    key = ("series", req.grain, first, last, tuple(accounts or ()), req.currency_view)
+    return _cached_response(key, lambda: build_pl_series(req.grain, first, last, accounts), if_none_match)
+
+@router.post("/api/pl/range")
+def pl_range(req: PLRangeIn, if_none_match: Optional[str] = Header(default=None)) -> Response:
+    """Category x subcategory x month P&L matrix with totals and MoM deltas, in one query."""
+    first, last = _parse_day(req.start), _parse_day(req.end)
+    first, last = detect_period(first), detect_period(last)
+    n_months = (last.year - first.year) * 12 + last.month - first.month + 1
+    if not 1 <= n_months <= MAX_RANGE_MONTHS:
+        raise HTTPException(status_code=400, detail=f"Range must cover 1 to {MAX_RANGE_MONTHS} months")
+    accounts = sorted(set(req.accounts)) if req.accounts else None
+    refresh_dirty_rollups(accounts=accounts)
+
+    key = ("range", first, last, tuple(accounts or ()), req.currency_view)
+    return _cached_response(key, lambda: build_pl_range(first, last, accounts), if_none_match)
+
+def _category_rows(rows: List[Tuple[Any, ...]]) -> List[Dict[str, Any]]:
+    """Group (category, subcategory, net) rows into the nested shape the frontend renders."""
     by_category: Dict[str, Dict[str, Any]] = {}
-    for acct, cat, sub, inc, exp, net in rows:
+    for cat, sub, net in rows:
         cat = cat or "Uncategorized"
         sub = sub or ""
         if cat not in by_category:
@@ -48,16 +136,209 @@ def pl_summary(req: PLSummaryIn) -> Dict[str, Any]:
             by_category[cat]["subcategory"][sub] = 0.0
         by_category[cat]["subcategory"][sub] += float(net or 0.0)
 
-    summary = get_rollup_summary(month, req.accounts)
     # Convert subcategory maps to arrays for frontend
     cat_rows = []
     for cat, data in by_category.items():
         subs = [{"name": s, "net": round(v, 2)} for s, v in sorted(data["subcategory"].items())]
         cat_rows.append({"category": cat, "net": round(data["total"], 2), "subs": subs})
     cat_rows.sort(key=lambda r: r["category"])
+    return cat_rows
+
+def build_pl_summary(month: date, accounts: Optional[List[str]] = None) -> Dict[str, Any]:
+    """Category/subcategory P&L of one month from rollup_monthly."""
+    acc_sql = ""
+    params = [month]
+    if accounts:
+        acc_sql = "AND account_id IN (" + ",".join("?"*len(accounts)) + ")"
+        params += accounts
+
+    rows = execute_query(f"""
+        SELECT category, subcategory, SUM(net)
+        FROM rollup_monthly
+        WHERE month = ?
+          {acc_sql if accounts else ""}
+        GROUP BY 1,2
+        ORDER BY category, subcategory;
+    """, params)
+
+    return {
+        "summary": get_rollup_summary(month, accounts),
+        "rows": _category_rows(rows),
+        "filters": {"month": month.isoformat(), "accounts": accounts or []}
+    }
+
+def build_pl_period(grain: str, start: date, accounts: Optional[List[str]] = None) -> Dict[str, Any]:
+    """Category/subcategory P&L of one rollup_period period."""
+    acc_sql = ""
+    params: List[Any] = [grain, start]
+    if accounts:
+        acc_sql = "AND account_id IN (" + ",".join("?"*len(accounts)) + ")"
+        params += accounts
+
+    rows = execute_query(f"""
+        SELECT category, subcategory, SUM(net)
+        FROM rollup_period
+        WHERE grain = ? AND period_start = ?
+          {acc_sql}
+        GROUP BY 1,2
+        ORDER BY category, subcategory;
+    """, params)
+
+    return {
+        "summary": get_period_summary(grain, start, accounts),
+        "rows": _category_rows(rows),
+        "filters": {"grain": grain, "period_start": start.isoformat(), "accounts": accounts or []}
+    }
+
+def build_pl_series(grain: str, first: date, last: date,
+                    accounts: Optional[List[str]] = None) -> Dict[str, Any]:
+    """Totals per period with period_start in [first, last]."""
+    params: List[Any] = [first, last]
+    if grain == 'month':
+        source = """(
+            SELECT *, month AS period_start, (month + INTERVAL 1 MONTH - INTERVAL 1 DAY)::DATE AS period_end
+            FROM rollup_monthly
+        )"""
+        grain_sql = ""
+    else:
+        source = "rollup_period"
+        grain_sql = "AND grain = ?"
+        params.append(grain)
+    acc_sql = ""
+    if accounts:
+        acc_sql = "AND account_id IN (" + ",".join("?"*len(accounts)) + ")"
+        params += accounts
+
+    rows = execute_query(f"""
+        SELECT period_start, period_end, SUM(income), SUM(expense), SUM(net), SUM(txn_count)
+        FROM {source}
+        WHERE period_start BETWEEN ? AND ?
+          {grain_sql}
+          {acc_sql}
+        GROUP BY 1,2
+        ORDER BY 1;
+    """, params)
+
+    periods = [{
+        "period_start": start.isoformat(),
+        "period_end": end.isoformat(),
+        "income": round(income or 0.0, 2),
+        "expense": round(expense or 0.0, 2),
+        "net": round(net or 0.0, 2),
+        "txn_count": int(txn_count or 0),
+    } for start, end, income, expense, net, txn_count in rows]
+
+    return {
+        "periods": periods,
+        "filters": {"grain": grain, "start": first.isoformat(), "end": last.isoformat(), "accounts": accounts or []}
+    }
+
+def build_pl_range(first: date, last: date, accounts: Optional[List[str]] = None) -> Dict[str, Any]:
+    """Dense month matrix for [first, last] from one GROUPING SETS pass over rollup_monthly.
+
+    The month before the range is read too so the first month has a MoM delta;
+    the grid of (month x category/subcategory) is densified first so LAG always
+    compares with the previous calendar month.
+    """
+    lead = add_months(first, -1)
+    acc_sql = ""
+    acc_params: List[Any] = []
+    if accounts:
+        acc_sql = "AND account_id IN (" + ",".join("?"*len(accounts)) + ")"
+        acc_params = list(accounts)
+
+    rows = execute_query(f"""
+        WITH months AS (
+            SELECT unnest(generate_series(?::DATE, ?::DATE, INTERVAL 1 MONTH))::DATE AS month
+        ),
+        base AS (
+            SELECT month, category, subcategory, income, expense, net, txn_count
+            FROM rollup_monthly
+            WHERE month BETWEEN ? AND ?
+              {acc_sql}
+        ),
+        grid AS (
+            SELECT m.month, k.category, k.subcategory,
+                   COALESCE(SUM(b.income), 0) AS income,
+                   COALESCE(SUM(b.expense), 0) AS expense,
+                   COALESCE(SUM(b.net), 0) AS net,
+                   COALESCE(SUM(b.txn_count), 0) AS txn_count
+            FROM months m
+            CROSS JOIN (SELECT DISTINCT category, subcategory FROM base) k
+            LEFT JOIN base b USING (month, category, subcategory)
+            GROUP BY ALL
+        ),
+        grouped AS (
+            -- level is the GROUPING() bitmask: 0 cell, 1 subcategory total, 2 category x month,
+            -- 3 category total, 6 month total, 7 grand total. Totals leave the lead month out
+            SELECT GROUPING(category, subcategory, month) AS level, category, subcategory, month,
+                   SUM(income) FILTER (WHERE month >= ?) AS income,
+                   SUM(expense) FILTER (WHERE month >= ?) AS expense,
+                   SUM(net) FILTER (WHERE month >= ?) AS net,
+                   SUM(txn_count) FILTER (WHERE month >= ?) AS txn_count,
+                   SUM(net) AS net_all
+            FROM grid
+            GROUP BY GROUPING SETS ((category, subcategory, month), (category, month), (month),
+                                    (category, subcategory), (category), ())
+        )
+        SELECT * FROM (
+            SELECT level, category, subcategory, month, income, expense, net, txn_count,
+                   net - LAG(net_all) OVER (PARTITION BY level, category, subcategory ORDER BY month) AS delta_mom
+            FROM grouped
+        )
+        WHERE month IS NULL OR month >= ?
+        ORDER BY level, category, subcategory, month;
+    """, [lead, last, lead, last, *acc_params, first, first, first, first, first])
+
+    months = []
+    month = first
+    while month <= last:
+        months.append(month)
+        month = add_months(month, 1)
+    index = {m: i for i, m in enumerate(months)}
+
+    def totals(income, expense, net, txn_count) -> Dict[str, Any]:
+        income, expense, net = income or 0.0, expense or 0.0, net or 0.0
+        return {"income": round(income, 2), "expense": round(expense, 2), "net": round(net, 2),
+                "txn_count": int(txn_count or 0), "savings_rate": round((net / income) if income else 0.0, 4)}
+
+    def series() -> Dict[str, List[float]]:
+        return {"net_by_month": [0.0] * len(months), "delta_mom": [0.0] * len(months)}
+
+    grand: Dict[str, Any] = totals(0, 0, 0, 0)
+    monthly = [{"month": m.isoformat(), **totals(0, 0, 0, 0), "delta_mom": 0.0} for m in months]
+    categories: Dict[str, Dict[str, Any]] = {}
+    subs: Dict[Tuple[str, str], Dict[str, Any]] = {}
+    for level, cat, sub, month, income, expense, net, txn_count, delta in rows:
+        if level == 7:
+            grand = totals(income, expense, net, txn_count)
+        elif level == 6:
+            monthly[index[month]].update(totals(income, expense, net, txn_count), delta_mom=round(delta or 0.0, 2))
+        elif level in (2, 3):
+            entry = categories.setdefault(cat, {"category": cat, **series(), "subs": []})
+            if level == 3:
+                entry.update(totals(income, expense, net, txn_count))
+            else:
+                entry["net_by_month"][index[month]] = round(net or 0.0, 2)
+                entry["delta_mom"][index[month]] = round(delta or 0.0, 2)
+        else:
+            entry = subs.setdefault((cat, sub), {"name": sub, **series()})
+            if level == 1:
+                entry.update(totals(income, expense, net, txn_count))
+            else:
+                entry["net_by_month"][index[month]] = round(net or 0.0, 2)
+                entry["delta_mom"][index[month]] = round(delta or 0.0, 2)
+
+    # Keys only present in the lead month are there for the deltas, not as rows
+    for (cat, _), entry in sorted(subs.items()):
+        if entry["txn_count"]:
+            categories[cat]["subs"].append(entry)
+    cat_rows = [entry for _, entry in sorted(categories.items()) if entry["txn_count"]]
 
     return {
-        "summary": summary,
+        "months": [m.isoformat() for m in months],
+        "totals": grand,
+        "monthly": monthly,
         "rows": cat_rows,
-        "filters": {"month": month.isoformat(), "accounts": req.accounts or []}
+        "filters": {"start": first.isoformat(), "end": last.isoformat(), "accounts": accounts or []}
     }
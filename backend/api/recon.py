@@ -24,7 +24,7 @@ async def upsert_eom_statement(request: EOMStatementRequest):
             SELECT SUM(amount) as computed_balance
             FROM transactions 
             WHERE account_id = ? 
-              AND DATE_TRUNC('month', ts) = ?
+              AND month = ?
         """, [request.account_id, request.period_month]).fetchone()
         
         computed_balance = computed_result[0] if computed_result else 0.0
@@ -95,11 +95,11 @@ async def get_reconciliation_status(
         LEFT JOIN (
             SELECT 
                 account_id,
-                DATE_TRUNC('month', ts) as period_month,
+                month as period_month,
                 SUM(amount) as balance,
                 COUNT(*) as transaction_count
             FROM transactions
-            GROUP BY account_id, DATE_TRUNC('month', ts)
+            GROUP BY account_id, month
         ) computed ON s.account_id = computed.account_id 
                    AND s.period_month = computed.period_month
         WHERE {where_clause}
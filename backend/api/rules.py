@@ -3,7 +3,7 @@ from models.dto import (
     RuleCreateRequest, RuleUpdateRequest, RuleResponse, 
     RulePreviewRequest, RulePreviewResponse
 )
-from services.rules_engine import preview_rule_matches
+from services.rules_engine import preview_rule_matches, invalidate_rule_cache
 from db.duck import get_conn, execute_update
 import uuid
 from typing import List
@@ -33,6 +33,7 @@ async def create_rule(request: RuleCreateRequest):
             'set_subcategory': request.set_subcategory,
             'set_is_transfer': request.set_is_transfer
         })
+        invalidate_rule_cache()
         
         return RuleResponse(
             id=rule_id,
@@ -126,6 +127,7 @@ async def update_rule(rule_id: str = Path(...), request: RuleUpdateRequest = ...
             """
             
             execute_update(update_query, params)
+            invalidate_rule_cache()
         
         # Get updated rule
         updated_rule = conn.execute("""
@@ -159,6 +161,7 @@ async def delete_rule(rule_id: str = Path(...)):
             raise HTTPException(status_code=404, detail="Rule not found")
         
         execute_update("DELETE FROM category_rules WHERE id = ?", [rule_id])
+        invalidate_rule_cache()
         
         return {"message": f"Rule {rule_id} deleted successfully"}
         
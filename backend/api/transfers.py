@@ -16,13 +16,21 @@ async def propose_transfers_endpoint(request: TransferProposeRequest):
     - Same absolute amount
     - Opposite signs (one positive, one negative)
     - Different accounts
-    - Within ±1 day of each other
+    - Within ±window_days of each other, across month edges
+    
+    Each transaction appears in at most one proposal (the most confident).
     """
+    if request.month is None and (request.start is None or request.end is None):
+        raise HTTPException(status_code=400, detail="month or start and end are required")
     
     try:
         proposals = propose_transfers(
             month=request.month,
-            accounts=request.accounts
+            accounts=request.accounts,
+            start=request.start,
+            end=request.end,
+            window_days=request.window_days,
+            limit=request.limit
         )
         
         # Convert to response format
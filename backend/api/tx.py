@@ -3,10 +3,10 @@ from models.dto import (
     TransactionListRequest, TransactionListResponse, TransactionRow,
     TransactionUpdateRequest, TransactionUpdateResponse
 )
-from db.duck import get_conn, execute_update
-from services.rollup import rebuild_rollup_monthly
+from db.duck import get_conn, transaction, write_conn
+from services.rollup import apply_rollup_delta
+from services.result_cache import bump_data_version
 import uuid
-from datetime import date
 from typing import Optional
 
 router = APIRouter()
@@ -30,7 +30,7 @@ async def get_transactions(request: TransactionListRequest):
         params = []
         
         if request.month:
-            where_conditions.append("DATE_TRUNC('month', ts) = ?")
+            where_conditions.append("month = ?")
             params.append(request.month)
         
         if request.accounts:
@@ -105,67 +105,64 @@ async def update_transaction(
     Update transaction category/subcategory/transfer status via overrides.
     
     Creates an override record and updates the derived transaction.
-    Rebuilds rollup for affected month.
+    Applies the change to the affected rollup cells incrementally.
     """
     
     try:
-        conn = get_conn()
-        
-        # Verify transaction exists
-        txn_result = conn.execute("""
-            SELECT ts, account_id FROM transactions WHERE id = ?
-        """, [transaction_id]).fetchone()
-        
-        if not txn_result:
-            raise HTTPException(status_code=404, detail="Transaction not found")
-        
-        txn_ts, account_id = txn_result
-        month = date(txn_ts.year, txn_ts.month, 1)
-        
-        # Create override record
-        override_id = str(uuid.uuid4())
-        execute_update("""
-            INSERT INTO txn_overrides (id, txn_id, set_category, set_subcategory, set_is_transfer, note)
-            VALUES (?, ?, ?, ?, ?, ?)
-        """, {
-            'id': override_id,
-            'txn_id': transaction_id,
-            'set_category': request.category,
-            'set_subcategory': request.subcategory,
-            'set_is_transfer': request.is_transfer,
-            'note': request.note
-        })
-        
-        # Update derived transaction
-        update_fields = {}
-        if request.category is not None:
-            update_fields['category'] = request.category
-        if request.subcategory is not None:
-            update_fields['subcategory'] = request.subcategory
-        if request.is_transfer is not None:
-            update_fields['is_transfer'] = request.is_transfer
-        
-        if update_fields:
-            # Build dynamic UPDATE query
-            set_clauses = []
-            update_params = []
-            
-            for field, value in update_fields.items():
-                set_clauses.append(f"{field} = ?")
-                update_params.append(value)
+        # The row is read under the write lock so the rollup delta starts from its current values
+        with write_conn() as conn:
+            # Verify transaction exists
+            txn_result = conn.execute("""
+                SELECT account_id, ts, category, subcategory, amount, is_transfer
+                FROM transactions WHERE id = ?
+            """, [transaction_id]).fetchone()
+        
+            if not txn_result:
+                raise HTTPException(status_code=404, detail="Transaction not found")
+        
+            old_txn = dict(zip(['account_id', 'ts', 'category', 'subcategory', 'amount', 'is_transfer'], txn_result))
+        
+            # Update derived transaction
+            update_fields = {}
+            if request.category is not None:
+                update_fields['category'] = request.category
+            if request.subcategory is not None:
+                update_fields['subcategory'] = request.subcategory
+            if request.is_transfer is not None:
+                update_fields['is_transfer'] = request.is_transfer
+        
+            # Override, transaction and rollup change together
+            with transaction(conn):
+                # Create override record
+                override_id = str(uuid.uuid4())
+                conn.execute("""
+                    INSERT INTO txn_overrides (id, txn_id, set_category, set_subcategory, set_is_transfer, note)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                """, [override_id, transaction_id, request.category, request.subcategory,
+                      request.is_transfer, request.note])
             
-            update_params.append(transaction_id)
-            
-            update_query = f"""
-                UPDATE transactions 
-                SET {', '.join(set_clauses)}
-                WHERE id = ?
-            """
-            
-            execute_update(update_query, update_params)
-        
-        # Rebuild rollup for affected month
-        rebuild_rollup_monthly(month, [account_id])
+                if update_fields:
+                    # Build dynamic UPDATE query
+                    set_clauses = []
+                    update_params = []
+                
+                    for field, value in update_fields.items():
+                        set_clauses.append(f"{field} = ?")
+                        update_params.append(value)
+                
+                    update_params.append(transaction_id)
+                
+                    update_query = f"""
+                        UPDATE transactions 
+                        SET {', '.join(set_clauses)}
+                        WHERE id = ?
+                    """
+                
+                    conn.execute(update_query, update_params)
+                
+                    # Move the transaction's contribution between rollup cells
+                    apply_rollup_delta(old_txn, {**old_txn, **update_fields}, conn=conn)
+        bump_data_version()
         
         return TransactionUpdateResponse(
             id=transaction_id,
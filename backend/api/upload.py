@@ -11,12 +11,14 @@ from etl.common import (
 from etl.bnp import load_bnp_csv
 from etl.boursorama import load_boursorama_csv
 from etl.revolut import load_revolut_csv
+from etl.duck_ingest import ingest_csv_duckdb
 from db.duck import get_conn, execute_update
 from services.rollup import rebuild_rollup_monthly
 from auth import get_current_user
 from config import settings
 from logger import logger
 from exceptions import ValidationError, FileProcessingError, DuplicateError
+from services.metrics import import_rows_parsed
 
 router = APIRouter()
 
@@ -93,6 +95,9 @@ async def upload_csv(
                 }
             )
         
+        if bank in settings.duckdb_ingest_banks:
+            return ingest_with_duckdb(content, bank, period, digest, file.filename, current_user)
+        
         # Load rows by bank
         try:
             if bank == "BNP":
@@ -115,6 +120,8 @@ async def upload_csv(
                 details={"bank": bank, "filename": file.filename}
             )
         
+        import_rows_parsed.inc(len(rows), bank=bank)
+        
         # Insert data
         import_id = upsert_import(bank, period, digest, file.filename, user_id)
         count = insert_raw_rows(rows, import_id, bank, user_id)
@@ -142,4 +149,43 @@ async def upload_csv(
         logger.exception("unexpected_upload_error", error=str(e))
         raise HTTPException(status_code=500, detail="Failed to process upload")
 
+def ingest_with_duckdb(content: bytes, bank: str, period: date, digest: str,
+                       filename: str, current_user: Dict[str, Any]) -> Dict[str, Any]:
+    """Native ingest: DuckDB parses the CSV and inserts transactions_raw directly."""
+    import_id = upsert_import(bank, period, digest, filename, current_user["id"])
+    try:
+        count = ingest_csv_duckdb(content, bank, import_id)
+    except Exception as e:
+        # Don't leave an empty import behind (it would block re-uploading the file)
+        execute_update("DELETE FROM imports WHERE id = ?", [import_id])
+        logger.error(
+            "csv_parsing_failed",
+            bank=bank,
+            error=str(e),
+            ingest_mode="duckdb",
+            user=current_user["username"]
+        )
+        raise FileProcessingError(
+            f"Failed to parse CSV file: {str(e)}",
+            details={"bank": bank, "filename": filename}
+        )
+    
+    logger.info(
+        "csv_upload_completed",
+        bank=bank,
+        period=period.isoformat(),
+        rows_inserted=count,
+        import_id=import_id,
+        ingest_mode="duckdb",
+        user=current_user["username"]
+    )
+    
+    return {
+        "success": True,
+        "import_batch_id": import_id,
+        "rows": count,
+        "bank": bank,
+        "period_month": period.isoformat()
+    }
+
 # Import commit endpoint moved to api/import_commit.py
\ No newline at end of file
@@ -2,10 +2,12 @@ from fastapi import FastAPI, Request, status
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 from fastapi.exceptions import RequestValidationError
-from api import upload, pl, auth_router, import_commit, clear_data
+from api import upload, pl, auth_router, import_commit, clear_data, metrics
 from config import settings
 from logger import logger, setup_logging
 from exceptions import PLException
+from db.query_stats import current_request_scope
+from services.metrics import http_requests, http_request_duration
 import time
 
 # Setup logging
@@ -25,6 +27,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["GET", "POST", "PUT", "DELETE"],
     allow_headers=["*"],
+    expose_headers=["ETag"],
 )
 
 # Request logging middleware
@@ -40,7 +43,18 @@ async def log_requests(request: Request, call_next):
         client=request.client.host if request.client else None,
     )
     
-    response = await call_next(request)
+    # Lets the DB layer attribute queries to the route (resolved during routing)
+    token = current_request_scope.set(request.scope)
+    status_code = 500
+    try:
+        response = await call_next(request)
+        status_code = response.status_code
+    finally:
+        current_request_scope.reset(token)
+        # Route template, not the path: ids in paths would explode the label set
+        route = getattr(request.scope.get("route"), "path", "unmatched")
+        http_requests.inc(method=request.method, route=route, status=status_code)
+        http_request_duration.observe(time.time() - start_time, method=request.method, route=route)
     
     # Log response
     process_time = time.time() - start_time
@@ -113,6 +127,7 @@ app.include_router(auth_router.router)
 app.include_router(upload.router)
 app.include_router(import_commit.router)
 app.include_router(pl.router)
+app.include_router(metrics.router)
 if settings.debug:
     # Only include clear data endpoint in debug mode
     app.include_router(clear_data.router)
\ No newline at end of file
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""Benchmark the bank CSV loaders and raw-row inserts on synthetic exports (rows/sec)"""
+
+import random
+import sys
+import time
+import uuid
+from datetime import date, timedelta
+
+import duckdb
+
+from db import duck
+from db.duck import _run_migrations
+from etl.common import insert_raw_rows
+from etl.duck_ingest import ingest_csv_duckdb
+from etl.bnp import load_bnp_csv
+from etl.boursorama import load_boursorama_csv
+from etl.revolut import load_revolut_csv
+
+MERCHANTS = ["CARTE CAFE DU COIN", "VIREMENT SALAIRE REF 123456", "PRLV SEPA EDF",
+             "CARD 12/07/25 MONOPRIX", "AMAZON MARKETPLACE", "UBER   TRIP"]
+
+def _random_day(i: int) -> date:
+    return date(2022, 1, 1) + timedelta(days=i % 1000)
+
+def make_bnp(n: int) -> bytes:
+    lines = ["Compte de chèques ****6388;Solde au 12/08/2025;3248 66;EUR;;;", ";;;;;;",
+             "Date operation;Categorie operation;Sous Categorie;Libelle;Montant"]
+    for i in range(n):
+        d = _random_day(i)
+        amount = f"{random.uniform(-2000, 2000):.2f}".replace(".", ",")
+        lines.append(f"{d:%d-%m-%Y};Paiements;Carte;{random.choice(MERCHANTS)} {i};{amount}")
+    return "\n".join(lines).encode("cp1252")
+
+def make_boursorama(n: int) -> bytes:
+    lines = ["dateOp;dateVal;label;category;categoryParent;supplierFound;amount;comment;accountNum;accountLabel;accountbalance"]
+    for i in range(n):
+        d = _random_day(i)
+        amount = f"{random.uniform(-2000, 2000):.2f}"
+        lines.append(f"{d:%Y-%m-%d};{d:%Y-%m-%d};{random.choice(MERCHANTS)} {i};Courses;Maison;;{amount};;000123;Compte joint;2500.00")
+    return "\n".join(lines).encode("cp1252")
+
+def make_revolut(n: int) -> bytes:
+    lines = ["Type,Product,Started Date,Completed Date,Description,Amount,Fee,Currency,State,Balance"]
+    for i in range(n):
+        d = _random_day(i)
+        amount = f"{random.uniform(-2000, 2000):.2f}"
+        fee = "0.50" if i % 10 == 0 else "0.00"
+        lines.append(f"CARD_PAYMENT,Current,{d} 10:00:00,{d} 10:01:00,{random.choice(MERCHANTS)} {i},{amount},{fee},GBP,COMPLETED,1000.00")
+    return "\n".join(lines).encode("utf-8")
+
+def bench(name: str, loader, content: bytes, n: int):
+    start = time.perf_counter()
+    rows = loader(content)
+    elapsed = time.perf_counter() - start
+    print(f"{name:<12} {len(rows):>8} rows  {elapsed:8.3f}s  {n / elapsed:>12,.0f} rows/sec")
+    return rows
+
+def _bench_db(bank: str):
+    conn = duckdb.connect()
+    _run_migrations(conn)
+    import_id = str(uuid.uuid4())
+    conn.execute(
+        "INSERT INTO imports(id, bank, period_month, file_sha256, source_file) VALUES (?, ?, '2022-01-01', 'bench', 'bench.csv')",
+        [import_id, bank]
+    )
+    return conn, import_id
+
+def bench_insert(name: str, bank: str, rows, n: int) -> None:
+    conn, import_id = _bench_db(bank)
+    duck._CONN = conn  # insert_raw_rows writes through get_conn()
+    start = time.perf_counter()
+    count = insert_raw_rows(rows, import_id, bank, "bench-user")
+    elapsed = time.perf_counter() - start
+    print(f"{name:<12} {count:>8} rows  {elapsed:8.3f}s  {n / elapsed:>12,.0f} rows/sec")
+
+def bench_duckdb(name: str, bank: str, content: bytes, n: int) -> None:
+    conn, import_id = _bench_db(bank)
+    start = time.perf_counter()
+    count = ingest_csv_duckdb(content, bank, import_id, conn=conn)
+    elapsed = time.perf_counter() - start
+    print(f"{name:<12} {count:>8} rows  {elapsed:8.3f}s  {n / elapsed:>12,.0f} rows/sec  (parse + insert)")
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    random.seed(42)
+    print(f"Benchmarking loaders on {n:,} synthetic rows per bank")
+    print("=" * 60)
+    files = {"BNP": make_bnp(n), "Boursorama": make_boursorama(n), "Revolut": make_revolut(n)}
+    parsed = {
+        "BNP": bench("BNP", load_bnp_csv, files["BNP"], n),
+        "Boursorama": bench("Boursorama", load_boursorama_csv, files["Boursorama"], n),
+        "Revolut": bench("Revolut", load_revolut_csv, files["Revolut"], n),
+    }
+    print("-" * 60)
+    print("insert_raw_rows (bulk insert of the parsed rows)")
+    for bank, rows in parsed.items():
+        bench_insert(bank, bank, rows, n)
+    print("-" * 60)
+    print("DuckDB native ingest (read_csv + INSERT ... SELECT)")
+    for bank, content in files.items():
+        bench_duckdb(bank, bank, content, n)
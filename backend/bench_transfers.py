@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""Benchmark transfer matching and bulk confirmation on synthetic months (pairs/sec)"""
+
+import random
+import sys
+import time
+import uuid
+from datetime import date, datetime, timedelta
+
+import duckdb
+
+from db import duck
+from db.duck import _run_migrations
+from services.rollup import rebuild_rollup_monthly
+from services.transfers import confirm_transfers, propose_transfers
+
+ACCOUNTS = ["BNP", "Revolut", "Boursorama"]
+
+def _bench_db(n_pairs: int, n_noise: int):
+    """In-memory database with n_pairs transfers and n_noise other rows over one year."""
+    conn = duckdb.connect()
+    _run_migrations(conn)
+    duck._CONN = conn  # the transfer service reads through get_conn()
+    import_id = str(uuid.uuid4())
+    conn.execute(
+        "INSERT INTO imports(id, bank, period_month, file_sha256, source_file) VALUES (?, 'BNP', '2025-01-01', 'bench', 'bench.csv')",
+        [import_id]
+    )
+    rows = []
+    for _ in range(n_pairs):
+        day = date(2025, 1, 1) + timedelta(days=random.randrange(365))
+        source, target = random.sample(ACCOUNTS, 2)
+        amount = round(random.uniform(10, 2000), 2)
+        rows += [(source, day, -amount, "VIR SEPA"), (target, day + timedelta(days=random.randint(0, 1)), amount, "VIR SEPA")]
+    for i in range(n_noise):
+        day = date(2025, 1, 1) + timedelta(days=random.randrange(365))
+        rows.append((random.choice(ACCOUNTS), day, round(random.uniform(-500, 500), 2), f"CARTE {i}"))
+
+    raw = [(str(uuid.uuid4()), import_id, account, datetime.combine(day, datetime.min.time()), day.replace(day=1), amount)
+           for account, day, amount, _ in rows]
+    conn.executemany("INSERT INTO transactions_raw (id, import_batch_id, bank, ts, month, amount, currency) "
+                     "VALUES (?, ?, ?, ?, ?, ?, 'EUR')", raw)
+    conn.execute("""
+        INSERT INTO transactions (id, raw_id, ts, month, account_id, amount, currency, import_batch_id)
+        SELECT uuid(), id, ts, month, bank, amount, currency, import_batch_id FROM transactions_raw
+    """)
+    for month in range(1, 13):
+        rebuild_rollup_monthly(date(2025, month, 1), "bench-user")
+    return conn
+
+def bench_year(n_pairs: int, n_noise: int) -> None:
+    conn = _bench_db(n_pairs, n_noise)
+    start = time.perf_counter()
+    proposals = propose_transfers(start=date(2025, 1, 1), end=date(2025, 12, 31), limit=None)
+    elapsed = time.perf_counter() - start
+    print(f"{'propose':<12} {len(proposals):>8} pairs  {elapsed:8.3f}s  {len(proposals) / elapsed:>12,.0f} pairs/sec")
+
+    start = time.perf_counter()
+    result = confirm_transfers([], [p["transaction_ids"] for p in proposals])
+    elapsed = time.perf_counter() - start
+    pairs = result["confirmed_pairs"]
+    print(f"{'confirm':<12} {pairs:>8} pairs  {elapsed:8.3f}s  {pairs / elapsed:>12,.0f} pairs/sec  (incl. rollup refresh)")
+    conn.close()
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 2_000
+    random.seed(42)
+    print(f"Benchmarking transfers on {n:,} synthetic pairs and {10 * n:,} other rows")
+    print("=" * 60)
+    bench_year(n, 10 * n)
@@ -136,7 +136,7 @@ def clear_boursorama_data(month=None, clear_all=False):
                 conn.execute("""
                     DELETE FROM transactions 
                     WHERE account_id = 'Boursorama'
-                    AND DATE_TRUNC('month', ts) = ?
+                    AND month = ?
                 """, [month_date])
                 print(f"Deleted processed transactions for {month}")
                 
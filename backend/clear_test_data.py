@@ -2,7 +2,7 @@
 """Clear test data for a specific user to allow re-uploading files."""
 
 import sys
-from db.duck import execute_update, execute_query
+from db.duck import execute_update, execute_query, transaction
 
 def clear_user_data(username: str):
     """Clear all data for a specific user."""
@@ -30,12 +30,13 @@ def clear_user_data(username: str):
         ("category_rules", "user_id"),
     ]
     
-    for table, user_column in tables_to_clear:
-        count = execute_update(
-            f"DELETE FROM {table} WHERE {user_column} = ?",
-            [user_id]
-        )
-        print(f"Deleted {count} rows from {table}")
+    with transaction() as conn:
+        for table, user_column in tables_to_clear:
+            count = execute_update(
+                f"DELETE FROM {table} WHERE {user_column} = ?",
+                [user_id], conn=conn
+            )
+            print(f"Deleted {count} rows from {table}")
     
     print(f"\nAll data cleared for user '{username}'")
     return True
@@ -29,6 +29,14 @@ class Settings(BaseSettings):
     
     # Database
     database_url: str = Field(default="data/finance.duckdb", env="DATABASE_URL")
+    # DuckDB worker threads and memory cap (e.g. "2GB"); unset uses DuckDB's defaults
+    duckdb_threads: Optional[int] = Field(default=None, env="DUCKDB_THREADS")
+    duckdb_memory_limit: Optional[str] = Field(default=None, env="DUCKDB_MEMORY_LIMIT")
+    # Per-statement latency stats; statements slower than slow_query_ms are logged,
+    # with DuckDB's JSON profile saved to slow_query_profile_dir when set
+    query_stats: bool = Field(default=True, env="QUERY_STATS")
+    slow_query_ms: float = Field(default=250.0, env="SLOW_QUERY_MS")
+    slow_query_profile_dir: Optional[str] = Field(default=None, env="SLOW_QUERY_PROFILE_DIR")
     
     # API
     api_key: Optional[str] = Field(default=None, env="API_KEY")
@@ -37,6 +45,30 @@ class Settings(BaseSettings):
     max_upload_size: int = Field(default=10 * 1024 * 1024, env="MAX_UPLOAD_SIZE")  # 10MB
     allowed_extensions: List[str] = [".csv", ".CSV"]
     
+    # Banks ingested by DuckDB's CSV reader instead of the pandas loaders
+    duckdb_ingest_banks: Union[List[str], str] = Field(default=[], env="DUCKDB_INGEST_BANKS")
+    
+    @field_validator('duckdb_ingest_banks', mode='before')
+    @classmethod
+    def parse_duckdb_ingest_banks(cls, v):
+        if isinstance(v, str):
+            return [bank.strip() for bank in v.split(',') if bank.strip()]
+        return v
+    
+    # Rules engine used by import commit: "sql" (compiled into one DuckDB query) or "python"
+    rules_engine: str = Field(default="sql", env="RULES_ENGINE")
+    
+    # Transfer matching: days allowed between the two legs of a transfer
+    transfer_window_days: int = Field(default=1, env="TRANSFER_WINDOW_DAYS")
+    # Relative gap allowed between legs in different currencies, converted with fx_rates (0 disables)
+    transfer_fx_tolerance: float = Field(default=0.02, env="TRANSFER_FX_TOLERANCE")
+    # Confirm transfers found among newly committed rows at or above this confidence
+    auto_transfers: bool = Field(default=False, env="AUTO_TRANSFERS")
+    auto_transfer_min_confidence: float = Field(default=0.9, env="AUTO_TRANSFER_MIN_CONFIDENCE")
+    
+    # P&L summary result cache (entries; 0 disables)
+    pl_cache_size: int = Field(default=256, env="PL_CACHE_SIZE")
+    
     # Logging
     log_level: str = Field(default="INFO", env="LOG_LEVEL")
     log_format: str = Field(default="json", env="LOG_FORMAT")  # json or console
@@ -1,15 +1,41 @@
 # backend/db/duck.py
+"""DuckDB access.
+
+One connection (_CONN) owns the database instance; callers never use it
+directly. get_conn() hands each thread its own cursor on it, so FastAPI's
+threadpool can run reads in parallel without sharing a connection object
+(DuckDBPyConnection is not safe for concurrent use). Writers go through
+write_conn(), which serializes them: DuckDB would otherwise abort one of two
+conflicting write transactions. transaction() builds a unit of work on top of
+it, so multi-statement writes commit once and atomically. Cursors are wrapped
+for per-statement timing (see db/query_stats.py).
+"""
 import duckdb
+import pandas as pd
+from contextlib import contextmanager
 from pathlib import Path
-from typing import List, Optional, Tuple
+from typing import TYPE_CHECKING, Any, Dict, Iterator, List, Optional, Sequence, Tuple, Union
 import glob
+import threading
+import uuid
 import datetime as dt
+from config import settings
+from db.query_stats import InstrumentedCursor
+
+if TYPE_CHECKING:
+    import numpy as np
+    import pyarrow as pa
 
 _CONN: Optional[duckdb.DuckDBPyConnection] = None
+_INIT_LOCK = threading.Lock()
+_WRITE_LOCK = threading.RLock()
+_local = threading.local()
 
 DATA_DIR = Path("data")
 DB_PATH = DATA_DIR / "finance.duckdb"
 MIGRATIONS_DIR = Path(__file__).parent / "migrations"
+# Rows per Arrow record batch when streaming a result
+ARROW_BATCH_SIZE = 100_000
 
 def _run_migrations(conn: duckdb.DuckDBPyConnection) -> None:
     conn.execute("""
@@ -38,24 +64,159 @@ def _run_migrations(conn: duckdb.DuckDBPyConnection) -> None:
                 conn.execute("ROLLBACK;")
                 raise
 
-def get_conn() -> duckdb.DuckDBPyConnection:
+def _duckdb_config() -> Dict[str, Any]:
+    config: Dict[str, Any] = {}
+    if settings.duckdb_threads:
+        config["threads"] = settings.duckdb_threads
+    if settings.duckdb_memory_limit:
+        config["memory_limit"] = settings.duckdb_memory_limit
+    return config
+
+def get_database() -> duckdb.DuckDBPyConnection:
+    """The connection owning the database instance (opened and migrated once)."""
     global _CONN
     if _CONN is None:
-        DATA_DIR.mkdir(exist_ok=True, parents=True)
-        _CONN = duckdb.connect(str(DB_PATH))
-        _run_migrations(_CONN)
+        with _INIT_LOCK:
+            if _CONN is None:
+                DATA_DIR.mkdir(exist_ok=True, parents=True)
+                conn = duckdb.connect(str(DB_PATH), config=_duckdb_config())
+                _run_migrations(conn)
+                _CONN = conn
     return _CONN
 
+def get_conn() -> duckdb.DuckDBPyConnection:
+    """This thread's cursor on the shared database.
+
+    A cursor is an independent connection to the same instance: it has its own
+    transaction state, temp tables and registered views, and queries on
+    different cursors run concurrently.
+    """
+    database = get_database()
+    if getattr(_local, "database", None) is not database:
+        _local.cursor = _new_cursor(database)
+        _local.database = database
+    return _local.cursor
+
+def _new_cursor(database: duckdb.DuckDBPyConnection) -> duckdb.DuckDBPyConnection:
+    cursor = database.cursor()
+    return InstrumentedCursor(cursor) if settings.query_stats else cursor
+
+@contextmanager
+def write_conn(conn: Optional[duckdb.DuckDBPyConnection] = None) -> Iterator[duckdb.DuckDBPyConnection]:
+    """This thread's cursor (or the given connection) with the process-wide write lock held.
+
+    Wrap a whole write transaction (BEGIN ... COMMIT) in it. Re-entrant, so a
+    writer may call other writers; reads elsewhere are not blocked.
+    """
+    with _WRITE_LOCK:
+        yield conn or get_conn()
+
+def _execute(conn: duckdb.DuckDBPyConnection, sql: str, params: Optional[List]) -> duckdb.DuckDBPyConnection:
+    return conn.execute(sql, params) if params else conn.execute(sql)
+
 def execute_query(sql: str, params: Optional[List] = None) -> List[Tuple]:
-    conn = get_conn()
-    if params:
-        return conn.execute(sql, params).fetchall()
-    return conn.execute(sql).fetchall()
-
-def execute_update(sql: str, params: Optional[List] = None) -> None:
-    conn = get_conn()
-    if params:
-        conn.execute(sql, params)
-    else:
-        conn.execute(sql)
-    conn.commit()
+    return _execute(get_conn(), sql, params).fetchall()
+
+def fetch_arrow(sql: str, params: Optional[List] = None,
+                conn: Optional[duckdb.DuckDBPyConnection] = None) -> "pa.Table":
+    """Whole result as an Arrow table (columnar, no Python object per row). Needs pyarrow."""
+    result = _execute(conn or get_conn(), sql, params)
+    # fetch_arrow_table was renamed to_arrow_table in DuckDB 1.4
+    to_table = getattr(result, "to_arrow_table", None) or result.fetch_arrow_table
+    return to_table()
+
+def fetch_numpy(sql: str, params: Optional[List] = None,
+                conn: Optional[duckdb.DuckDBPyConnection] = None) -> Dict[str, "np.ndarray"]:
+    """Result as {column: NumPy array}; columns with NULLs come back as masked arrays."""
+    return _execute(conn or get_conn(), sql, params).fetchnumpy()
+
+def iter_record_batches(sql: str, params: Optional[List] = None, batch_size: int = ARROW_BATCH_SIZE,
+                        conn: Optional[duckdb.DuckDBPyConnection] = None) -> Iterator["pa.RecordBatch"]:
+    """Stream a result as Arrow record batches of at most batch_size rows. Needs pyarrow.
+
+    Only one batch is materialized at a time. A query on the streaming cursor
+    ends the stream, so without conn the stream gets a cursor of its own and the
+    caller may keep querying meanwhile; that cursor sees committed data only.
+    """
+    cursor = conn or _new_cursor(get_database())
+    try:
+        result = _execute(cursor, sql, params)
+        # fetch_record_batch was renamed to_arrow_reader in DuckDB 1.4
+        to_reader = getattr(result, "to_arrow_reader", None) or result.fetch_record_batch
+        yield from to_reader(batch_size)
+    finally:
+        if conn is None:
+            cursor.close()
+
+@contextmanager
+def transaction(conn: Optional[duckdb.DuckDBPyConnection] = None) -> Iterator[duckdb.DuckDBPyConnection]:
+    """Unit of work: statements run in the block commit together, or not at all.
+
+    Holds the write lock for the whole block. Nested blocks on the same
+    connection join the outer transaction, so helpers can open one without
+    caring whether their caller already has.
+    """
+    with write_conn(conn) as conn:
+        open_txns = getattr(_local, "transactions", None)
+        if open_txns is None:
+            open_txns = _local.transactions = set()
+        if id(conn) in open_txns:
+            yield conn
+            return
+        conn.execute("BEGIN TRANSACTION;")
+        open_txns.add(id(conn))
+        try:
+            yield conn
+            conn.execute("COMMIT;")
+        except BaseException:
+            conn.execute("ROLLBACK;")
+            raise
+        finally:
+            open_txns.discard(id(conn))
+
+def execute_update(sql: str, params: Optional[List] = None,
+                   conn: Optional[duckdb.DuckDBPyConnection] = None) -> int:
+    """Run one write statement in its own transaction (or the caller's); returns rows affected."""
+    with transaction(conn) as conn:
+        result = _execute(conn, sql, params)
+        row = result.fetchone() if result.description else None
+    return int(row[0]) if row and isinstance(row[0], int) else 0
+
+def execute_many(sql: str, rows: Sequence[Sequence[Any]],
+                 conn: Optional[duckdb.DuckDBPyConnection] = None) -> int:
+    """Run one parameterized statement per row, all in one transaction; returns len(rows).
+
+    DuckDB executes each row separately, so prefer bulk_insert for more than a
+    few hundred rows.
+    """
+    if not rows:
+        return 0
+    with transaction(conn) as conn:
+        conn.executemany(sql, [list(row) for row in rows])
+    return len(rows)
+
+def bulk_insert(table: str, rows: Union[pd.DataFrame, List[Dict[str, Any]]],
+                columns: Optional[List[str]] = None,
+                conn: Optional[duckdb.DuckDBPyConnection] = None) -> int:
+    """Insert a batch with one set-based INSERT ... SELECT inside one transaction.
+
+    The batch (a DataFrame, or row dicts keyed by column name) is registered with
+    DuckDB as a view, so the whole batch costs one statement instead of one per row.
+    Inside a caller's transaction() the insert joins it.
+    """
+    df = rows if isinstance(rows, pd.DataFrame) else pd.DataFrame.from_records(rows, columns=columns)
+    if df.empty:
+        return 0
+    columns = columns or list(df.columns)
+    conn = conn or get_conn()
+    view = f"_bulk_{uuid.uuid4().hex}"
+    col_sql = ", ".join(f'"{c}"' for c in columns)
+    insert_sql = f"INSERT INTO {table} ({col_sql}) SELECT {col_sql} FROM {view};"
+
+    conn.register(view, df)
+    try:
+        with transaction(conn):
+            conn.execute(insert_sql)
+    finally:
+        conn.unregister(view)
+    return len(df)
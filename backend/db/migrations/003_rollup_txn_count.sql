@@ -0,0 +1,19 @@
+-- Number of transactions aggregated in each rollup cell, so incremental
+-- (delta) maintenance knows when a cell becomes empty
+ALTER TABLE rollup_monthly ADD COLUMN IF NOT EXISTS txn_count BIGINT DEFAULT 0;
+
+UPDATE rollup_monthly r
+SET txn_count = c.n
+FROM (
+  SELECT account_id,
+         DATE_TRUNC('month', ts) AS month,
+         COALESCE(category, 'Uncategorized') AS category,
+         COALESCE(subcategory, '') AS subcategory,
+         COUNT(*) AS n
+  FROM transactions
+  GROUP BY 1, 2, 3, 4
+) c
+WHERE r.account_id = c.account_id
+  AND r.month = c.month
+  AND r.category = c.category
+  AND r.subcategory = c.subcategory;
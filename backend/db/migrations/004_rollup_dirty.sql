@@ -0,0 +1,8 @@
+-- Rollup cells whose transactions changed since they were last aggregated.
+-- Writers mark cells here; P&L reads rebuild only these cells.
+CREATE TABLE IF NOT EXISTS rollup_dirty (
+  account_id TEXT NOT NULL,
+  month DATE NOT NULL,
+  marked_at TIMESTAMP DEFAULT now(),
+  PRIMARY KEY (account_id, month)
+);
@@ -0,0 +1,54 @@
+-- Coarser materialized rollup tiers: ISO week, quarter, calendar year and
+-- trailing-12-month (period_start = 11 months before the window's last month).
+-- quarter/year/ttm are aggregated from rollup_monthly; weeks straddle months
+-- and are aggregated from transactions
+CREATE TABLE IF NOT EXISTS rollup_period (
+  grain TEXT NOT NULL,          -- week | quarter | year | ttm
+  period_start DATE NOT NULL,
+  period_end DATE NOT NULL,     -- inclusive
+  account_id TEXT NOT NULL,
+  category TEXT NOT NULL,
+  subcategory TEXT NOT NULL,
+  income DOUBLE DEFAULT 0,
+  expense DOUBLE DEFAULT 0,
+  net DOUBLE NOT NULL,
+  txn_count BIGINT DEFAULT 0,
+  PRIMARY KEY (grain, period_start, account_id, category, subcategory)
+);
+
+INSERT INTO rollup_period (grain, period_start, period_end, account_id, category, subcategory, income, expense, net, txn_count)
+SELECT g.grain,
+       DATE_TRUNC(g.grain, r.month)::DATE,
+       (DATE_TRUNC(g.grain, r.month) + to_months(g.months) - INTERVAL 1 DAY)::DATE,
+       r.account_id, r.category, r.subcategory,
+       SUM(r.income), SUM(r.expense), SUM(r.net), SUM(r.txn_count)
+FROM rollup_monthly r
+CROSS JOIN (VALUES ('quarter', 3), ('year', 12)) AS g(grain, months)
+GROUP BY ALL;
+
+INSERT INTO rollup_period (grain, period_start, period_end, account_id, category, subcategory, income, expense, net, txn_count)
+SELECT 'ttm',
+       (e.end_month - INTERVAL 11 MONTH)::DATE,
+       (e.end_month + INTERVAL 1 MONTH - INTERVAL 1 DAY)::DATE,
+       r.account_id, r.category, r.subcategory,
+       SUM(r.income), SUM(r.expense), SUM(r.net), SUM(r.txn_count)
+FROM (
+  SELECT unnest(generate_series(MIN(month), MAX(month), INTERVAL 1 MONTH))::DATE AS end_month
+  FROM rollup_monthly
+) e
+JOIN rollup_monthly r ON r.month BETWEEN e.end_month - INTERVAL 11 MONTH AND e.end_month
+GROUP BY ALL;
+
+INSERT INTO rollup_period (grain, period_start, period_end, account_id, category, subcategory, income, expense, net, txn_count)
+SELECT 'week',
+       DATE_TRUNC('week', ts)::DATE,
+       (DATE_TRUNC('week', ts) + INTERVAL 6 DAY)::DATE,
+       account_id,
+       COALESCE(category, 'Uncategorized'),
+       COALESCE(subcategory, ''),
+       SUM(CASE WHEN amount > 0 AND NOT is_transfer THEN amount ELSE 0 END),
+       SUM(CASE WHEN amount < 0 AND NOT is_transfer THEN -amount ELSE 0 END),
+       SUM(CASE WHEN NOT is_transfer THEN amount ELSE 0 END),
+       COUNT(*)
+FROM transactions
+GROUP BY ALL;
@@ -0,0 +1,11 @@
+-- Stored month key. Filtering on DATE_TRUNC('month', ts) wraps the column in
+-- a function, so DuckDB cannot prune row groups with their min/max zone maps;
+-- equality/range predicates on a plain column can. Writers fill it at insert
+-- (date_trunc of ts) and insert batches ordered by month so row groups stay
+-- narrow. Deliberately not indexed: an ART index would turn ts/month updates
+-- into delete + insert, which the txn_overrides foreign key rejects
+ALTER TABLE transactions_raw ADD COLUMN IF NOT EXISTS month DATE;
+UPDATE transactions_raw SET month = DATE_TRUNC('month', ts)::DATE WHERE ts IS NOT NULL;
+
+ALTER TABLE transactions ADD COLUMN IF NOT EXISTS month DATE;
+UPDATE transactions SET month = DATE_TRUNC('month', ts)::DATE;
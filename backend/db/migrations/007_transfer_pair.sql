@@ -0,0 +1,4 @@
+-- Links the two legs of a confirmed transfer: both overrides share the pair id.
+-- Confirmed pairs per (from account, to account) feed the transfer matcher's
+-- account-pair prior. Overrides written before this migration carry NULL.
+ALTER TABLE txn_overrides ADD COLUMN IF NOT EXISTS transfer_pair_id UUID;
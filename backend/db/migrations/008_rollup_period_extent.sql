@@ -0,0 +1,12 @@
+-- End of the last materialized period per rollup_period grain, kept by the
+-- rollup refresh. Only ttm needs it: trailing windows exist up to the last
+-- month with data, and a single-transaction delta must not create later ones.
+-- Reading it here avoids a MAX() scan of rollup_period on every edit.
+CREATE TABLE IF NOT EXISTS rollup_period_extent (
+  grain TEXT PRIMARY KEY,
+  last_end DATE NOT NULL
+);
+
+INSERT INTO rollup_period_extent (grain, last_end)
+SELECT 'ttm', MAX(period_end) FROM rollup_period WHERE grain = 'ttm'
+HAVING MAX(period_end) IS NOT NULL;
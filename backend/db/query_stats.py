@@ -0,0 +1,240 @@
+# backend/db/query_stats.py
+"""Per-statement query instrumentation.
+
+get_conn() wraps each thread's cursor in an InstrumentedCursor, which times
+every statement from execute() until its result is fetched (DuckDB may stream
+a result, so execute() alone can return before the work is done). Each
+statement is recorded under its normalized text (literals and IN/VALUES lists
+collapsed) and the route of the request that ran it: counts, rows returned
+and a latency histogram. Statements slower than SLOW_QUERY_MS are logged, with
+DuckDB's JSON profile attached when SLOW_QUERY_PROFILE_DIR is set.
+"""
+import contextvars
+import hashlib
+import re
+import shutil
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import duckdb
+
+from config import settings
+from logger import logger
+
+# Histogram bucket upper bounds, in seconds
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Distinct (statement, route) keys kept; later ones are folded into OTHER_STATEMENT
+MAX_STATEMENTS = 1000
+OTHER_STATEMENT = "<other>"
+
+# ASGI scope of the request being served (set by the app middleware)
+current_request_scope: contextvars.ContextVar[Optional[Dict[str, Any]]] = contextvars.ContextVar(
+    "current_request_scope", default=None
+)
+
+_COMMENT = re.compile(r"--[^\n]*|/\*.*?\*/", re.S)
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"(?<![\w.])-?\d+(?:\.\d+)?(?:e[+-]?\d+)?(?![\w.])", re.I)
+_BULK_VIEW = re.compile(r"\b_bulk_[0-9a-f]{32}\b")
+_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_ROWS = re.compile(r"(\((?:\?|\.\.\.)(?:, (?:\?|\.\.\.))*\))(?:\s*,\s*\1)+")
+_SPACE = re.compile(r"\s+")
+
+@lru_cache(maxsize=4096)
+def normalize_sql(sql: str) -> str:
+    """Statement text with literals replaced by ? and parameter lists collapsed."""
+    text = _COMMENT.sub(" ", sql)
+    text = _STRING.sub("?", text)
+    text = _NUMBER.sub("?", text)
+    text = _BULK_VIEW.sub("_bulk_?", text)
+    text = _SPACE.sub(" ", text).strip().rstrip(";").strip()
+    text = _LIST.sub("(?, ...)", text)
+    return _ROWS.sub(r"\1, ...", text)
+
+def current_route() -> Optional[str]:
+    """'METHOD /path/template' of the request being served, if any."""
+    scope = current_request_scope.get()
+    if scope is None:
+        return None
+    route = scope.get("route")
+    path = getattr(route, "path", None) or scope.get("path", "")
+    return f"{scope.get('method', '')} {path}".strip()
+
+class QueryStats:
+    """Thread-safe per-(statement, route) counters and latency histograms."""
+
+    def __init__(self, max_statements: int = MAX_STATEMENTS):
+        self.max_statements = max_statements
+        self._stats: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def record(self, statement: str, route: Optional[str], duration: float, rows: Optional[int]) -> None:
+        key = (statement, route or "")
+        with self._lock:
+            entry = self._stats.get(key)
+            if entry is None:
+                if len(self._stats) >= self.max_statements:
+                    key = (OTHER_STATEMENT, "")
+                    entry = self._stats.get(key)
+                if entry is None:
+                    entry = self._stats[key] = {
+                        "count": 0, "rows": 0, "total_seconds": 0.0, "max_seconds": 0.0,
+                        "buckets": [0] * (len(LATENCY_BUCKETS) + 1),
+                    }
+            entry["count"] += 1
+            entry["rows"] += rows or 0
+            entry["total_seconds"] += duration
+            entry["max_seconds"] = max(entry["max_seconds"], duration)
+            for i, bound in enumerate(LATENCY_BUCKETS):
+                if duration <= bound:
+                    entry["buckets"][i] += 1
+                    break
+            else:
+                entry["buckets"][-1] += 1
+
+    def snapshot(self) -> List[Dict[str, Any]]:
+        """One dict per statement and route, slowest in total first; buckets are cumulative."""
+        with self._lock:
+            items = [(key, dict(entry, buckets=list(entry["buckets"]))) for key, entry in self._stats.items()]
+        snapshot = []
+        for (statement, route), entry in items:
+            cumulative, running = [], 0
+            for count in entry["buckets"][:-1]:
+                running += count
+                cumulative.append(running)
+            snapshot.append({
+                "statement": statement,
+                "route": route,
+                "count": entry["count"],
+                "rows": entry["rows"],
+                "total_seconds": entry["total_seconds"],
+                "max_seconds": entry["max_seconds"],
+                "buckets": list(zip(LATENCY_BUCKETS, cumulative)),
+            })
+        snapshot.sort(key=lambda s: s["total_seconds"], reverse=True)
+        return snapshot
+
+    def reset(self) -> None:
+        with self._lock:
+            self._stats.clear()
+
+query_stats = QueryStats()
+
+def _row_count(result: Any) -> Optional[int]:
+    if result is None:
+        return 0
+    if isinstance(result, tuple):  # fetchone
+        return 1
+    if isinstance(result, dict):  # fetchnumpy
+        return len(next(iter(result.values()), []))
+    num_rows = getattr(result, "num_rows", None)  # Arrow table
+    if isinstance(num_rows, int):
+        return num_rows
+    try:
+        return len(result)
+    except TypeError:  # Arrow stream: rows are unknown up front
+        return None
+
+def _is_status(description: Optional[List[Tuple]]) -> bool:
+    return description is not None and len(description) == 1 and description[0][0] == "Success"
+
+class InstrumentedCursor:
+    """A DuckDB cursor that records every statement it runs in query_stats.
+
+    A statement is recorded when its result is first fetched, or when the
+    cursor runs its next statement if the result is never fetched (statements
+    without a result, like COMMIT, are recorded at once). Everything
+    besides executing and fetching is delegated to the wrapped cursor.
+    """
+
+    _FETCHES = ("fetchone", "fetchmany", "fetchall", "fetchdf", "fetch_df", "df", "fetchnumpy",
+                "fetch_arrow_table", "to_arrow_table", "arrow", "fetch_record_batch", "to_arrow_reader")
+
+    def __init__(self, cursor: duckdb.DuckDBPyConnection):
+        self._cursor = cursor
+        self._pending: Optional[List[Any]] = None  # [sql, seconds so far, route]
+        self._profile_path: Optional[Path] = None
+        if settings.slow_query_profile_dir:
+            profile_dir = Path(settings.slow_query_profile_dir)
+            profile_dir.mkdir(parents=True, exist_ok=True)
+            self._profile_path = profile_dir / f".cursor-{uuid.uuid4().hex}.json"
+            # One call: enabled without an output file, DuckDB prints profiles to stdout
+            cursor.execute(f"PRAGMA enable_profiling = 'json'; PRAGMA profiling_output = '{self._profile_path}';")
+
+    def execute(self, sql: str, params: Any = None) -> "InstrumentedCursor":
+        self.flush()
+        route = current_route()
+        start = time.perf_counter()
+        if params is None:
+            self._cursor.execute(sql)
+        else:
+            self._cursor.execute(sql, params)
+        seconds = time.perf_counter() - start
+        if _is_status(self._cursor.description):
+            # BEGIN, COMMIT, SET...: done, and nothing to fetch
+            self._record(sql, seconds, None, route)
+        else:
+            self._pending = [sql, seconds, route]
+        return self
+
+    def executemany(self, sql: str, params: Any = None) -> "InstrumentedCursor":
+        self.flush()
+        route = current_route()
+        start = time.perf_counter()
+        self._cursor.executemany(sql, params)
+        self._record(sql, time.perf_counter() - start, None, route)
+        return self
+
+    def _fetch(self, name: str, *args: Any, **kwargs: Any) -> Any:
+        start = time.perf_counter()
+        result = getattr(self._cursor, name)(*args, **kwargs)
+        if self._pending is not None:
+            sql, seconds, route = self._pending
+            self._pending = None
+            self._record(sql, seconds + time.perf_counter() - start, _row_count(result), route)
+        return result
+
+    def flush(self) -> None:
+        """Record the statement whose result was never fetched, if any."""
+        if self._pending is not None:
+            sql, seconds, route = self._pending
+            self._pending = None
+            self._record(sql, seconds, None, route)
+
+    def _record(self, sql: str, seconds: float, rows: Optional[int], route: Optional[str]) -> None:
+        statement = normalize_sql(sql)
+        query_stats.record(statement, route, seconds, rows)
+        if seconds * 1000 < settings.slow_query_ms:
+            return
+        fields: Dict[str, Any] = {}
+        if self._profile_path is not None and self._profile_path.exists():
+            digest = hashlib.sha1(statement.encode("utf-8")).hexdigest()[:10]
+            stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S%f")
+            profile = self._profile_path.with_name(f"{stamp}-{digest}.json")
+            shutil.copyfile(self._profile_path, profile)
+            fields["profile"] = str(profile)
+        logger.warning("slow_query", statement=statement, duration_ms=round(seconds * 1000, 1),
+                       rows=rows, route=route, **fields)
+
+    def close(self) -> None:
+        self.flush()
+        self._cursor.close()
+        if self._profile_path is not None:
+            self._profile_path.unlink(missing_ok=True)
+
+    def commit(self) -> "InstrumentedCursor":
+        self.flush()
+        self._cursor.commit()
+        return self
+
+    def __getattr__(self, name: str) -> Any:
+        # Names the wrapped cursor lacks (older DuckDB Arrow methods) raise, so
+        # getattr fallbacks in db/duck.py still reach the old names
+        if name in self._FETCHES and hasattr(self._cursor, name):
+            return lambda *args, **kwargs: self._fetch(name, *args, **kwargs)
+        return getattr(self._cursor, name)
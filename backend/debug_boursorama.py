@@ -80,7 +80,7 @@ def check_boursorama_data():
     period_count = conn.execute("""
         SELECT COUNT(*) 
         FROM transactions 
-        WHERE DATE_TRUNC('month', ts) = ?
+        WHERE month = ?
         AND account_id = 'Boursorama'
     """, [latest_period]).fetchone()[0]
     
@@ -8,7 +8,7 @@ print("=== Checking Raw Transactions ===")
 # Check what's in transactions_raw
 raw_data = conn.execute("""
     SELECT 
-        DATE_TRUNC('month', ts) as month,
+        r.month,
         COUNT(*) as count,
         MIN(ts) as first_date,
         MAX(ts) as last_date,
@@ -16,7 +16,7 @@ raw_data = conn.execute("""
         i.user_id
     FROM transactions_raw r
     JOIN imports i ON i.id = r.import_batch_id
-    GROUP BY DATE_TRUNC('month', ts), i.bank, i.user_id
+    GROUP BY r.month, i.bank, i.user_id
     ORDER BY month DESC
 """).fetchall()
 
@@ -59,11 +59,11 @@ else:
 print("\n=== Checking Processed Transactions ===")
 tx_data = conn.execute("""
     SELECT 
-        DATE_TRUNC('month', ts) as month,
+        month,
         COUNT(*) as count,
         account_id
     FROM transactions
-    GROUP BY DATE_TRUNC('month', ts), account_id
+    GROUP BY month, account_id
     ORDER BY month DESC
 """).fetchall()
 
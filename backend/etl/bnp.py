@@ -1,8 +1,23 @@
 import io
 import pandas as pd
-from datetime import datetime
 from typing import List, Dict, Any
-from .common import parse_amount, ensure_windows_1252, extract_merchant
+from .common import (
+    ensure_windows_1252, text_column, strip_text, non_empty, parse_dates,
+    parse_amounts, extract_merchants, account_labels, build_rows
+)
+
+# DuckDB read_csv specification for the native ingest path (etl/duck_ingest.py)
+BNP_CSV_SPEC = {
+    'delimiter': ';',
+    'skip_rows': 2,
+    'encoding': 'cp1252',
+    'decimal_separator': ',',
+    'date_formats': ['%d-%m-%Y'],
+    'columns': {'date': 'Date operation', 'description': 'Libelle', 'amount': 'Montant'},
+    'account_label': ('Compte', 'Compte de chèques'),
+    'currency': 'EUR',
+    'extra': {'categorie': 'Categorie operation', 'sous_categorie': 'Sous Categorie'},
+}
 
 def load_bnp_csv(file_content: bytes) -> List[Dict[str, Any]]:
     """Load BNP CSV with deterministic parsing."""
@@ -35,48 +50,40 @@ def load_bnp_csv(file_content: bytes) -> List[Dict[str, Any]]:
         if missing_cols:
             raise ValueError(f"Missing required columns in BNP CSV: {missing_cols}")
         
-        rows = []
-        for _, row in df.iterrows():
-            # Skip empty rows
-            if pd.isna(row.get('Date operation')) or row.get('Date operation', '').strip() == '':
-                continue
-            
-            try:
-                # Parse date (dd-mm-yyyy format)
-                date_str = str(row['Date operation']).strip()
-                ts = datetime.strptime(date_str, '%d-%m-%Y')
-                
-                # Parse amount (comma decimals)
-                amount_raw = str(row['Montant']).strip()
-                amount = parse_amount(amount_raw, decimal_comma=True)
-                
-                # Description and merchant
-                description = str(row['Libelle']).strip()
-                merchant = extract_merchant(description)
-                
-                # Additional fields
-                account_label = row.get('Compte', 'Compte de chèques')
-                if pd.isna(account_label):
-                    account_label = 'Compte de chèques'
-                
-                rows.append({
-                    'ts': ts,
-                    'description': description,
-                    'merchant': merchant,
-                    'amount_raw': amount_raw,
-                    'amount': amount,
-                    'currency': 'EUR',
-                    'account_label': str(account_label).strip(),
-                    'extra': {
-                        'categorie': row.get('Categorie operation', ''),
-                        'sous_categorie': row.get('Sous Categorie', ''),
-                        'raw_row': dict(row)
-                    }
-                })
-                
-            except Exception as e:
-                print(f"Warning: Skipping BNP row due to parsing error: {e}")
-                continue
+        # Skip empty rows
+        df = df[non_empty(df['Date operation'])]
+        
+        # Parse date (dd-mm-yyyy format)
+        ts = parse_dates(df['Date operation'], ['%d-%m-%Y'])
+        
+        # Parse amount (comma decimals)
+        amount_raw = strip_text(df['Montant'])
+        amount = parse_amounts(amount_raw, decimal_comma=True)
+        
+        parsed = ts.notna() & amount.notna()
+        if not parsed.all():
+            print(f"Warning: Skipping {int((~parsed).sum())} BNP rows due to parsing errors")
+            df, ts, amount_raw, amount = df[parsed], ts[parsed], amount_raw[parsed], amount[parsed]
+        
+        # Description and merchant
+        description = strip_text(df['Libelle'])
+        merchant = extract_merchants(description)
+        
+        # Additional fields
+        account_label = account_labels(df, 'Compte', 'Compte de chèques')
+        
+        rows = build_rows(df, {
+            'ts': ts,
+            'description': description,
+            'merchant': merchant,
+            'amount_raw': amount_raw,
+            'amount': amount,
+            'currency': 'EUR',
+            'account_label': account_label,
+        }, extra={
+            'categorie': text_column(df, 'Categorie operation'),
+            'sous_categorie': text_column(df, 'Sous Categorie'),
+        })
         
         return rows
         
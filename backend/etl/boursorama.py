@@ -1,8 +1,32 @@
 import io
 import pandas as pd
-from datetime import datetime
 from typing import List, Dict, Any
-from .common import parse_amount, ensure_windows_1252, extract_merchant
+from .common import (
+    ensure_windows_1252, text_column, strip_text, non_empty, parse_dates,
+    parse_amounts, extract_merchants, account_labels, parse_optional_amounts,
+    build_rows
+)
+
+# DuckDB read_csv specification for the native ingest path (etl/duck_ingest.py)
+BOURSORAMA_CSV_SPEC = {
+    'delimiter': ';',
+    'skip_rows': 0,
+    'encoding': 'cp1252',
+    'decimal_separator': ',',
+    'date_formats': ['%Y-%m-%d', '%d-%m-%Y', '%d/%m/%Y'],
+    'columns': {'date': 'dateOp', 'description': 'label', 'amount': 'amount'},
+    'account_label': ('accountLabel', 'Boursorama Account'),
+    'currency': 'EUR',
+    'balance': 'accountbalance',
+    'extra': {
+        'category_parent': 'categoryParent',
+        'category': 'category',
+        'supplier_found': 'supplierFound',
+        'comment': 'comment',
+        'account_num': 'accountNum',
+    },
+    'stripped_extra': ['category_parent', 'category'],
+}
 
 def load_boursorama_csv(file_content: bytes) -> List[Dict[str, Any]]:
     """Load Boursorama CSV with deterministic parsing."""
@@ -37,77 +61,48 @@ def load_boursorama_csv(file_content: bytes) -> List[Dict[str, Any]]:
             available_cols = df.columns.tolist()
             print(f"Available Boursorama columns: {available_cols}")
         
-        rows = []
-        for _, row in df.iterrows():
-            # Skip empty rows
-            if pd.isna(row.get('dateOp')) or row.get('dateOp', '').strip() == '':
-                continue
-            
-            try:
-                # Parse date - detect format
-                date_str = str(row['dateOp']).strip()
-                ts = None
-                
-                # Try different date formats
-                date_formats = ['%Y-%m-%d', '%d-%m-%Y', '%d/%m/%Y']
-                for fmt in date_formats:
-                    try:
-                        ts = datetime.strptime(date_str, fmt)
-                        break
-                    except ValueError:
-                        continue
-                
-                if ts is None:
-                    print(f"Warning: Could not parse date '{date_str}', skipping row")
-                    continue
-                
-                # Parse amount (may have comma decimals)
-                amount_raw = str(row['amount']).strip()
-                amount = parse_amount(amount_raw, decimal_comma=True)
-                
-                # Description and merchant
-                description = str(row['label']).strip()
-                merchant = extract_merchant(description)
-                
-                # Category information (store in extra for now)
-                category_parent = row.get('categoryParent', '')
-                category = row.get('category', '')
-                
-                # Account information
-                account_label = row.get('accountLabel', 'Boursorama Account')
-                if pd.isna(account_label):
-                    account_label = 'Boursorama Account'
-                
-                # Balance if available
-                balance = None
-                if 'accountbalance' in row and not pd.isna(row['accountbalance']):
-                    try:
-                        balance = parse_amount(str(row['accountbalance']), decimal_comma=True)
-                    except:
-                        pass
-                
-                rows.append({
-                    'ts': ts,
-                    'description': description,
-                    'merchant': merchant,
-                    'amount_raw': amount_raw,
-                    'amount': amount,
-                    'currency': 'EUR',
-                    'account_label': str(account_label).strip(),
-                    'extra': {
-                        'category_parent': str(category_parent).strip(),
-                        'category': str(category).strip(),
-                        'balance': balance,
-                        'supplier_found': row.get('supplierFound', ''),
-                        'comment': row.get('comment', ''),
-                        'account_num': row.get('accountNum', ''),
-                        'raw_row': dict(row)
-                    }
-                })
-                
-            except Exception as e:
-                print(f"Warning: Skipping Boursorama row due to parsing error: {e}")
-                continue
+        # Skip empty rows
+        df = df[non_empty(df['dateOp'])]
+        
+        # Parse date - detect format
+        ts = parse_dates(df['dateOp'], ['%Y-%m-%d', '%d-%m-%Y', '%d/%m/%Y'])
+        
+        # Parse amount (may have comma decimals)
+        amount_raw = strip_text(df['amount'])
+        amount = parse_amounts(amount_raw, decimal_comma=True)
+        
+        parsed = ts.notna() & amount.notna()
+        if not parsed.all():
+            print(f"Warning: Skipping {int((~parsed).sum())} Boursorama rows due to parsing errors")
+            df, ts, amount_raw, amount = df[parsed], ts[parsed], amount_raw[parsed], amount[parsed]
+        
+        # Description and merchant
+        description = strip_text(df['label'])
+        merchant = extract_merchants(description)
+        
+        # Account information
+        account_label = account_labels(df, 'accountLabel', 'Boursorama Account')
+        
+        # Balance if available
+        balance = parse_optional_amounts(df, 'accountbalance', decimal_comma=True)
+        
+        rows = build_rows(df, {
+            'ts': ts,
+            'description': description,
+            'merchant': merchant,
+            'amount_raw': amount_raw,
+            'amount': amount,
+            'currency': 'EUR',
+            'account_label': account_label,
+        }, extra={
+            # Category information (store in extra for now)
+            'category_parent': strip_text(text_column(df, 'categoryParent')),
+            'category': strip_text(text_column(df, 'category')),
+            'balance': balance,
+            'supplier_found': text_column(df, 'supplierFound'),
+            'comment': text_column(df, 'comment'),
+            'account_num': text_column(df, 'accountNum'),
+        })
         
         return rows
         
@@ -0,0 +1,208 @@
+# backend/etl/duck_ingest.py
+"""DuckDB-native CSV ingest.
+
+Alternative to the pandas loaders: each bank's export format is described by a
+read_csv specification (see *_CSV_SPEC in the bank modules) and the file is
+typed and inserted into transactions_raw with a single INSERT ... SELECT, so
+rows never become Python objects. Parsing mirrors the pandas loaders (same
+date formats, parse_amount and extract_merchant semantics).
+"""
+import codecs
+import os
+import tempfile
+from typing import Any, Dict, List, Optional
+
+import duckdb
+
+from db.duck import get_conn, write_conn
+from services.metrics import import_rows_inserted, import_rows_parsed
+from .common import ensure_windows_1252
+from .bnp import BNP_CSV_SPEC
+from .boursorama import BOURSORAMA_CSV_SPEC
+from .revolut import REVOLUT_CSV_SPEC
+
+CSV_SPECS: Dict[str, Dict[str, Any]] = {
+    "BNP": BNP_CSV_SPEC,
+    "Boursorama": BOURSORAMA_CSV_SPEC,
+    "Revolut": REVOLUT_CSV_SPEC,
+}
+
+def _csv_bytes(content: bytes, encoding: str) -> bytes:
+    """Bytes DuckDB can read as UTF-8, decoded the same way as the pandas loaders."""
+    if content.startswith(codecs.BOM_UTF8):
+        content = content[len(codecs.BOM_UTF8):]
+    if content.isascii():
+        return content
+    if encoding == "utf-8":
+        try:
+            content.decode("utf-8")
+            return content
+        except UnicodeDecodeError:
+            return content.decode("latin-1").encode("utf-8")
+    # DuckDB has no cp1252 reader: transcode (only needed for non-ASCII files)
+    return ensure_windows_1252(content).encode("utf-8")
+
+def _quote_ident(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+def _quote_literal(value: str) -> str:
+    return "'" + value.replace("'", "''") + "'"
+
+def _strip(expr: str) -> str:
+    # str(value).strip(): NULL cells become 'nan' like str(nan) in the pandas loaders
+    return f"regexp_replace(COALESCE({expr}, 'nan'), '^\\s+|\\s+$', '', 'g')"
+
+def _amount(expr: str, decimal_comma: bool) -> str:
+    """SQL equivalent of parse_amount(); NULL where parse_amount would raise."""
+    s = f"replace({expr}, ' ', '')"
+    if decimal_comma:
+        # 1.234,56 -> 1234.56
+        normalized = (f"CASE WHEN contains({s}, ',') AND contains({s}, '.') "
+                      f"THEN replace(replace({s}, '.', ''), ',', '.') ELSE replace({s}, ',', '.') END")
+    else:
+        normalized = s
+    cleaned = f"regexp_replace({normalized}, '[^0-9.\\-]', '', 'g')"
+    return (f"CASE WHEN {s} = '' THEN 0.0 "
+            f"WHEN TRY_CAST({normalized} AS DOUBLE) IS NOT NULL THEN TRY_CAST({normalized} AS DOUBLE) "
+            f"WHEN {cleaned} = '' THEN 0.0 "
+            f"ELSE TRY_CAST({cleaned} AS DOUBLE) END")
+
+def _merchant(expr: str) -> str:
+    """SQL equivalent of extract_merchant()."""
+    cleaned = f"regexp_replace(upper({expr}), '\\s+', ' ', 'g')"
+    cleaned = f"regexp_replace({cleaned}, 'CARD\\s*\\d+/\\d+/\\d+', '', 'g')"
+    cleaned = f"regexp_replace({cleaned}, 'REF[:\\s]*\\d+', '', 'g')"
+    return f"left(regexp_replace({cleaned}, '^\\s+|\\s+$', '', 'g'), 50)"
+
+def _read_csv_sql(path: str, spec: Dict[str, Any]) -> str:
+    return (f"read_csv({_quote_literal(path)}, delim={_quote_literal(spec['delimiter'])}, "
+            f"skip={int(spec['skip_rows'])}, header=true, all_varchar=true, null_padding=true)")
+
+def _build_insert_sql(source: str, columns: Dict[str, str], spec: Dict[str, Any]) -> str:
+    """Build the INSERT ... SELECT for one file. columns maps cleaned header -> actual header."""
+    decimal_comma = spec["decimal_separator"] == ","
+
+    def col(name: str) -> str:
+        return "src." + _quote_ident(columns[name])
+
+    def optional(name: Optional[str]) -> Optional[str]:
+        return col(name) if name and name in columns else None
+
+    date_col = col(spec["columns"]["date"])
+    ts = "COALESCE(" + ", ".join(
+        f"try_strptime({_strip(date_col)}, {_quote_literal(fmt)})" for fmt in spec["date_formats"]
+    ) + ")"
+
+    amount_raw = _strip(col(spec["columns"]["amount"]))
+    amount = _amount("amount_raw", decimal_comma)
+    fee_col = optional(spec.get("fee"))
+    if spec.get("fee"):
+        fee_raw = f"regexp_replace(COALESCE({fee_col}, ''), '^\\s+|\\s+$', '', 'g')" if fee_col else "'0'"
+        # Subtract fee from amount (making it more negative for expenses)
+        amount = (f"CASE WHEN fee_raw IN ('', '0') THEN {amount} "
+                  f"ELSE {amount} - abs({_amount('fee_raw', decimal_comma)}) END")
+    else:
+        fee_raw = None
+
+    label_column, label_default = spec["account_label"]
+    label_col = optional(label_column)
+    account_label = (_strip(f"COALESCE({label_col}, {_quote_literal(label_default)})")
+                     if label_col else _quote_literal(label_default))
+
+    if spec.get("currency_column"):
+        currency = f"upper({_strip(col(spec['currency_column']))})"
+    else:
+        currency = _quote_literal(spec["currency"])
+
+    balance_col = optional(spec.get("balance"))
+    balance_raw = f"CASE WHEN {balance_col} IS NOT NULL THEN {_strip(balance_col)} END" if balance_col else "NULL"
+
+    extra_values = []
+    for key, name in spec["extra"].items():
+        value = optional(name)
+        if key in spec.get("stripped_extra", []):
+            value = _strip(value) if value else "''"
+        extra_values.append((key, value or "''"))
+    raw_row = "json_object(" + ", ".join(
+        f"{_quote_literal(name)}, src.{_quote_ident(actual)}" for name, actual in columns.items()
+    ) + ")"
+
+    extra_fields = [f"{_quote_literal(key)}, extra_{i}" for i, (key, _) in enumerate(extra_values)]
+    if fee_raw:
+        extra_fields.append("'fee_raw', fee_raw")
+    if spec.get("balance"):
+        extra_fields.append("'balance', balance")
+    extra_fields.append("'raw_row', raw_row")
+
+    filters = [f"{date_col} IS NOT NULL", f"{_strip(date_col)} <> ''"]
+    state_col = optional(spec.get("state"))
+    if state_col:
+        # Only process completed transactions
+        filters.append(f"upper(regexp_replace(COALESCE({state_col}, ''), '^\\s+|\\s+$', '', 'g')) IN ('', 'COMPLETED')")
+
+    return f"""
+        INSERT INTO transactions_raw
+        (id, import_batch_id, bank, ts, month, description, merchant, amount_raw, amount, currency, account_label, extra)
+        SELECT uuid(), $import_batch_id, $bank, ts, DATE_TRUNC('month', ts)::DATE, description, {_merchant('description')},
+               amount_raw, amount, currency, account_label, json_object({', '.join(extra_fields)})
+        FROM (
+            SELECT *,
+                   {amount} AS amount,
+                   {_amount('balance_raw', decimal_comma)} AS balance
+            FROM (
+                SELECT {ts} AS ts,
+                       {_strip(col(spec['columns']['description']))} AS description,
+                       {amount_raw} AS amount_raw,
+                       {fee_raw or "NULL"} AS fee_raw,
+                       {currency} AS currency,
+                       {account_label} AS account_label,
+                       {balance_raw} AS balance_raw,
+                       {''.join(f"{value} AS extra_{i}, " for i, (_, value) in enumerate(extra_values))}{raw_row} AS raw_row,
+                       row_number() OVER () AS line_no
+                FROM {source} src
+                WHERE {' AND '.join(filters)}
+            ) parsed
+        ) typed
+        WHERE ts IS NOT NULL AND amount IS NOT NULL
+        ORDER BY DATE_TRUNC('month', ts), line_no  -- month-clustered row groups, file order within a month
+    """
+
+def ingest_csv_duckdb(file_content: bytes, bank: str, import_batch_id: str,
+                      conn: Optional[duckdb.DuckDBPyConnection] = None) -> int:
+    """Parse a bank CSV inside DuckDB and insert it into transactions_raw. Returns rows inserted."""
+    spec = CSV_SPECS.get(bank)
+    if spec is None:
+        raise ValueError(f"No DuckDB CSV specification for bank: {bank}")
+    conn = conn or get_conn()
+
+    fd, path = tempfile.mkstemp(suffix=".csv")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(_csv_bytes(file_content, spec["encoding"]))
+        # Parsed once into a temp table: the rows read and the rows inserted
+        # (after the state/date filters) are both counted from it
+        conn.execute(f"CREATE OR REPLACE TEMP TABLE csv_rows AS SELECT * FROM {_read_csv_sql(path, spec)}")
+        parsed = conn.execute("SELECT COUNT(*) FROM csv_rows").fetchone()[0]
+
+        # Clean column names (whitespace and BOM), like the pandas loaders
+        header = [row[0] for row in conn.execute("DESCRIBE csv_rows").fetchall()]
+        columns = {name.strip().replace("\ufeff", ""): name for name in header}
+        required_cols: List[str] = list(spec["columns"].values())
+        if spec.get("currency_column"):
+            required_cols.append(spec["currency_column"])
+        missing_cols = [c for c in required_cols if c not in columns]
+        if missing_cols:
+            raise ValueError(f"Missing required columns in {bank} CSV: {missing_cols}")
+
+        sql = _build_insert_sql("csv_rows", columns, spec)
+        with write_conn(conn):
+            inserted = conn.execute(sql, {"import_batch_id": import_batch_id, "bank": bank}).fetchone()[0]
+            conn.commit()
+        import_rows_parsed.inc(parsed, bank=bank)
+        import_rows_inserted.inc(inserted, bank=bank)
+        return int(inserted)
+    except duckdb.Error as e:
+        raise ValueError(f"Error parsing {bank} CSV: {e}")
+    finally:
+        conn.execute("DROP TABLE IF EXISTS csv_rows")
+        os.unlink(path)
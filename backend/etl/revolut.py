@@ -1,8 +1,26 @@
 import io
 import pandas as pd
-from datetime import datetime
 from typing import List, Dict, Any
-from .common import parse_amount, extract_merchant
+from .common import (
+    text_column, strip_text, non_empty, parse_dates, parse_amounts,
+    extract_merchants, account_labels, parse_optional_amounts, build_rows
+)
+
+# DuckDB read_csv specification for the native ingest path (etl/duck_ingest.py)
+REVOLUT_CSV_SPEC = {
+    'delimiter': ',',
+    'skip_rows': 0,
+    'encoding': 'utf-8',
+    'decimal_separator': '.',
+    'date_formats': ['%Y-%m-%d %H:%M:%S', '%d-%m-%Y %H:%M:%S', '%Y-%m-%d', '%d-%m-%Y'],
+    'columns': {'date': 'Completed Date', 'description': 'Description', 'amount': 'Amount'},
+    'account_label': ('Product', 'Revolut Card'),
+    'currency_column': 'Currency',
+    'balance': 'Balance',
+    'state': 'State',
+    'fee': 'Fee',
+    'extra': {'type': 'Type', 'started_date': 'Started Date', 'state': 'State'},
+}
 
 def load_revolut_csv(file_content: bytes) -> List[Dict[str, Any]]:
     """Load Revolut CSV with deterministic parsing."""
@@ -32,93 +50,65 @@ def load_revolut_csv(file_content: bytes) -> List[Dict[str, Any]]:
             print(f"Available Revolut columns: {df.columns.tolist()}")
             raise ValueError(f"Missing required columns in Revolut CSV: {missing_cols}")
         
-        rows = []
-        for _, row in df.iterrows():
-            # Skip empty rows
-            if pd.isna(row.get('Completed Date')) or row.get('Completed Date', '').strip() == '':
-                continue
-            
-            # Only process completed transactions
-            state = row.get('State', '').strip().upper()
-            if state and state != 'COMPLETED':
-                continue
-            
-            try:
-                # Parse completed date
-                date_str = str(row['Completed Date']).strip()
-                ts = None
-                
-                # Try different datetime formats
-                date_formats = [
-                    '%Y-%m-%d %H:%M:%S',
-                    '%d-%m-%Y %H:%M:%S', 
-                    '%Y-%m-%d',
-                    '%d-%m-%Y'
-                ]
-                
-                for fmt in date_formats:
-                    try:
-                        ts = datetime.strptime(date_str, fmt)
-                        break
-                    except ValueError:
-                        continue
-                
-                if ts is None:
-                    print(f"Warning: Could not parse date '{date_str}', skipping row")
-                    continue
-                
-                # Parse amount (no comma decimals, standard decimal point)
-                amount_raw = str(row['Amount']).strip()
-                amount = parse_amount(amount_raw, decimal_comma=False)
-                
-                # Parse fee if present and merge into amount
-                fee_raw = row.get('Fee', '0').strip()
-                if fee_raw and fee_raw != '0':
-                    fee = parse_amount(fee_raw, decimal_comma=False)
-                    # Subtract fee from amount (making it more negative for expenses)
-                    amount = amount - abs(fee)
-                
-                # Description and merchant
-                description = str(row['Description']).strip()
-                merchant = extract_merchant(description)
-                
-                # Currency (expect GBP but could be others)
-                currency = str(row['Currency']).strip().upper()
-                
-                # Account information
-                product = row.get('Product', 'Revolut Card')
-                if pd.isna(product):
-                    product = 'Revolut Card'
-                
-                # Balance if available
-                balance = None
-                if 'Balance' in row and not pd.isna(row['Balance']):
-                    try:
-                        balance = parse_amount(str(row['Balance']), decimal_comma=False)
-                    except:
-                        pass
-                
-                rows.append({
-                    'ts': ts,
-                    'description': description,
-                    'merchant': merchant,
-                    'amount_raw': amount_raw,
-                    'amount': amount,
-                    'currency': currency,
-                    'account_label': str(product).strip(),
-                    'extra': {
-                        'type': row.get('Type', ''),
-                        'started_date': row.get('Started Date', ''),
-                        'state': row.get('State', ''),
-                        'fee_raw': fee_raw,
-                        'balance': balance,
-                        'raw_row': dict(row)
-                    }
-                })
-                
-            except Exception as e:
-                print(f"Warning: Skipping Revolut row due to parsing error: {e}")
-                continue
+        # Skip empty rows
+        df = df[non_empty(df['Completed Date'])]
+        
+        # Only process completed transactions
+        state = text_column(df, 'State').fillna('').astype(str).str.strip().str.upper()
+        df = df[(state == '') | (state == 'COMPLETED')]
+        
+        # Parse completed date
+        ts = parse_dates(df['Completed Date'], [
+            '%Y-%m-%d %H:%M:%S',
+            '%d-%m-%Y %H:%M:%S', 
+            '%Y-%m-%d',
+            '%d-%m-%Y'
+        ])
+        
+        # Parse amount (no comma decimals, standard decimal point)
+        amount_raw = strip_text(df['Amount'])
+        amount = parse_amounts(amount_raw, decimal_comma=False)
+        
+        # Parse fee if present and merge into amount
+        fee_raw = text_column(df, 'Fee', '0').fillna('').astype(str).str.strip()
+        has_fee = (fee_raw != '') & (fee_raw != '0')
+        fee = parse_amounts(fee_raw.where(has_fee, '0'), decimal_comma=False)
+        # Subtract fee from amount (making it more negative for expenses)
+        amount = amount.where(~has_fee, amount - fee.abs())
+        
+        parsed = ts.notna() & amount.notna()
+        if not parsed.all():
+            print(f"Warning: Skipping {int((~parsed).sum())} Revolut rows due to parsing errors")
+            df, ts, amount_raw, amount, fee_raw = df[parsed], ts[parsed], amount_raw[parsed], amount[parsed], fee_raw[parsed]
+        
+        # Description and merchant
+        description = strip_text(df['Description'])
+        merchant = extract_merchants(description)
+        
+        # Currency (expect GBP but could be others)
+        currency = strip_text(df['Currency']).str.upper()
+        
+        # Account information
+        account_label = account_labels(df, 'Product', 'Revolut Card')
+        
+        # Balance if available
+        balance = parse_optional_amounts(df, 'Balance', decimal_comma=False)
+        
+        rows = build_rows(df, {
+            'ts': ts,
+            'description': description,
+            'merchant': merchant,
+            'amount_raw': amount_raw,
+            'amount': amount,
+            'currency': currency,
+            'account_label': account_label,
+        }, extra={
+            'type': text_column(df, 'Type'),
+            'started_date': text_column(df, 'Started Date'),
+            'state': text_column(df, 'State'),
+            'fee_raw': fee_raw,
+            'balance': balance,
+        })
         
         return rows
         
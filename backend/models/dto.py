@@ -35,8 +35,10 @@ class UploadResponse(BaseModel):
 
 # Import Commit DTOs  
 class ImportCommitRequest(BaseModel):
-    period_month: str  # Accept string and convert to date in the endpoint
+    period_month: Optional[str] = None  # Accept string and convert to date in the endpoint
     accounts: Optional[List[str]] = None
+    import_batch_ids: Optional[List[str]] = None  # Commit only these imports' rows
+    detect_transfers: Optional[bool] = None  # Auto-confirm transfers; defaults to AUTO_TRANSFERS
 
 class ImportCommitResponse(BaseModel):
     period_month: date
@@ -45,6 +47,7 @@ class ImportCommitResponse(BaseModel):
     rules_applied: int
     rollup_updated: bool
     uncategorized_count: int
+    transfers_confirmed: int = 0
 
 # P&L DTOs
 class PLSummaryRequest(BaseModel):
@@ -171,13 +174,20 @@ class TransferProposal(BaseModel):
     from_account: str
     to_account: str
     amount: float
+    to_amount: Optional[float] = None  # Inflow leg, in its own currency
+    currencies: List[str] = []  # [outflow, inflow]
     descriptions: List[str]
     date_difference_days: int
     confidence: float
 
 class TransferProposeRequest(BaseModel):
-    month: date
+    # A month, or a start..end range (either leg may fall up to window_days outside it)
+    month: Optional[date] = None
+    start: Optional[date] = None
+    end: Optional[date] = None
     accounts: Optional[List[str]] = None
+    window_days: Optional[int] = Field(None, ge=0, le=31)  # default: TRANSFER_WINDOW_DAYS
+    limit: int = Field(100, ge=1, le=1000)
 
 class TransferProposeResponse(BaseModel):
     proposals: List[TransferProposal]
@@ -108,9 +108,9 @@ def get_journal_entries_by_month(month: date) -> List[Dict[str, Any]]:
         SELECT id, period_start, period_end, observations_md, decisions_md, 
                created_at, updated_at
         FROM journal_entries 
-        WHERE DATE_TRUNC('month', period_start) = ?
+        WHERE period_start >= ? AND period_start < ?::DATE + INTERVAL 1 MONTH
         ORDER BY period_start DESC
-    """, [month]).fetchall()
+    """, [month, month]).fetchall()
     
     entries = []
     for row in result:
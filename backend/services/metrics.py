@@ -0,0 +1,187 @@
+# backend/services/metrics.py
+"""In-process metrics in the Prometheus text exposition format.
+
+Counters and histograms are updated where the work happens (the request
+middleware, the ETL, the import commit). Values owned by other modules
+(query stats, caches, DuckDB memory) are read by collectors when
+/api/metrics is scraped, so they cost nothing in between.
+"""
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Sequence, Tuple
+
+import duckdb
+
+from db.duck import execute_query
+from db.query_stats import LATENCY_BUCKETS, query_stats
+
+LabelValues = Tuple[str, ...]
+
+def _escape(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _labels(names: Sequence[str], values: Sequence[Any]) -> str:
+    if not names:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values)) + "}"
+
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+def _header(name: str, help_text: str, kind: str) -> List[str]:
+    return [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+
+def _histogram_lines(name: str, label_names: Sequence[str], label_values: Sequence[Any],
+                     cumulative: Sequence[Tuple[float, int]], count: int, total: float) -> List[str]:
+    """Sample lines of one histogram series; cumulative is [(upper bound, count <= bound)]."""
+    lines = []
+    for bound, n in list(cumulative) + [(float("inf"), count)]:
+        labels = _labels(list(label_names) + ["le"], list(label_values) + [_number(bound)])
+        lines.append(f"{name}_bucket{labels} {n}")
+    labels = _labels(label_names, label_values)
+    lines.append(f"{name}_sum{labels} {_number(total)}")
+    lines.append(f"{name}_count{labels} {count}")
+    return lines
+
+class Counter:
+    """Monotonic counter with optional labels."""
+
+    def __init__(self, name: str, help_text: str, labels: Sequence[str] = ()):
+        self.name, self.help_text, self.label_names = name, help_text, tuple(labels)
+        self._values: Dict[LabelValues, float] = {}
+        self._lock = threading.Lock()
+        _REGISTRY.append(self)
+
+    def inc(self, amount: float = 1, **labels: Any) -> None:
+        key = tuple(str(labels[name]) for name in self.label_names)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels: Any) -> float:
+        return self._values.get(tuple(str(labels[name]) for name in self.label_names), 0)
+
+    def render(self) -> List[str]:
+        with self._lock:
+            values = sorted(self._values.items())
+        return _header(self.name, self.help_text, "counter") + [
+            f"{self.name}{_labels(self.label_names, key)} {_number(value)}" for key, value in values
+        ]
+
+class Histogram:
+    """Histogram of observations (seconds, by default buckets) with optional labels."""
+
+    def __init__(self, name: str, help_text: str, labels: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.name, self.help_text, self.label_names = name, help_text, tuple(labels)
+        self.buckets = tuple(buckets)
+        # Per label set: [count per bucket (+ overflow), count, sum]
+        self._series: Dict[LabelValues, List[Any]] = {}
+        self._lock = threading.Lock()
+        _REGISTRY.append(self)
+
+    def observe(self, value: float, **labels: Any) -> None:
+        key = tuple(str(labels[name]) for name in self.label_names)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0, 0.0]
+            index = next((i for i, bound in enumerate(self.buckets) if value <= bound), len(self.buckets))
+            series[0][index] += 1
+            series[1] += 1
+            series[2] += value
+
+    @contextmanager
+    def time(self, **labels: Any) -> Iterator[None]:
+        """Observe the duration of the block, in seconds."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def count(self, **labels: Any) -> int:
+        series = self._series.get(tuple(str(labels[name]) for name in self.label_names))
+        return series[1] if series else 0
+
+    def render(self) -> List[str]:
+        with self._lock:
+            series = sorted((key, [list(s[0]), s[1], s[2]]) for key, s in self._series.items())
+        lines = _header(self.name, self.help_text, "histogram")
+        for key, (buckets, count, total) in series:
+            cumulative, running = [], 0
+            for bound, n in zip(self.buckets, buckets):
+                running += n
+                cumulative.append((bound, running))
+            lines += _histogram_lines(self.name, self.label_names, key, cumulative, count, total)
+        return lines
+
+_REGISTRY: List[Any] = []
+_COLLECTORS: List[Callable[[], List[str]]] = []
+# name -> callable returning {"hits", "misses", "entries"}
+_CACHES: Dict[str, Callable[[], Dict[str, int]]] = {}
+
+def register_collector(collect: Callable[[], List[str]]) -> None:
+    """Add a function returning exposition lines, called on every scrape."""
+    _COLLECTORS.append(collect)
+
+def register_cache(name: str, stats: Callable[[], Dict[str, int]]) -> None:
+    """Expose a cache's hit/miss counts (and hit ratio) under cache=name."""
+    _CACHES[name] = stats
+
+http_requests = Counter("http_requests_total", "HTTP requests served.", ["method", "route", "status"])
+http_request_duration = Histogram("http_request_duration_seconds", "HTTP request latency.", ["method", "route"])
+import_rows_parsed = Counter("import_rows_parsed_total", "Rows read from uploaded bank CSVs.", ["bank"])
+import_rows_inserted = Counter("import_rows_inserted_total", "Raw transactions inserted by uploads.", ["bank"])
+commit_stage_duration = Histogram("import_commit_stage_seconds", "Import commit duration per stage.", ["stage"])
+
+def _collect_queries() -> List[str]:
+    snapshot = query_stats.snapshot()
+    lines = _header("db_query_duration_seconds", "DuckDB statement latency, by normalized statement and route.",
+                    "histogram")
+    for s in snapshot:
+        lines += _histogram_lines("db_query_duration_seconds", ("statement", "route"), (s["statement"], s["route"]),
+                                  s["buckets"], s["count"], s["total_seconds"])
+    lines += _header("db_query_rows_total", "Rows returned by DuckDB statements.", "counter")
+    lines += [f"db_query_rows_total{_labels(('statement', 'route'), (s['statement'], s['route']))} {s['rows']}"
+              for s in snapshot]
+    return lines
+
+def _collect_caches() -> List[str]:
+    stats = {name: read() for name, read in sorted(_CACHES.items())}
+    lines = _header("cache_hits_total", "Cache lookups answered from the cache.", "counter")
+    lines += [f'cache_hits_total{{cache="{name}"}} {s["hits"]}' for name, s in stats.items()]
+    lines += _header("cache_misses_total", "Cache lookups that missed.", "counter")
+    lines += [f'cache_misses_total{{cache="{name}"}} {s["misses"]}' for name, s in stats.items()]
+    lines += _header("cache_hit_ratio", "Hits over lookups since start (0 before the first lookup).", "gauge")
+    lines += [f'cache_hit_ratio{{cache="{name}"}} '
+              f'{_number(s["hits"] / (s["hits"] + s["misses"]) if s["hits"] + s["misses"] else 0.0)}'
+              for name, s in stats.items()]
+    lines += _header("cache_entries", "Entries held by the cache.", "gauge")
+    lines += [f'cache_entries{{cache="{name}"}} {s["entries"]}' for name, s in stats.items()]
+    return lines
+
+def _collect_duckdb_memory() -> List[str]:
+    try:
+        rows = execute_query("SELECT tag, memory_usage_bytes, temporary_storage_bytes FROM duckdb_memory()")
+    except duckdb.Error:  # duckdb_memory() needs DuckDB 0.10+
+        return []
+    lines = _header("duckdb_memory_bytes", "Memory held by DuckDB's buffer manager, by component.", "gauge")
+    lines += [f'duckdb_memory_bytes{{tag="{tag}"}} {memory}' for tag, memory, _ in rows]
+    lines += _header("duckdb_temporary_storage_bytes", "Data DuckDB spilled to disk, by component.", "gauge")
+    lines += [f'duckdb_temporary_storage_bytes{{tag="{tag}"}} {spilled}' for tag, _, spilled in rows]
+    return lines
+
+register_collector(_collect_queries)
+register_collector(_collect_caches)
+register_collector(_collect_duckdb_memory)
+
+def render_metrics() -> str:
+    lines: List[str] = []
+    for metric in _REGISTRY:
+        lines += metric.render()
+    for collect in _COLLECTORS:
+        lines += collect()
+    return "\n".join(lines) + "\n"
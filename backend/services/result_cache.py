@@ -0,0 +1,80 @@
+# backend/services/result_cache.py
+"""Bounded, data-versioned cache for read endpoints.
+
+Entries are keyed on the request plus the data version current when they
+were computed. Every write path calls bump_data_version() *after* its commit,
+so a reader racing a write can at worst cache the pre-write result under the
+old version, which no later lookup asks for.
+"""
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from typing import Any, Hashable, Optional, Tuple
+
+_data_version = 0
+_version_lock = threading.Lock()
+
+def get_data_version() -> int:
+    return _data_version
+
+def bump_data_version() -> int:
+    """Invalidate every cached result; call after a committed write to derived data."""
+    global _data_version
+    with _version_lock:
+        _data_version += 1
+        return _data_version
+
+def compute_etag(payload: Any) -> str:
+    """Strong ETag of a JSON payload; content-based so it stays valid across restarts."""
+    body = json.dumps(payload, sort_keys=True, default=str, separators=(",", ":"))
+    return '"' + hashlib.sha1(body.encode("utf-8")).hexdigest()[:20] + '"'
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """If-None-Match uses weak comparison: a W/ prefix on the client's tag is ignored."""
+    if not if_none_match:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in candidates or any(tag.removeprefix("W/") == etag for tag in candidates)
+
+class LRUCache:
+    """Thread-safe LRU of (value, etag) pairs holding at most max_entries."""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Hashable, Tuple[Any, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable) -> Optional[Tuple[Any, str]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key: Hashable, value: Any) -> str:
+        """Store a value and return its ETag."""
+        etag = compute_etag(value)
+        if self.max_entries <= 0:
+            return etag
+        with self._lock:
+            self._entries[key] = (value, etag)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return etag
+
+    def stats(self) -> dict:
+        return {"hits": self.hits, "misses": self.misses, "entries": len(self)}
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
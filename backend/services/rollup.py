@@ -1,41 +1,230 @@
 # backend/services/rollup.py
-from typing import List, Optional, Dict, Any
+from typing import Iterable, List, Optional, Dict, Any, Tuple
 from datetime import date, timedelta
-from db.duck import execute_update, execute_query, get_conn
+import duckdb
+from db.duck import execute_many, execute_query, get_conn, transaction
+from services.result_cache import bump_data_version
 
-def rebuild_rollup_monthly(month: date, user_id: str, accounts: Optional[List[str]] = None) -> Dict[str, Any]:
-    # Delete existing
+def _replace_cells(conn: duckdb.DuckDBPyConnection, table: str, keys: List[str], columns: List[str],
+                   scope_sql: str, scope_params: List[Any], source_sql: str, source_params: List[Any]) -> None:
+    """Make the rows of table matching scope_sql those selected by source_sql; no commit.
+
+    Cells still present are updated in place, new ones inserted and only the
+    vanished ones deleted: DuckDB 1.0 rejects deleting a primary key and
+    inserting it again in one transaction.
+    """
+    conn.execute(f"""
+        CREATE OR REPLACE TEMP TABLE rebuilt_cells AS
+        SELECT * FROM ({source_sql}) AS s({", ".join(columns)});
+    """, source_params)
+    matches = " AND ".join(f"c.{key} = {table}.{key}" for key in keys)
+    conn.execute(f"""
+        DELETE FROM {table}
+        WHERE {scope_sql}
+          AND NOT EXISTS (SELECT 1 FROM rebuilt_cells c WHERE {matches});
+    """, scope_params)
+    conn.execute(f"""
+        INSERT INTO {table} ({", ".join(columns)})
+        SELECT * FROM rebuilt_cells
+        ON CONFLICT ({", ".join(keys)}) DO UPDATE
+        SET {", ".join(f"{c} = EXCLUDED.{c}" for c in columns if c not in keys)};
+    """)
+    conn.execute("DROP TABLE rebuilt_cells;")
+
+def _rebuild_rollup_cells(conn: duckdb.DuckDBPyConnection, month: date,
+                          accounts: Optional[List[str]] = None) -> None:
+    """Re-aggregate one month's rollup cells (all accounts or the given ones); no commit."""
     params = [month]
     acc_sql = ""
     if accounts:
         acc_sql = "AND account_id IN (" + ",".join("?"*len(accounts)) + ")"
         params += accounts
-    execute_update(f"""
-        DELETE FROM rollup_monthly
-        WHERE month = ?
-          {acc_sql if accounts else ""};
-    """, params)
 
-    # Insert aggregated (exclude transfers)
-    params = [month]
-    if accounts:
-        params += accounts
-    execute_update(f"""
-        INSERT INTO rollup_monthly (account_id, month, category, subcategory, income, expense, net)
+    # Aggregated (exclude transfers)
+    _replace_cells(
+        conn, "rollup_monthly",
+        ["account_id", "month", "category", "subcategory"],
+        ["account_id", "month", "category", "subcategory", "income", "expense", "net", "txn_count"],
+        f"month = ? {acc_sql}", params,
+        f"""
         SELECT
             t.account_id,
-            DATE_TRUNC('month', t.ts) AS month,
+            t.month,
             COALESCE(t.category, 'Uncategorized') AS category,
             COALESCE(t.subcategory, '') AS subcategory,
             SUM(CASE WHEN t.amount > 0 AND NOT t.is_transfer THEN t.amount ELSE 0 END) AS income,
             SUM(CASE WHEN t.amount < 0 AND NOT t.is_transfer THEN -t.amount ELSE 0 END) AS expense,
-            SUM(CASE WHEN NOT t.is_transfer THEN t.amount ELSE 0 END) AS net
+            SUM(CASE WHEN NOT t.is_transfer THEN t.amount ELSE 0 END) AS net,
+            COUNT(*) AS txn_count
         FROM transactions t
-        WHERE DATE_TRUNC('month', t.ts) = ?
-          {acc_sql if accounts else ""}
-        GROUP BY 1,2,3,4;
+        WHERE t.month = ?
+          {acc_sql}
+        GROUP BY 1,2,3,4
+        """, params,
+    )
+
+    # The rebuilt cells are clean again
+    conn.execute(f"""
+        DELETE FROM rollup_dirty
+        WHERE month = ?
+          {acc_sql if accounts else ""};
     """, params)
 
+# Coarser tiers materialized in rollup_period (migration 005)
+ROLLUP_GRAINS = ('week', 'quarter', 'year', 'ttm')
+
+def add_months(month: date, months: int) -> date:
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+def period_bounds(grain: str, day: date) -> Tuple[date, date]:
+    """(start, end) of the grain's period containing day; for ttm, the 12 months ending in day's month."""
+    day = date(day.year, day.month, day.day)
+    if grain == 'week':
+        start = day - timedelta(days=day.weekday())  # ISO weeks start on Monday
+        return start, start + timedelta(days=6)
+    if grain == 'quarter':
+        start = date(day.year, 3 * ((day.month - 1) // 3) + 1, 1)
+        return start, add_months(start, 3) - timedelta(days=1)
+    if grain == 'year':
+        return date(day.year, 1, 1), date(day.year, 12, 31)
+    if grain == 'ttm':
+        month = date(day.year, day.month, 1)
+        return add_months(month, -11), add_months(month, 1) - timedelta(days=1)
+    raise ValueError(f"Unknown rollup grain: {grain}")
+
+def _rebuild_period_cells(conn: duckdb.DuckDBPyConnection, grain: str,
+                          periods: Iterable[Tuple[date, date]],
+                          accounts: Optional[List[str]] = None) -> None:
+    """Re-aggregate some periods of one tier (all accounts or the given ones); no commit."""
+    periods = sorted(set(periods))
+    if not periods:
+        return
+    acc_sql = ""
+    acc_params: List[Any] = []
+    if accounts:
+        acc_sql = "AND account_id IN (" + ",".join("?"*len(accounts)) + ")"
+        acc_params = list(accounts)
+
+    values = ", ".join("(?::DATE, ?::DATE)" for _ in periods)
+    if grain == 'week':
+        # Weeks straddle months, so they come from transactions
+        source = f"""
+            SELECT p.period_start, p.period_end, t.account_id,
+                   COALESCE(t.category, 'Uncategorized'),
+                   COALESCE(t.subcategory, ''),
+                   SUM(CASE WHEN t.amount > 0 AND NOT t.is_transfer THEN t.amount ELSE 0 END),
+                   SUM(CASE WHEN t.amount < 0 AND NOT t.is_transfer THEN -t.amount ELSE 0 END),
+                   SUM(CASE WHEN NOT t.is_transfer THEN t.amount ELSE 0 END),
+                   COUNT(*)
+            FROM (VALUES {values}) AS p(period_start, period_end)
+            JOIN transactions t
+              ON t.ts >= p.period_start AND t.ts < p.period_end + INTERVAL 1 DAY
+              {acc_sql}
+            GROUP BY 1, 2, 3, 4, 5
+        """
+    else:
+        source = f"""
+            SELECT p.period_start, p.period_end, r.account_id, r.category, r.subcategory,
+                   SUM(r.income), SUM(r.expense), SUM(r.net), SUM(r.txn_count)
+            FROM (VALUES {values}) AS p(period_start, period_end)
+            JOIN rollup_monthly r
+              ON r.month BETWEEN p.period_start AND p.period_end
+              {acc_sql}
+            GROUP BY 1, 2, 3, 4, 5
+        """
+    _replace_cells(
+        conn, "rollup_period",
+        ["grain", "period_start", "account_id", "category", "subcategory"],
+        ["grain", "period_start", "period_end", "account_id", "category", "subcategory",
+         "income", "expense", "net", "txn_count"],
+        f"grain = ? AND period_start IN ({','.join('?'*len(periods))}) {acc_sql}",
+        [grain, *[start for start, _ in periods], *acc_params],
+        f"SELECT ?, * FROM ({source})",
+        [grain, *[day for period in periods for day in period], *acc_params],
+    )
+
+def _refresh_rollup_periods(conn: duckdb.DuckDBPyConnection, months: Iterable[date],
+                            accounts: Optional[List[str]] = None, full: bool = False) -> None:
+    """Bring the week/quarter/year/ttm tiers in line with rebuilt months; no commit.
+
+    full re-aggregates every trailing window, not only the materialized ones.
+    """
+    months = sorted({date(m.year, m.month, 1) for m in months})
+    if not months:
+        return
+    for grain in ('quarter', 'year'):
+        _rebuild_period_cells(conn, grain, [period_bounds(grain, m) for m in months], accounts)
+
+    weeks = []
+    for month in months:
+        start, month_end = period_bounds('week', month)[0], add_months(month, 1)
+        while start < month_end:
+            weeks.append((start, start + timedelta(days=6)))
+            start += timedelta(days=7)
+    _rebuild_period_cells(conn, 'week', weeks, accounts)
+
+    # Trailing windows are materialized for every month from the first to
+    # the last one with data; a month feeds the windows ending in it and the
+    # 11 months after
+    first_month, last_month = conn.execute("SELECT MIN(month), MAX(month) FROM rollup_monthly;").fetchone()
+    last_end = None if full else _ttm_last_end(conn)
+    if last_month is None:
+        conn.execute("DELETE FROM rollup_period WHERE grain = 'ttm';")
+        conn.execute("DELETE FROM rollup_period_extent WHERE grain = 'ttm';")
+        return
+    conn.execute("DELETE FROM rollup_period WHERE grain = 'ttm' AND period_end > ?;",
+                 [period_bounds('ttm', last_month)[1]])
+    conn.execute("""
+        INSERT INTO rollup_period_extent (grain, last_end) VALUES ('ttm', ?)
+        ON CONFLICT (grain) DO UPDATE SET last_end = EXCLUDED.last_end;
+    """, [period_bounds('ttm', last_month)[1]])
+
+    # Windows past the previously materialized range are new for every account
+    new_ends = []
+    end = add_months(date(last_end.year, last_end.month, 1), 1) if last_end else first_month
+    while end <= last_month:
+        new_ends.append(end)
+        end = add_months(end, 1)
+    changed_ends = {add_months(m, k) for m in months for k in range(12)}
+    changed_ends = {e for e in changed_ends if e <= last_month and e not in new_ends}
+    _rebuild_period_cells(conn, 'ttm', [period_bounds('ttm', e) for e in new_ends])
+    _rebuild_period_cells(conn, 'ttm', [period_bounds('ttm', e) for e in changed_ends], accounts)
+
+def _ttm_last_end(conn: duckdb.DuckDBPyConnection) -> Optional[date]:
+    """End of the last materialized trailing window (None when there is none)."""
+    row = conn.execute("SELECT last_end FROM rollup_period_extent WHERE grain = 'ttm';").fetchone()
+    return row[0] if row else None
+
+def rebuild_rollup_periods() -> int:
+    """Rebuild every rollup_period tier from scratch; returns the number of rows."""
+    with transaction() as conn:
+        # Only cells no month feeds any more are deleted: the refresh below
+        # replaces the others in place (see _replace_cells)
+        conn.execute("""
+            DELETE FROM rollup_period
+            WHERE NOT EXISTS (
+                SELECT 1 FROM rollup_monthly r
+                WHERE r.account_id = rollup_period.account_id
+                  AND r.category = rollup_period.category
+                  AND r.subcategory = rollup_period.subcategory
+                  AND r.month BETWEEN DATE_TRUNC('month', rollup_period.period_start) AND rollup_period.period_end
+            );
+        """)
+        months = [row[0] for row in conn.execute("SELECT DISTINCT month FROM rollup_monthly;").fetchall()]
+        if months:
+            _refresh_rollup_periods(conn, months, full=True)
+        else:
+            conn.execute("DELETE FROM rollup_period_extent;")
+    bump_data_version()
+    return execute_query("SELECT COUNT(*) FROM rollup_period;")[0][0]
+
+def rebuild_rollup_monthly(month: date, user_id: str, accounts: Optional[List[str]] = None) -> Dict[str, Any]:
+    with transaction() as conn:
+        _rebuild_rollup_cells(conn, month, accounts)
+        _refresh_rollup_periods(conn, [month], accounts)
+    bump_data_version()
+
     # Summary
     summary = get_rollup_summary(month, accounts)
     summary["rows_inserted"] = execute_query(
@@ -43,6 +232,203 @@ def rebuild_rollup_monthly(month: date, user_id: str, accounts: Optional[List[st
     )[0][0]
     return summary
 
+def mark_rollup_dirty(cells: Iterable[Tuple[str, date]],
+                      conn: Optional[duckdb.DuckDBPyConnection] = None) -> None:
+    """Mark (account_id, month) cells for rebuild; call inside the writing transaction."""
+    rows = [list(cell) for cell in sorted(set(cells))]
+    if not rows:
+        return
+    execute_many("""
+        INSERT INTO rollup_dirty (account_id, month) VALUES (?, ?)
+        ON CONFLICT DO NOTHING
+    """, rows, conn=conn)
+
+def refresh_dirty_rollups(month: Optional[date] = None, accounts: Optional[List[str]] = None) -> int:
+    """Rebuild dirty rollup cells (optionally of one month / some accounts only).
+
+    When nothing requested is dirty this is a single read of rollup_dirty and
+    takes no write lock. Returns the number of cells rebuilt.
+    """
+    conditions = []
+    params: List[Any] = []
+    if month is not None:
+        conditions.append("month = ?")
+        params.append(month)
+    if accounts:
+        conditions.append("account_id IN (" + ",".join("?"*len(accounts)) + ")")
+        params += accounts
+    where = ("WHERE " + " AND ".join(conditions)) if conditions else ""
+    cells = execute_query(f"SELECT account_id, month FROM rollup_dirty {where} ORDER BY month, account_id;", params)
+    if not cells:
+        return 0
+
+    by_month: Dict[date, List[str]] = {}
+    for account_id, cell_month in cells:
+        by_month.setdefault(cell_month, []).append(account_id)
+
+    with transaction() as conn:
+        for cell_month, cell_accounts in by_month.items():
+            _rebuild_rollup_cells(conn, cell_month, cell_accounts)
+        # Re-aggregating an extra clean account is harmless, so one pass covers all months
+        _refresh_rollup_periods(conn, by_month, sorted({a for accs in by_month.values() for a in accs}))
+    bump_data_version()
+    return len(cells)
+
+RollupCell = Tuple[str, date, str, str]
+
+def _rollup_cell(txn: Dict[str, Any]) -> RollupCell:
+    """(account_id, month, category, subcategory) cell a transaction aggregates into."""
+    ts = txn['ts']
+    return (
+        txn['account_id'],
+        date(ts.year, ts.month, 1),
+        txn['category'] if txn['category'] is not None else 'Uncategorized',
+        txn['subcategory'] if txn['subcategory'] is not None else '',
+    )
+
+def _rollup_contribution(txn: Dict[str, Any]) -> Tuple[float, float, float, int]:
+    """(income, expense, net, txn_count) a transaction adds to its cell (transfers excluded)."""
+    amount = txn['amount']
+    if txn['is_transfer']:
+        return 0.0, 0.0, 0.0, 1
+    return (amount if amount > 0 else 0.0, -amount if amount < 0 else 0.0, amount, 1)
+
+def apply_rollup_delta(old: Optional[Dict[str, Any]], new: Optional[Dict[str, Any]],
+                       conn: Optional[duckdb.DuckDBPyConnection] = None) -> List[RollupCell]:
+    """Apply a changed transaction to rollup_monthly without re-aggregating the month.
+
+    old/new are the transaction before and after the change (account_id, ts,
+    category, subcategory, amount, is_transfer); None for an insert or delete.
+    The old contribution is subtracted and the new one added, touching at most
+    two cells (and the matching rollup_period cells). Does not commit: callers
+    run it inside their write transaction. Returns the monthly cells changed.
+    """
+    deltas: Dict[RollupCell, List[float]] = {}
+    for txn, sign in ((old, -1), (new, 1)):
+        if txn is None:
+            continue
+        delta = deltas.setdefault(_rollup_cell(txn), [0.0, 0.0, 0.0, 0])
+        for i, value in enumerate(_rollup_contribution(txn)):
+            delta[i] += sign * value
+    
+    conn = conn or get_conn()
+    changed = []
+    for cell, (income, expense, net, txn_count) in deltas.items():
+        if not (income or expense or net or txn_count):
+            continue  # same cell, same contribution
+        conn.execute("""
+            INSERT INTO rollup_monthly (account_id, month, category, subcategory, income, expense, net, txn_count)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT (account_id, month, category, subcategory) DO UPDATE
+            SET income = rollup_monthly.income + EXCLUDED.income,
+                expense = rollup_monthly.expense + EXCLUDED.expense,
+                net = rollup_monthly.net + EXCLUDED.net,
+                txn_count = rollup_monthly.txn_count + EXCLUDED.txn_count
+        """, [*cell, income, expense, net, txn_count])
+        # A cell without transactions is absent after a full rebuild too
+        conn.execute("""
+            DELETE FROM rollup_monthly
+            WHERE account_id = ? AND month = ? AND category = ? AND subcategory = ?
+              AND txn_count <= 0
+        """, list(cell))
+        changed.append(cell)
+    if changed:
+        _apply_period_delta(conn, old, new)
+    return changed
+
+def _apply_period_delta(conn: duckdb.DuckDBPyConnection, old: Optional[Dict[str, Any]],
+                        new: Optional[Dict[str, Any]]) -> None:
+    """apply_rollup_delta for the rollup_period tiers."""
+    last_end = _ttm_last_end(conn)
+    deltas: Dict[Tuple[Any, ...], List[float]] = {}
+    for txn, sign in ((old, -1), (new, 1)):
+        if txn is None:
+            continue
+        account_id, month, category, subcategory = _rollup_cell(txn)
+        periods = [(grain, *period_bounds(grain, txn['ts'])) for grain in ('week', 'quarter', 'year')]
+        if last_end is not None:
+            windows = (period_bounds('ttm', add_months(month, k)) for k in range(12))
+            periods += [('ttm', start, end) for start, end in windows if end <= last_end]
+        for grain, start, end in periods:
+            delta = deltas.setdefault((grain, start, end, account_id, category, subcategory), [0.0, 0.0, 0.0, 0])
+            for i, value in enumerate(_rollup_contribution(txn)):
+                delta[i] += sign * value
+
+    rows = [[*key, *delta] for key, delta in deltas.items() if any(delta)]
+    if not rows:
+        return
+    # One multi-row statement: executemany costs a round trip per row
+    conn.execute(f"""
+        INSERT INTO rollup_period (grain, period_start, period_end, account_id, category, subcategory,
+                                   income, expense, net, txn_count)
+        VALUES {", ".join("(?, ?, ?, ?, ?, ?, ?, ?, ?, ?)" for _ in rows)}
+        ON CONFLICT (grain, period_start, account_id, category, subcategory) DO UPDATE
+        SET income = rollup_period.income + EXCLUDED.income,
+            expense = rollup_period.expense + EXCLUDED.expense,
+            net = rollup_period.net + EXCLUDED.net,
+            txn_count = rollup_period.txn_count + EXCLUDED.txn_count
+    """, [value for row in rows for value in row])
+    # A cell without transactions is absent after a full rebuild too. Only
+    # cells losing a transaction can empty; they are looked up by key (not
+    # via RETURNING, which DuckDB 1.0 answers with the pre-update values)
+    shrunk = [[grain, start, account_id, category, subcategory]
+              for grain, start, _, account_id, category, subcategory, *_, txn_count in rows if txn_count < 0]
+    if shrunk:
+        conn.execute(f"""
+            DELETE FROM rollup_period
+            WHERE {" OR ".join("(grain = ? AND period_start = ? AND account_id = ? AND category = ? AND subcategory = ?"
+                               " AND txn_count <= 0)" for _ in shrunk)}
+        """, [value for key in shrunk for value in key])
+
+def verify_rollup_monthly(month: date, accounts: Optional[List[str]] = None,
+                          tolerance: float = 0.005) -> List[Dict[str, Any]]:
+    """Consistency check: compare rollup_monthly with a full re-aggregation.
+
+    Returns the cells that differ (empty when the incrementally maintained
+    rollup matches what rebuild_rollup_monthly would produce).
+    """
+    params = [month, month]
+    acc_sql = ""
+    if accounts:
+        acc_sql = "AND account_id IN (" + ",".join("?"*len(accounts)) + ")"
+        params = [month, *accounts, month, *accounts]
+    rows = execute_query(f"""
+        WITH expected AS (
+            SELECT
+                account_id,
+                month,
+                COALESCE(category, 'Uncategorized') AS category,
+                COALESCE(subcategory, '') AS subcategory,
+                SUM(CASE WHEN amount > 0 AND NOT is_transfer THEN amount ELSE 0 END) AS income,
+                SUM(CASE WHEN amount < 0 AND NOT is_transfer THEN -amount ELSE 0 END) AS expense,
+                SUM(CASE WHEN NOT is_transfer THEN amount ELSE 0 END) AS net,
+                COUNT(*) AS txn_count
+            FROM transactions
+            WHERE month = ?
+              {acc_sql}
+            GROUP BY 1, 2, 3, 4
+        ),
+        actual AS (
+            SELECT account_id, month, category, subcategory, income, expense, net, txn_count
+            FROM rollup_monthly
+            WHERE month = ?
+              {acc_sql}
+        )
+        SELECT account_id, month, category, subcategory,
+               e.income, a.income, e.expense, a.expense, e.net, a.net, e.txn_count, a.txn_count
+        FROM expected e
+        FULL OUTER JOIN actual a USING (account_id, month, category, subcategory)
+        WHERE e.txn_count IS DISTINCT FROM a.txn_count
+           OR abs(COALESCE(e.income, 0) - COALESCE(a.income, 0)) > ?
+           OR abs(COALESCE(e.expense, 0) - COALESCE(a.expense, 0)) > ?
+           OR abs(COALESCE(e.net, 0) - COALESCE(a.net, 0)) > ?
+        ORDER BY 1, 3, 4
+    """, params + [tolerance] * 3)
+    columns = ['account_id', 'month', 'category', 'subcategory',
+               'expected_income', 'actual_income', 'expected_expense', 'actual_expense',
+               'expected_net', 'actual_net', 'expected_txn_count', 'actual_txn_count']
+    return [dict(zip(columns, row)) for row in rows]
+
 def get_uncategorized_count(month: date, accounts: Optional[List[str]] = None) -> int:
     """Get count of uncategorized transactions for a month"""
     conn = get_conn()
@@ -55,7 +441,7 @@ def get_uncategorized_count(month: date, accounts: Optional[List[str]] = None) -
     result = conn.execute(f"""
         SELECT COUNT(*) 
         FROM transactions 
-        WHERE DATE_TRUNC('month', ts) = ?
+        WHERE month = ?
         AND (category IS NULL OR category = 'Uncategorized')
         {acc_sql}
     """, params).fetchone()
@@ -102,3 +488,37 @@ def get_rollup_summary(month: date, accounts: Optional[List[str]] = None) -> Dic
         "delta_mom": round(delta_mom, 2),
         "savings_rate": round(savings_rate, 4),
     }
+
+def get_period_summary(grain: str, start: date, accounts: Optional[List[str]] = None) -> Dict[str, Any]:
+    """Totals of one rollup_period period and the change vs the period before it."""
+    _, end = period_bounds(grain, start)
+    # The period ending the day before: previous week/quarter/year, and for
+    # ttm the window ending 12 months earlier (year over year)
+    prev_start, _ = period_bounds(grain, start - timedelta(days=1))
+    acc_sql = ""
+    acc_params: List[Any] = []
+    if accounts:
+        acc_sql = "AND account_id IN (" + ",".join("?"*len(accounts)) + ")"
+        acc_params = list(accounts)
+
+    totals = {}
+    for period_start in (start, prev_start):
+        totals[period_start] = execute_query(f"""
+            SELECT SUM(income), SUM(expense), SUM(net)
+            FROM rollup_period
+            WHERE grain = ? AND period_start = ?
+              {acc_sql};
+        """, [grain, period_start, *acc_params])[0]
+    income, expense, net = (value or 0.0 for value in totals[start])
+    prev_net = totals[prev_start][2] or 0.0
+
+    return {
+        "grain": grain,
+        "period_start": start.isoformat(),
+        "period_end": end.isoformat(),
+        "income": round(income, 2),
+        "expense": round(expense, 2),
+        "net": round(net, 2),
+        "delta_prev": round(net - prev_net, 2),
+        "savings_rate": round((net / income) if income else 0.0, 4),
+    }
@@ -0,0 +1,169 @@
+"""Compiled matcher for category rules.
+
+The active rule set is compiled once into lookup structures so each
+transaction field is scanned once instead of once per rule:
+
+- contains:   Aho-Corasick automaton over all literal patterns
+- startswith: hashed lookup of the field's prefixes (one per distinct pattern length)
+- equals:     hashed lookup of the whole field
+- regex:      one combined alternation searched once; individual patterns are
+              only evaluated (in priority order) when it matches. The alternation is
+              non-capturing: named groups defeat re's literal-prefix optimisation and
+              made the combined search slower than the per-rule loop
+
+Matching semantics are those of rules_engine._rule_matches: fields and patterns
+are lowercased, empty fields never match, and the first rule in priority order wins.
+"""
+import re
+from collections import defaultdict, deque
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+# Backreferences and global inline flags change meaning (or fail) once a
+# pattern is embedded in a larger alternation
+_NOT_COMBINABLE = re.compile(r"\\\d|\(\?P=|^\(\?[aiLmsux]+\)")
+
+class AhoCorasick:
+    """Multi-pattern substring search returning the ids of every pattern found."""
+
+    def __init__(self, patterns: Iterable[Tuple[str, int]]):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[Set[int]] = [set()]
+
+        for pattern, pattern_id in patterns:
+            state = 0
+            for char in pattern:
+                next_state = self._goto[state].get(char)
+                if next_state is None:
+                    next_state = len(self._goto)
+                    self._goto[state][char] = next_state
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._out.append(set())
+                state = next_state
+            self._out[state].add(pattern_id)
+
+        # Breadth-first failure links; outputs are merged along them
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[next_state] = self._goto[fallback].get(char, 0)
+                self._out[next_state] |= self._out[self._fail[next_state]]
+
+    def search(self, text: str) -> Set[int]:
+        found: Set[int] = set()
+        goto, fail, out = self._goto, self._fail, self._out
+        state = 0
+        for char in text:
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if out[state]:
+                found |= out[state]
+        return found
+
+class _FieldMatcher:
+    """Compiled rules for one transaction field; yields the best (lowest) rule rank."""
+
+    def __init__(self, rules: List[Tuple[int, str, str]]):
+        contains: Dict[str, List[int]] = defaultdict(list)
+        self._prefixes: Dict[str, int] = {}
+        self._exact: Dict[str, int] = {}
+        self._always: Optional[int] = None
+        self._regexes: List[Tuple[int, "re.Pattern"]] = []
+
+        for rank, operator, pattern in rules:
+            if operator == 'contains':
+                if pattern:
+                    contains[pattern].append(rank)
+                elif self._always is None:
+                    self._always = rank  # '' is in every non-empty field
+            elif operator == 'startswith':
+                self._prefixes.setdefault(pattern, rank)
+            elif operator == 'equals':
+                self._exact.setdefault(pattern, rank)
+            elif operator == 'regex':
+                try:
+                    self._regexes.append((rank, re.compile(pattern, re.IGNORECASE)))
+                except re.error:
+                    pass  # invalid patterns never match
+
+        # Each distinct pattern maps to its best rank
+        self._contains_rank = {i: min(ranks) for i, ranks in enumerate(contains.values())}
+        self._automaton = AhoCorasick((pattern, i) for i, pattern in enumerate(contains)) if contains else None
+        self._prefix_lengths = sorted({len(p) for p in self._prefixes})
+        self._uncombined = [(rank, rx) for rank, rx in self._regexes if _NOT_COMBINABLE.search(rx.pattern)]
+        self._any_regex = self._combine_regexes()
+
+    def _combine_regexes(self) -> Optional["re.Pattern"]:
+        combinable = [rx.pattern for _, rx in self._regexes if not _NOT_COMBINABLE.search(rx.pattern)]
+        if not combinable:
+            return None
+        try:
+            return re.compile("|".join(f"(?:{pattern})" for pattern in combinable), re.IGNORECASE)
+        except re.error:
+            self._uncombined = self._regexes
+            return None
+
+    def best_rank(self, value: str) -> Optional[int]:
+        ranks = []
+        if self._always is not None:
+            ranks.append(self._always)
+        if self._automaton is not None:
+            found = self._automaton.search(value)
+            if found:
+                ranks.append(min(self._contains_rank[i] for i in found))
+        for length in self._prefix_lengths:
+            if length > len(value):
+                break
+            rank = self._prefixes.get(value[:length])
+            if rank is not None:
+                ranks.append(rank)
+        rank = self._exact.get(value)
+        if rank is not None:
+            ranks.append(rank)
+
+        best = min(ranks) if ranks else None
+        return self._best_regex_rank(value, best)
+
+    def _best_regex_rank(self, value: str, best: Optional[int]) -> Optional[int]:
+        if not self._regexes:
+            return best
+        # No hit on the alternation: only patterns kept out of it can still match
+        candidates = self._regexes
+        if self._any_regex is not None and not self._any_regex.search(value):
+            candidates = self._uncombined
+        # Only regex rules ranked ahead of the current best can still win
+        for rank, rx in candidates:
+            if best is not None and rank >= best:
+                break
+            if rx.search(value):
+                return rank
+        return best
+
+class RuleMatcher:
+    """Active rule set compiled for single-pass matching."""
+
+    def __init__(self, rules: List[Dict[str, Any]]):
+        self.rules = rules
+        by_field: Dict[str, List[Tuple[int, str, str]]] = defaultdict(list)
+        for rank, rule in enumerate(rules):
+            by_field[rule['field']].append((rank, rule['operator'], rule['pattern'].lower()))
+        self._fields = {field: _FieldMatcher(field_rules) for field, field_rules in by_field.items()}
+
+    def match(self, transaction: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Return the first rule (in priority order) matching the transaction."""
+        best = None
+        for field, matcher in self._fields.items():
+            value = transaction.get(field, '')
+            if not value:
+                continue
+            rank = matcher.best_rank(str(value).lower())
+            if rank is not None and (best is None or rank < best):
+                best = rank
+        return self.rules[best] if best is not None else None
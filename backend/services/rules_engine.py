@@ -1,11 +1,21 @@
 import re
+import threading
+from functools import lru_cache
 from typing import List, Dict, Any, Optional, Tuple
-from db.duck import get_conn
+import duckdb
+from db.duck import get_conn, get_database
+from services.metrics import register_cache
+from services.rule_matcher import RuleMatcher
 
-def apply_rules(transactions_raw: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
-    """Apply category rules to raw transactions, return derived transactions."""
-    # Get active rules ordered by priority
-    rules = get_active_rules()
+def apply_rules(transactions_raw: List[Dict[str, Any]],
+                rules: Optional[List[Dict[str, Any]]] = None) -> List[Dict[str, Any]]:
+    """Apply category rules to raw transactions, return derived transactions.
+
+    Manual overrides are not applied here: see resolve_overrides_sql, which
+    resolves them for the whole batch at commit time.
+    """
+    # Active rules compiled into a matcher (cached until the rule set changes)
+    matcher = get_rule_matcher() if rules is None else RuleMatcher(rules)
     
     derived_transactions = []
     
@@ -49,34 +59,202 @@ def apply_rules(transactions_raw: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
         
         # Apply rules in priority order (only if no category set yet)
         if not derived['category']:
-            for rule in rules:
-                if _rule_matches(rule, derived):
-                    # Apply rule effects
-                    if rule['set_category']:
-                        derived['category'] = rule['set_category']
-                    if rule['set_subcategory']:
-                        derived['subcategory'] = rule['set_subcategory']
-                    if rule['set_is_transfer'] is not None:
-                        derived['is_transfer'] = rule['set_is_transfer']
-                    
-                    # Only apply first matching rule (highest priority)
-                    break
-        
-        # Apply any existing overrides
-        overrides = get_transaction_overrides(derived.get('id'))
-        if overrides:
-            override = overrides[-1]  # Last write wins
-            if override['set_category']:
-                derived['category'] = override['set_category']
-            if override['set_subcategory']:
-                derived['subcategory'] = override['set_subcategory']
-            if override['set_is_transfer'] is not None:
-                derived['is_transfer'] = override['set_is_transfer']
+            # Only the first matching rule (highest priority) applies
+            rule = matcher.match(derived)
+            if rule:
+                # Apply rule effects
+                if rule['set_category']:
+                    derived['category'] = rule['set_category']
+                if rule['set_subcategory']:
+                    derived['subcategory'] = rule['set_subcategory']
+                if rule['set_is_transfer'] is not None:
+                    derived['is_transfer'] = rule['set_is_transfer']
         
         derived_transactions.append(derived)
     
     return derived_transactions
 
+# SQL-native rules engine: the active rule set is compiled into one DuckDB query
+# with the same first-match-by-priority semantics as apply_rules/_rule_matches.
+
+_RULE_FIELD_COLUMNS = {'merchant': 'merchant_lc', 'description': 'description_lc'}
+
+def _sql_literal(value: str) -> str:
+    return "'" + value.replace("'", "''") + "'"
+
+def _sql_strip(expr: str) -> str:
+    return f"regexp_replace({expr}, '^\\s+|\\s+$', '', 'g')"
+
+@lru_cache(maxsize=1024)
+def _compile_rule_regex(pattern: str) -> "re.Pattern":
+    return re.compile(pattern, re.IGNORECASE)
+
+def _regex_cache_stats() -> Dict[str, int]:
+    info = _compile_rule_regex.cache_info()
+    return {"hits": info.hits, "misses": info.misses, "entries": info.currsize}
+
+register_cache("rule_regex", _regex_cache_stats)
+
+def _rule_regex_search(value: Optional[str], pattern: str) -> bool:
+    # DuckDB 1.0 passes NULLs to Python functions; an empty field matches no rule
+    return value is not None and bool(_compile_rule_regex(pattern).search(value))
+
+# Database the Python regex function is registered on
+_regex_udf: Dict[str, Any] = {'database': None}
+_regex_udf_lock = threading.Lock()
+
+def _ensure_regex_udf() -> None:
+    """Register Python's re.search for regex rules RE2 cannot compile (lookarounds, backrefs).
+
+    Registered once on the connection owning the database, which never holds a
+    transaction (DuckDB 1.0 refuses create_function inside one). Every cursor
+    sees the function, and it lives as long as that connection.
+    """
+    database = get_database()
+    with _regex_udf_lock:
+        if _regex_udf['database'] is not database:
+            database.create_function('rule_regex_search', _rule_regex_search,
+                                     ['VARCHAR', 'VARCHAR'], 'BOOLEAN', side_effects=False)
+            _regex_udf['database'] = database
+
+def _re2_accepts(conn: duckdb.DuckDBPyConnection, pattern: str) -> bool:
+    """Whether DuckDB's RE2 compiles pattern.
+
+    Probed on a cursor of its own: a failed statement aborts the transaction
+    it runs in, and categorize_sql is called inside the import commit's.
+    """
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SELECT regexp_matches('', ?)", [pattern]).fetchone()
+        return True
+    except duckdb.Error:
+        return False
+    finally:
+        cursor.close()
+
+def _rule_predicate(rule: Dict[str, Any], conn: duckdb.DuckDBPyConnection) -> Optional[str]:
+    """SQL predicate equivalent to _rule_matches for one rule, or None if it can never match."""
+    column = _RULE_FIELD_COLUMNS.get(rule['field'])
+    if column is None:
+        return None
+    pattern = rule['pattern'].lower()
+    literal = _sql_literal(pattern)
+    operator = rule['operator']
+    
+    if operator == 'contains':
+        return f"contains({column}, {literal})"
+    elif operator == 'startswith':
+        return f"starts_with({column}, {literal})"
+    elif operator == 'equals':
+        return f"{column} = {literal}"
+    elif operator == 'regex':
+        try:
+            _compile_rule_regex(pattern)
+        except re.error:
+            return None
+        if _re2_accepts(conn, pattern):
+            return f"regexp_matches({column}, {literal}, 'i')"
+        _ensure_regex_udf()
+        return f"rule_regex_search({column}, {literal})"
+    
+    return None
+
+def categorize_sql(raw_sql: str, rules: Optional[List[Dict[str, Any]]] = None,
+                   conn: Optional[duckdb.DuckDBPyConnection] = None) -> str:
+    """Compile the rule set into one query deriving transactions from raw rows.
+
+    raw_sql must select transactions_raw columns (id, import_batch_id, bank, ts,
+    description, merchant, amount, currency, account_label, extra). The result has
+    the same columns as the dicts returned by apply_rules.
+    """
+    conn = conn or get_conn()
+    if rules is None:
+        rules = get_rule_matcher().rules
+    
+    # CASE evaluates WHEN branches in order: first match in priority order wins
+    whens = []
+    rule_values = []
+    for idx, rule in enumerate(rules):
+        predicate = _rule_predicate(rule, conn)
+        if predicate is None:
+            continue
+        whens.append(f"WHEN {predicate} THEN {idx}")
+        set_is_transfer = rule['set_is_transfer']
+        rule_values.append("({}, {}, {}, {})".format(
+            idx,
+            _sql_literal(rule['set_category']) if rule['set_category'] else "NULL",
+            _sql_literal(rule['set_subcategory']) if rule['set_subcategory'] else "NULL",
+            "NULL" if set_is_transfer is None else ("TRUE" if set_is_transfer else "FALSE"),
+        ))
+    rule_case = f"CASE {' '.join(whens)} END" if whens else "NULL::INTEGER"
+    if rule_values:
+        rules_relation = f"(VALUES {', '.join(rule_values)})"
+    else:
+        rules_relation = "(SELECT NULL::INTEGER, NULL::TEXT, NULL::TEXT, NULL::BOOLEAN WHERE FALSE)"
+    
+    return f"""
+        WITH raw AS (
+            {raw_sql}
+        ),
+        base AS (
+            SELECT raw.*,
+                   NULLIF(lower(merchant), '') AS merchant_lc,
+                   NULLIF(lower(description), '') AS description_lc,
+                   -- For Boursorama, use built-in categories
+                   bank = 'Boursorama'
+                       AND {_sql_strip("COALESCE(json_extract_string(extra, '$.category_parent'), '')")} <> ''
+                       AS has_builtin_category
+            FROM raw
+        ),
+        matched AS (
+            SELECT base.*,
+                   CASE WHEN has_builtin_category THEN NULL ELSE {rule_case} END AS rule_idx
+            FROM base
+        )
+        SELECT
+            m.id AS raw_id,
+            m.ts,
+            m.bank AS account_id,
+            m.account_label,
+            m.description,
+            m.merchant,
+            m.amount,
+            m.currency,
+            TRY_CAST(json_extract_string(m.extra, '$.balance') AS DOUBLE) AS balance,
+            '' AS source_file,
+            m.import_batch_id,
+            CASE WHEN m.has_builtin_category
+                 THEN {_sql_strip("json_extract_string(m.extra, '$.category_parent')")}
+                 ELSE r.set_category END AS category,
+            CASE WHEN m.has_builtin_category
+                 THEN NULLIF({_sql_strip("COALESCE(json_extract_string(m.extra, '$.category'), '')")}, '')
+                 ELSE r.set_subcategory END AS subcategory,
+            COALESCE(r.set_is_transfer, FALSE) AS is_transfer
+        FROM matched m
+        LEFT JOIN {rules_relation} AS r(rule_idx, set_category, set_subcategory, set_is_transfer)
+          ON r.rule_idx = m.rule_idx
+    """
+
+# Compiled matcher cache: rebuilt only when /rules CRUD bumps the rule-set version
+_rules_version = 0
+_matcher_cache: Dict[str, Any] = {'conn': None, 'version': None, 'matcher': None}
+_matcher_lock = threading.Lock()
+
+def invalidate_rule_cache() -> None:
+    """Mark the rule set as changed; the next commit recompiles the matcher."""
+    global _rules_version
+    with _matcher_lock:
+        _rules_version += 1
+
+def get_rule_matcher() -> RuleMatcher:
+    """Matcher for the active rules, compiled once per rule-set version."""
+    database = get_database()
+    with _matcher_lock:
+        if _matcher_cache['conn'] is not database or _matcher_cache['version'] != _rules_version:
+            _matcher_cache.update(conn=database, version=_rules_version,
+                                  matcher=RuleMatcher(get_active_rules()))
+        return _matcher_cache['matcher']
+
 def get_active_rules() -> List[Dict[str, Any]]:
     """Get all active rules ordered by priority."""
     conn = get_conn()
@@ -124,6 +302,42 @@ def _rule_matches(rule: Dict[str, Any], transaction: Dict[str, Any]) -> bool:
     
     return False
 
+def resolve_overrides_sql(derived_sql: str) -> str:
+    """Apply a transaction's overrides to a derived-transactions query.
+
+    Overrides point at derived transaction ids, so they are resolved through that
+    transaction's raw_id: a recommit keeps manual recategorizations. Each field
+    comes from the latest override that sets it, as the edits were applied, so
+    a later override of another field (an auto-confirmed transfer) keeps an
+    earlier category. The result gains txn_id, the id of the overridden
+    transaction (NULL when none).
+    """
+    return f"""
+        WITH derived AS (
+            {derived_sql}
+        ),
+        latest_override AS (
+            SELECT t.raw_id,
+                   arg_max(o.txn_id, o.created_at) AS txn_id,
+                   -- Last write wins, per field
+                   arg_max(o.set_category, o.created_at) FILTER (WHERE o.set_category <> '') AS set_category,
+                   arg_max(o.set_subcategory, o.created_at) FILTER (WHERE o.set_subcategory <> '') AS set_subcategory,
+                   arg_max(o.set_is_transfer, o.created_at) FILTER (WHERE o.set_is_transfer IS NOT NULL) AS set_is_transfer
+            FROM txn_overrides o
+            JOIN transactions t ON t.id = o.txn_id
+            WHERE t.raw_id IN (SELECT raw_id FROM derived)
+            GROUP BY t.raw_id
+        )
+        SELECT d.* REPLACE (
+                   CASE WHEN o.set_category <> '' THEN o.set_category ELSE d.category END AS category,
+                   CASE WHEN o.set_subcategory <> '' THEN o.set_subcategory ELSE d.subcategory END AS subcategory,
+                   COALESCE(o.set_is_transfer, d.is_transfer) AS is_transfer
+               ),
+               o.txn_id
+        FROM derived d
+        LEFT JOIN latest_override o ON o.raw_id = d.raw_id
+    """
+
 def get_transaction_overrides(txn_id: Optional[str]) -> List[Dict[str, Any]]:
     """Get overrides for a transaction."""
     if not txn_id:
@@ -157,7 +371,7 @@ def preview_rule_matches(field: str, operator: str, pattern: str, period_month:
     params = []
     
     if period_month:
-        where_conditions.append("DATE_TRUNC('month', ts) = ?")
+        where_conditions.append("month = ?")
         params.append(period_month)
     
     # Build field condition based on operator
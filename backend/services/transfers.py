@@ -1,153 +1,344 @@
-from typing import List, Dict, Any, Optional
-from datetime import date, datetime
-from db.duck import get_conn, execute_update
+from typing import List, Dict, Any, Optional, Set, Tuple
+from datetime import date, datetime, timedelta
+from config import settings
+from db.duck import bulk_insert, get_conn, transaction
+from services.rollup import mark_rollup_dirty, refresh_dirty_rollups
+from services.result_cache import bump_data_version
+import math
 import uuid
+import pandas as pd
 
-def propose_transfers(month: date, accounts: Optional[List[str]] = None) -> List[Dict[str, Any]]:
-    """Propose transfer candidates using heuristic matching."""
-    conn = get_conn()
+# Columns of a candidate pair: the outflow leg (1) and the inflow leg (2)
+CANDIDATE_COLUMNS = ['id1', 'id2', 'd', 'd2', 'from_acct', 'to_acct', 'amt1', 'amt2',
+                     'desc1', 'desc2', 'date_diff', 'cur1', 'cur2',
+                     'similarity', 'confirmed_pairs', 'confidence']
+
+# Legs in different currencies are compared in this currency, through fx_rates
+FX_BASE_CURRENCY = 'EUR'
+
+# Matched (as substrings) against either lowercased description
+TRANSFER_KEYWORD_PATTERN = 'virement|transfer|vir |transfert'
+# Confirmed pairs between two accounts at which the account-pair prior reaches 0.5
+PRIOR_HALF_COUNT = 3
+
+def _tokens_sql(column: str) -> str:
+    """Distinct accent-free lowercase words of 3+ letters (dates, amounts and references drop out)."""
+    return f"list_distinct(regexp_extract_all(lower(strip_accents(COALESCE({column}, ''))), '[a-z]{{3,}}'))"
+
+# Earlier confirmed pairs per (outflow account, inflow account)
+PAIR_PRIORS_SQL = """
+    SELECT o.account_id AS from_acct, i.account_id AS to_acct, COUNT(DISTINCT oo.transfer_pair_id) AS pairs
+    FROM txn_overrides oo
+    JOIN txn_overrides io ON io.transfer_pair_id = oo.transfer_pair_id
+    JOIN transactions o ON o.id = oo.txn_id
+    JOIN transactions i ON i.id = io.txn_id
+    WHERE oo.set_is_transfer AND o.amount < 0 AND i.amount > 0
+    GROUP BY 1, 2
+"""
+
+# Confidence (0-1): close dates, an exact amount (same currency), a transfer
+# keyword, the token-set (Jaccard) similarity of the two descriptions and how
+# often transfers between the two accounts were confirmed before
+CONFIDENCE_SQL = f"""LEAST(1.0, 0.4
+    + CASE date_diff WHEN 0 THEN 0.3 WHEN 1 THEN 0.15 ELSE 0 END
+    + CASE WHEN cur1 = cur2 THEN 0.1 ELSE 0 END
+    + CASE WHEN keyword THEN 0.2 ELSE 0 END
+    + 0.15 * similarity
+    + 0.15 * confirmed_pairs / (confirmed_pairs + {PRIOR_HALF_COUNT}))"""
+
+def score_pairs_sql(pairs_query: str) -> str:
+    """Wrap a query of pairs (desc1, desc2, cur1, cur2, from_acct, to_acct,
+    date_diff, ...) to add similarity, confirmed_pairs and confidence columns.
+
+    Every pair is scored in the same statement: descriptions are tokenized
+    and compared as lists, and the account-pair priors are one hash join.
+    """
+    return f"""
+    SELECT p.* EXCLUDE (tokens1, tokens2, keyword), {CONFIDENCE_SQL} AS confidence
+    FROM (
+      SELECT p.*,
+             regexp_matches(lower(COALESCE(desc1, '')), '{TRANSFER_KEYWORD_PATTERN}')
+               OR regexp_matches(lower(COALESCE(desc2, '')), '{TRANSFER_KEYWORD_PATTERN}') AS keyword,
+             COALESCE(len(list_intersect(tokens1, tokens2))
+                      / NULLIF(len(list_distinct(list_concat(tokens1, tokens2))), 0), 0) AS similarity,
+             COALESCE(priors.pairs, 0) AS confirmed_pairs
+      FROM (
+        SELECT *, {_tokens_sql('desc1')} AS tokens1, {_tokens_sql('desc2')} AS tokens2
+        FROM ({pairs_query})
+      ) p
+      LEFT JOIN ({PAIR_PRIORS_SQL}) priors USING (from_acct, to_acct)
+    ) p
+    """
+
+def find_transfer_candidates(start: date, end: date, accounts: Optional[List[str]] = None,
+                             window_days: Optional[int] = None, scope_query: Optional[str] = None,
+                             scope_params: Optional[List[Any]] = None, conn=None,
+                             fx_tolerance: Optional[float] = None) -> List[Dict[str, Any]]:
+    """Outflow/inflow pairs that could be one transfer, with at least one leg in [start, end].
+
+    Legs have opposite signs, different accounts and dates at most window_days
+    apart, possibly across the range (and month) edges. Legs in the same
+    currency have the same absolute amount (to the cent); legs in different
+    currencies have amounts within fx_tolerance (relative, TRANSFER_FX_TOLERANCE)
+    of each other once converted with their month's fx_rates, and never match
+    without a rate. Rows are hash-joined on (amount, date bucket) rather than
+    on the amount alone, so recurring amounts don't make the join quadratic.
+    With scope_query (a query selecting transaction ids), at least one leg must
+    be among those ids instead, and [start, end] only bounds the rows read.
+    """
+    window = settings.transfer_window_days if window_days is None else window_days
+    tolerance = settings.transfer_fx_tolerance if fx_tolerance is None else fx_tolerance
+    lo, hi = start - timedelta(days=window), end + timedelta(days=window)
     
-    # Build account filter
     account_filter = ""
-    params = [month]
-    
+    account_params: List[Any] = []
     if accounts:
-        placeholders = ','.join('?' * len(accounts))
-        account_filter = f"AND t.account_id IN ({placeholders})"
-        params.extend(accounts)
+        account_filter = f"AND account_id IN ({','.join('?' * len(accounts))})"
+        account_params = list(accounts)
+    
+    # A pair needs at least one anchored leg
+    if scope_query is not None:
+        anchored, anchored_params = f"id IN ({scope_query})", list(scope_params or [])
+    else:
+        anchored, anchored_params = "ts::DATE BETWEEN ? AND ?", [start, end]
+    
+    pair_columns = """o.id AS id1, i.id AS id2, o.d AS d, i.d AS d2, o.account_id AS from_acct,
+           i.account_id AS to_acct, o.amount AS amt1, i.amount AS amt2, o.description AS desc1,
+           i.description AS desc2, o.currency AS cur1, i.currency AS cur2, o.anchored OR i.anchored AS anchored"""
+    fx_legs = cross_currency = ""
+    fx_params: List[Any] = []
+    if tolerance > 0:
+        if tolerance >= 1:
+            raise ValueError("fx_tolerance must be below 1")
+        fx_legs = """
+    -- Rate of each (month, currency) into the base currency, stored either way round
+    rates AS (
+      SELECT month, currency, arg_min(rate, preference) AS rate
+      FROM (
+        SELECT month, from_ccy AS currency, rate, 0 AS preference FROM fx_rates WHERE to_ccy = ?
+        UNION ALL
+        SELECT month, to_ccy, 1 / rate, 1 FROM fx_rates WHERE from_ccy = ? AND rate <> 0
+      )
+      GROUP BY month, currency
+    ),
+    -- Converted amounts within the tolerance are at most -ln(1 - tolerance)
+    -- apart on a log scale: they sit in the same or an adjacent amount bucket
+    -- of that width, so each outflow probes 3 x 3 (date, amount) keys
+    fx_legs AS (
+      SELECT *, FLOOR(LN(converted) / ?)::BIGINT AS amount_bucket
+      FROM (
+        SELECT base.*, ABS(amount) * CASE WHEN currency = ? THEN 1 ELSE r.rate END AS converted
+        FROM base LEFT JOIN rates r USING (month, currency)
+      )
+      WHERE converted > 0
+    ),"""
+        cross_currency = f"""
+      UNION ALL
+      SELECT {pair_columns}
+      FROM (
+        SELECT *, bucket + k.step AS probe, amount_bucket + a.step AS amount_probe
+        FROM fx_legs, (VALUES (-1), (0), (1)) AS k(step), (VALUES (-1), (0), (1)) AS a(step)
+        WHERE amount < 0
+      ) o
+      JOIN (SELECT * FROM fx_legs WHERE amount > 0) i
+        ON i.bucket = o.probe AND i.amount_bucket = o.amount_probe
+      WHERE i.currency <> o.currency
+        AND ABS(i.converted - o.converted) <= ? * GREATEST(i.converted, o.converted)"""
+        fx_params = [FX_BASE_CURRENCY, FX_BASE_CURRENCY, -math.log(1 - tolerance), FX_BASE_CURRENCY, tolerance]
     
-    # SQL for transfer detection heuristic
     query = f"""
     WITH base AS (
-      SELECT id, ts::DATE AS d, account_id, amount, ABS(amount) AS a, description, merchant
+      SELECT id, ts::DATE AS d, month, account_id, amount, description, currency,
+             CAST(ROUND(ABS(amount) * 100) AS BIGINT) AS cents,
+             (ts::DATE - DATE '1970-01-01') // ? AS bucket,
+             {anchored} AS anchored
       FROM transactions
-      WHERE DATE_TRUNC('month', ts) = ?
-        AND is_transfer = FALSE  -- Don't match already marked transfers
+      WHERE month BETWEEN ? AND ?
+        AND ts::DATE BETWEEN ? AND ?
+        AND NOT is_transfer  -- Don't match already marked transfers
+        AND amount <> 0
         {account_filter}
-    ),
+    ),{fx_legs}
     pairs AS (
-      SELECT 
-        b1.id AS id1, 
-        b2.id AS id2, 
-        b1.d, 
-        b1.account_id AS from_acct, 
-        b2.account_id AS to_acct,
-        b1.amount AS amt1, 
-        b2.amount AS amt2,
-        b1.description AS desc1,
-        b2.description AS desc2,
-        ABS(DATEDIFF('day', b1.d, b2.d)) AS date_diff
-      FROM base b1
-      JOIN base b2
-        ON b1.a = b2.a  -- Same absolute amount
-       AND b1.amount * b2.amount < 0  -- Opposite signs
-       AND b1.account_id <> b2.account_id  -- Different accounts
-       AND ABS(DATEDIFF('day', b1.d, b2.d)) <= 1  -- Within 1 day
-       AND b1.id < b2.id  -- Avoid duplicates
+      -- Legs at most window days apart sit in the same or an adjacent bucket of
+      -- window + 1 days, so each outflow probes three (amount, bucket) keys
+      SELECT {pair_columns}
+      FROM (
+        SELECT *, bucket + k.step AS probe
+        FROM base, (VALUES (-1), (0), (1)) AS k(step)
+        WHERE amount < 0
+      ) o
+      JOIN (SELECT * FROM base WHERE amount > 0) i
+        ON i.currency = o.currency AND i.cents = o.cents AND i.bucket = o.probe{cross_currency}
     )
-    SELECT * FROM pairs
-    ORDER BY date_diff ASC, ABS(amt1) DESC
-    LIMIT 100
+    SELECT id1, id2, d, d2, from_acct, to_acct, amt1, amt2, desc1, desc2, ABS(d2 - d) AS date_diff, cur1, cur2
+    FROM pairs
+    WHERE from_acct <> to_acct
+      AND ABS(d2 - d) <= ?
+      AND anchored
     """
+    query = f"SELECT {', '.join(CANDIDATE_COLUMNS)} FROM ({score_pairs_sql(query)})"
+    # fx_params: the rates/fx_legs placeholders (4), then the tolerance of the cross-currency join
+    params = ([window + 1] + anchored_params + [lo.replace(day=1), hi.replace(day=1), lo, hi] + account_params
+              + fx_params + [window])
     
-    result = conn.execute(query, params).fetchall()
-    
-    columns = ['id1', 'id2', 'd', 'from_acct', 'to_acct', 'amt1', 'amt2', 
-               'desc1', 'desc2', 'date_diff']
+    candidates = []
+    for row in (conn or get_conn()).execute(query, params).fetchall():
+        candidate = dict(zip(CANDIDATE_COLUMNS, row))
+        candidate['id1'], candidate['id2'] = str(candidate['id1']), str(candidate['id2'])
+        candidates.append(candidate)
+    return candidates
+
+def assign_transfers(candidates: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Greedy one-to-one assignment: best candidates first, each transaction used once.
+
+    Candidates need a 'confidence'; ties go to the closer dates, then the larger amount.
+    """
+    ranked = sorted(candidates, key=lambda c: (-c['confidence'], c['date_diff'], c['amt1'], c['d'],
+                                               c['id1'], c['id2']))
+    used = set()
+    assigned = []
+    for candidate in ranked:
+        if candidate['id1'] in used or candidate['id2'] in used:
+            continue
+        used.update((candidate['id1'], candidate['id2']))
+        assigned.append(candidate)
+    return assigned
+
+def match_transfers(start: date, end: date, accounts: Optional[List[str]] = None,
+                    window_days: Optional[int] = None, scope_query: Optional[str] = None,
+                    scope_params: Optional[List[Any]] = None, conn=None) -> List[Dict[str, Any]]:
+    """Scored, one-to-one transfer pairs with at least one leg in [start, end] (or in scope_query)."""
+    return assign_transfers(find_transfer_candidates(start, end, accounts, window_days, scope_query,
+                                                     scope_params, conn))
+
+def propose_transfers(month: Optional[date] = None, accounts: Optional[List[str]] = None,
+                      start: Optional[date] = None, end: Optional[date] = None,
+                      window_days: Optional[int] = None, limit: Optional[int] = 100) -> List[Dict[str, Any]]:
+    """Propose transfer pairs for a month (or a start..end range), most confident first."""
+    if month is not None:
+        start = month.replace(day=1)
+        end = (start + timedelta(days=32)).replace(day=1) - timedelta(days=1)
+    if start is None or end is None:
+        raise ValueError("month or start and end are required")
     
     proposals = []
-    for row in result:
-        proposal = dict(zip(columns, row))
-        
-        # Calculate confidence score
-        confidence = calculate_transfer_confidence(proposal)
-        proposal['confidence'] = confidence
-        
-        # Format for response
+    for match in match_transfers(start, end, accounts, window_days)[:limit]:
         proposals.append({
             'id': str(uuid.uuid4()),  # Temporary ID for proposal
-            'transaction_ids': [proposal['id1'], proposal['id2']],
-            'date': proposal['d'],
-            'from_account': proposal['from_acct'],
-            'to_account': proposal['to_acct'],
-            'amount': abs(proposal['amt1']),
-            'descriptions': [proposal['desc1'], proposal['desc2']],
-            'date_difference_days': proposal['date_diff'],
-            'confidence': confidence
+            'transaction_ids': [match['id1'], match['id2']],
+            'date': match['d'],
+            'from_account': match['from_acct'],
+            'to_account': match['to_acct'],
+            'amount': abs(match['amt1']),
+            'to_amount': match['amt2'],
+            'currencies': [match['cur1'], match['cur2']],
+            'descriptions': [match['desc1'] or '', match['desc2'] or ''],
+            'date_difference_days': match['date_diff'],
+            'confidence': match['confidence']
         })
     
     return proposals
 
-def calculate_transfer_confidence(proposal: Dict[str, Any]) -> float:
-    """Calculate confidence score for transfer proposal (0-1)."""
-    confidence = 0.5  # Base score
-    
-    # Same day bonus
-    if proposal['date_diff'] == 0:
-        confidence += 0.3
-    
-    # Description similarity bonus
-    desc1 = proposal['desc1'].lower()
-    desc2 = proposal['desc2'].lower()
+def _confirm_pairs(conn, pairs: List[List[str]], note: str) -> Set[Tuple[str, date]]:
+    """Mark the legs of pairs as transfers within the caller's transaction.
+
+    Returns the (account, month) rollup cells marked dirty: those of legs that
+    were not transfers yet.
+    """
+    txn_ids = [txn_id for pair in pairs for txn_id in pair]
+    placeholders = ','.join('?' * len(txn_ids))
+    legs = conn.execute(f"""
+        SELECT id, account_id, month, is_transfer FROM transactions WHERE id IN ({placeholders})
+    """, txn_ids).fetchall()
+    missing = set(txn_ids) - {str(leg[0]) for leg in legs}
+    if missing:
+        raise ValueError(f"Transaction not found: {', '.join(sorted(missing))}")
     
-    # Common transfer keywords
-    transfer_keywords = ['virement', 'transfer', 'vir ', 'transfert']
-    if any(keyword in desc1 or keyword in desc2 for keyword in transfer_keywords):
-        confidence += 0.2
+    # Overrides mark every leg as a transfer; a pair's legs share a pair id
+    pair_ids = [str(uuid.uuid4()) for _ in pairs]
+    bulk_insert("txn_overrides", pd.DataFrame({
+        'id': [str(uuid.uuid4()) for _ in txn_ids],
+        'txn_id': txn_ids,
+        'set_is_transfer': True,
+        'note': note,
+        'transfer_pair_id': [pair_id for pair_id in pair_ids for _ in range(2)],
+    }), conn=conn)
     
-    # Exact amount match (already guaranteed, but reinforces confidence)
-    confidence += 0.1
+    # Update the derived transactions table
+    conn.execute(f"""
+        UPDATE transactions 
+        SET is_transfer = TRUE 
+        WHERE id IN ({placeholders})
+    """, txn_ids)
     
-    return min(confidence, 1.0)
+    # Transfers leave the P&L: their cells are rebuilt after the commit
+    cells = {(account_id, month) for _, account_id, month, is_transfer in legs if not is_transfer}
+    mark_rollup_dirty(cells, conn=conn)
+    return cells
 
 def confirm_transfers(proposal_ids: List[str], transaction_pairs: List[List[str]]) -> Dict[str, Any]:
-    """Confirm transfer proposals by marking transactions as transfers."""
-    conn = get_conn()
-    confirmed_count = 0
+    """Confirm transfer proposals by marking transactions as transfers.
+
+    All pairs are confirmed in one transaction (a missing transaction confirms
+    none), with one statement each for the overrides and the is_transfer flags.
+    The (account, month) rollup cells of the legs are marked dirty in the same
+    transaction and rebuilt once afterwards.
+    """
+    pairs = [[str(txn_id) for txn_id in pair] for pair in transaction_pairs if len(pair) == 2]
+    txn_ids = [txn_id for pair in pairs for txn_id in pair]
+    if len(set(txn_ids)) != len(txn_ids):
+        raise ValueError("Error confirming transfers: a transaction appears in more than one pair")
+    if not txn_ids:
+        return {'confirmed_transactions': 0, 'confirmed_pairs': 0}
     
     try:
-        for pair in transaction_pairs:
-            if len(pair) != 2:
-                continue
-            
-            txn_id1, txn_id2 = pair
-            
-            # Create overrides to mark both as transfers
-            for txn_id in [txn_id1, txn_id2]:
-                override_id = str(uuid.uuid4())
-                execute_update("""
-                    INSERT INTO txn_overrides (id, txn_id, set_is_transfer, note)
-                    VALUES (?, ?, TRUE, 'Confirmed as transfer')
-                """, {
-                    'id': override_id,
-                    'txn_id': txn_id
-                })
-            
-            # Update the derived transactions table
-            for txn_id in [txn_id1, txn_id2]:
-                execute_update("""
-                    UPDATE transactions 
-                    SET is_transfer = TRUE 
-                    WHERE id = ?
-                """, {'id': txn_id})
-            
-            confirmed_count += 2
-        
-        return {
-            'confirmed_transactions': confirmed_count,
-            'confirmed_pairs': len(transaction_pairs)
-        }
-        
+        with transaction() as conn:
+            cells = _confirm_pairs(conn, pairs, 'Confirmed as transfer')
     except Exception as e:
         raise ValueError(f"Error confirming transfers: {e}")
+    bump_data_version()
+    
+    if cells:
+        refresh_dirty_rollups(accounts=sorted({account_id for account_id, _ in cells}))
+    
+    return {
+        'confirmed_transactions': len(txn_ids),
+        'confirmed_pairs': len(pairs)
+    }
+
+def auto_confirm_transfers(conn, scope_query: str, scope_params: List[Any],
+                           min_confidence: Optional[float] = None,
+                           window_days: Optional[int] = None) -> Tuple[int, Set[Tuple[str, date]]]:
+    """Confirm the confident transfers with a leg among the rows selected by scope_query.
+
+    Meant to run inside the transaction that committed those rows: only pairs
+    touching them are matched (against any unmatched row within the window),
+    and pairs scoring at least min_confidence (AUTO_TRANSFER_MIN_CONFIDENCE)
+    are confirmed. Returns (pairs confirmed, rollup cells marked dirty).
+    """
+    threshold = settings.auto_transfer_min_confidence if min_confidence is None else min_confidence
+    start, end = conn.execute(f"""
+        SELECT MIN(ts)::DATE, MAX(ts)::DATE FROM transactions
+        WHERE id IN ({scope_query}) AND NOT is_transfer AND amount <> 0
+    """, scope_params).fetchone()
+    if start is None:
+        return 0, set()
+    
+    matches = match_transfers(start, end, window_days=window_days, scope_query=scope_query,
+                              scope_params=scope_params, conn=conn)
+    pairs = [[match['id1'], match['id2']] for match in matches if match['confidence'] >= threshold]
+    if not pairs:
+        return 0, set()
+    return len(pairs), _confirm_pairs(conn, pairs, 'Auto-confirmed transfer')
 
 def get_potential_transfers(transaction_id: str) -> List[Dict[str, Any]]:
-    """Find potential transfer matches for a specific transaction."""
+    """Find potential transfer matches for a specific transaction, most confident first."""
     conn = get_conn()
     
     # Get the target transaction
     txn = conn.execute("""
-        SELECT id, ts::DATE as d, account_id, amount, ABS(amount) as a, description
+        SELECT id, ts::DATE as d, account_id, amount, ABS(amount) as a, description, currency
         FROM transactions 
         WHERE id = ? AND is_transfer = FALSE
     """, [transaction_id]).fetchone()
@@ -155,47 +346,27 @@ def get_potential_transfers(transaction_id: str) -> List[Dict[str, Any]]:
     if not txn:
         return []
     
-    # Find potential matches
-    matches = conn.execute("""
+    # Find potential matches, oriented as (outflow, inflow) pairs for scoring
+    outflow = txn[3] < 0
+    pairs = f"""
         SELECT id, ts::DATE as d, account_id, amount, description,
-               ABS(DATEDIFF('day', ts::DATE, ?)) as date_diff
+               ABS(DATEDIFF('day', ts::DATE, ?)) as date_diff,
+               {"?" if outflow else "description"} AS desc1, {"description" if outflow else "?"} AS desc2,
+               {"?" if outflow else "account_id"} AS from_acct, {"account_id" if outflow else "?"} AS to_acct,
+               ? AS cur1, currency AS cur2
         FROM transactions
         WHERE ABS(amount) = ?  -- Same absolute amount
           AND amount * ? < 0   -- Opposite sign  
           AND account_id <> ?  -- Different account
           AND is_transfer = FALSE
           AND ABS(DATEDIFF('day', ts::DATE, ?)) <= 2  -- Within 2 days
-        ORDER BY date_diff ASC, ABS(amount) DESC
+    """
+    matches = conn.execute(f"""
+        SELECT id, d, account_id, amount, description, date_diff, confidence
+        FROM ({score_pairs_sql(pairs)})
+        ORDER BY confidence DESC, date_diff ASC, ABS(amount) DESC
         LIMIT 10
-    """, [txn[1], txn[4], txn[3], txn[2], txn[1]]).fetchall()
-    
-    columns = ['id', 'date', 'account_id', 'amount', 'description', 'date_diff']
-    potential_matches = []
-    
-    for match in matches:
-        match_dict = dict(zip(columns, match))
-        match_dict['confidence'] = calculate_simple_confidence(
-            txn[5], match_dict['description'], match_dict['date_diff']
-        )
-        potential_matches.append(match_dict)
-    
-    return potential_matches
-
-def calculate_simple_confidence(desc1: str, desc2: str, date_diff: int) -> float:
-    """Simple confidence calculation for individual matches."""
-    confidence = 0.3
-    
-    if date_diff == 0:
-        confidence += 0.4
-    elif date_diff == 1:
-        confidence += 0.2
-    
-    # Description similarity
-    desc1_lower = desc1.lower()
-    desc2_lower = desc2.lower()
-    
-    transfer_keywords = ['virement', 'transfer', 'vir ', 'transfert']
-    if any(keyword in desc1_lower or keyword in desc2_lower for keyword in transfer_keywords):
-        confidence += 0.3
+    """, [txn[1], txn[5], txn[2], txn[6], txn[4], txn[3], txn[2], txn[1]]).fetchall()
     
-    return min(confidence, 1.0)
\ No newline at end of file
+    columns = ['id', 'date', 'account_id', 'amount', 'description', 'date_diff', 'confidence']
+    return [dict(zip(columns, match)) for match in matches]
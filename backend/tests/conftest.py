@@ -0,0 +1,19 @@
+import sys
+import os
+from unittest.mock import patch
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import duckdb
+import pytest
+
+from db import duck
+from db.duck import _run_migrations
+
+@pytest.fixture
+def conn():
+    """A migrated in-memory database, served by get_conn() for the test's duration."""
+    conn = duckdb.connect()
+    _run_migrations(conn)
+    with patch.object(duck, "_CONN", conn):
+        yield conn
+    conn.close()
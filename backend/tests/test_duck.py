@@ -0,0 +1,130 @@
+import sys
+import os
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+from db import duck
+from db.duck import (
+    bulk_insert, execute_many, execute_query, execute_update,
+    fetch_arrow, fetch_numpy, get_conn, get_database, iter_record_batches, transaction, write_conn,
+)
+
+def _in_thread(fn):
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        return pool.submit(fn).result()
+
+class TestConnectionManager:
+    def test_cursor_per_thread(self, conn):
+        assert get_conn() is get_conn()
+        assert get_conn() is not conn
+        assert _in_thread(get_conn) is not get_conn()
+
+    def test_cursors_share_the_database(self, conn):
+        conn.execute("CREATE TABLE t (x INTEGER)")
+        _in_thread(lambda: get_conn().execute("INSERT INTO t VALUES (42)"))
+        assert execute_query("SELECT x FROM t") == [(42,)]
+
+    def test_transactions_are_per_cursor(self, conn):
+        conn.execute("CREATE TABLE t (x INTEGER)")
+        get_conn().execute("BEGIN TRANSACTION; INSERT INTO t VALUES (1)")
+        # Another thread does not see (or join) this thread's open transaction
+        assert _in_thread(lambda: execute_query("SELECT COUNT(*) FROM t")) == [(0,)]
+        get_conn().execute("ROLLBACK")
+
+    def test_concurrent_reads(self, conn):
+        conn.execute("CREATE TABLE t AS SELECT range AS x FROM range(100000)")
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            results = list(pool.map(lambda i: execute_query("SELECT SUM(x) FROM t WHERE x % 8 = ?", [i % 8])[0][0],
+                                    range(64)))
+        assert results == [sum(range(i % 8, 100000, 8)) for i in range(64)]
+
+    def test_write_path_serializes_writers(self, conn):
+        conn.execute("CREATE TABLE counter (n INTEGER)")
+        conn.execute("INSERT INTO counter VALUES (0)")
+
+        def increment(_):
+            with write_conn() as cursor:
+                cursor.execute("BEGIN TRANSACTION")
+                n = cursor.execute("SELECT n FROM counter").fetchone()[0]
+                cursor.execute("UPDATE counter SET n = ?", [n + 1])
+                cursor.execute("COMMIT")
+
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            list(pool.map(increment, range(80)))
+        assert execute_query("SELECT n FROM counter") == [(80,)]
+
+    def test_settings_configure_database(self, tmp_path):
+        with patch.object(duck, "_CONN", None), patch.object(duck, "DATA_DIR", tmp_path), \
+             patch.object(duck, "DB_PATH", tmp_path / "test.duckdb"), \
+             patch.object(duck.settings, "duckdb_threads", 2), \
+             patch.object(duck.settings, "duckdb_memory_limit", "256MB"):
+            database = get_database()
+            try:
+                assert execute_query("SELECT current_setting('threads')") == [(2,)]
+                # DuckDB reports the limit back in MiB
+                assert execute_query("SELECT current_setting('memory_limit')") == [("244.1 MiB",)]
+                assert execute_query("SELECT COUNT(*) FROM migrations_applied")[0][0] > 0
+            finally:
+                database.close()
+
+class TestTransaction:
+    @pytest.fixture(autouse=True)
+    def table(self, conn):
+        conn.execute("CREATE TABLE t (x INTEGER PRIMARY KEY)")
+
+    def test_commits_once(self, conn):
+        with transaction() as cursor:
+            cursor.execute("INSERT INTO t VALUES (1)")
+            execute_update("INSERT INTO t VALUES (?)", [2])
+            # Not visible outside until the block commits
+            assert _in_thread(lambda: execute_query("SELECT COUNT(*) FROM t")) == [(0,)]
+        assert execute_query("SELECT x FROM t ORDER BY x") == [(1,), (2,)]
+
+    def test_rolls_back_on_error(self, conn):
+        with pytest.raises(ValueError):
+            with transaction():
+                execute_many("INSERT INTO t VALUES (?)", [[1], [2]])
+                bulk_insert("t", [{"x": 3}])
+                raise ValueError("boom")
+        assert execute_query("SELECT COUNT(*) FROM t") == [(0,)]
+        # The connection is usable (and transactional) again afterwards
+        with transaction():
+            execute_update("INSERT INTO t VALUES (4)")
+        assert execute_query("SELECT x FROM t") == [(4,)]
+
+    def test_execute_update_returns_rowcount(self, conn):
+        assert execute_many("INSERT INTO t VALUES (?)", [[1], [2], [3]]) == 3
+        assert execute_update("DELETE FROM t WHERE x >= ?", [2]) == 2
+        assert execute_update("CREATE TABLE u (y INTEGER)") == 0
+
+class TestColumnarFetch:
+    @pytest.fixture(autouse=True)
+    def table(self, conn):
+        conn.execute("""
+            CREATE TABLE t AS
+            SELECT range AS x, CASE WHEN range % 2 = 0 THEN NULL ELSE range * 1.5 END AS y
+            FROM range(10)
+        """)
+
+    def test_fetch_arrow(self, conn):
+        table = fetch_arrow("SELECT * FROM t WHERE x < ? ORDER BY x", [4])
+        assert table.column_names == ["x", "y"]
+        assert table.to_pydict() == {"x": [0, 1, 2, 3], "y": [None, 1.5, None, 4.5]}
+
+    def test_fetch_numpy(self, conn):
+        columns = fetch_numpy("SELECT * FROM t ORDER BY x")
+        assert columns["x"].tolist() == list(range(10))
+        assert columns["y"].mask.tolist() == [x % 2 == 0 for x in range(10)]
+        assert columns["y"].sum() == 1.5 * 25
+
+    def test_record_batches_stream(self, conn):
+        batches = iter_record_batches("SELECT x FROM t ORDER BY x", batch_size=4)
+        first = next(batches)
+        # The stream has a cursor of its own: querying meanwhile does not end it
+        assert execute_query("SELECT COUNT(*) FROM t") == [(10,)]
+        rest = list(batches)
+        assert [b.num_rows for b in [first] + rest] == [4, 4, 2]
+        assert sum((b.column("x").to_pylist() for b in [first] + rest), []) == list(range(10))
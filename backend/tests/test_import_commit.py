@@ -0,0 +1,217 @@
+import asyncio
+import sys
+import os
+import uuid
+from datetime import date, datetime
+from unittest.mock import patch
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+from api.import_commit import commit_import, derived_txn_id
+from api.tx import update_transaction
+from models.dto import ImportCommitRequest, TransactionUpdateRequest
+from services.rollup import verify_rollup_monthly
+from services.rules_engine import invalidate_rule_cache
+
+USER = {"id": str(uuid.uuid4()), "username": "testuser"}
+
+@pytest.fixture(params=["sql", "python"], autouse=True)
+def engine(request):
+    with patch("api.import_commit.settings.rules_engine", request.param):
+        yield request.param
+
+def _seed_raw(conn, rows, bank="BNP", period="2025-07-01"):
+    import_id = str(uuid.uuid4())
+    conn.execute(
+        "INSERT INTO imports(id, bank, period_month, file_sha256, source_file, user_id) VALUES (?, ?, ?, 'sha', 'f.csv', ?)",
+        [import_id, bank, period, USER["id"]]
+    )
+    for ts, description, amount in rows:
+        conn.execute("""
+            INSERT INTO transactions_raw (id, import_batch_id, bank, ts, description, merchant, amount, currency, account_label, extra)
+            VALUES (?, ?, ?, ?, ?, ?, ?, 'EUR', 'Compte', '{}')
+        """, [str(uuid.uuid4()), import_id, bank, ts, description, description.upper(), amount])
+    return import_id
+
+def _commit(period="2025-07", **kwargs):
+    return asyncio.run(commit_import(ImportCommitRequest(period_month=period, **kwargs), current_user=USER))
+
+class TestImportCommit:
+    def test_commit_derives_all_rows(self, conn):
+        _seed_raw(conn, [
+            (datetime(2025, 7, 1), "salaire", 2000.0),
+            (datetime(2025, 7, 2), "cafe", -3.5),
+        ])
+        result = _commit()
+        assert result.transactions_derived == 2
+        assert conn.execute("SELECT COUNT(*), SUM(amount) FROM transactions").fetchone() == (2, 1996.5)
+        assert conn.execute("SELECT SUM(net) FROM rollup_monthly").fetchone()[0] == 1996.5
+
+    def test_recommit_replaces_month(self, conn):
+        _seed_raw(conn, [(datetime(2025, 7, 1), "salaire", 2000.0)])
+        _commit()
+        _commit()
+        assert conn.execute("SELECT COUNT(*) FROM transactions").fetchone()[0] == 1
+
+    def test_failed_commit_leaves_month_unchanged(self, conn):
+        _seed_raw(conn, [(datetime(2025, 7, 1), "salaire", 2000.0)])
+        _commit()
+        before = conn.execute("SELECT id FROM transactions").fetchall()
+
+        with patch("api.import_commit.resolve_overrides_sql", side_effect=RuntimeError("disk full")):
+            with pytest.raises(Exception):
+                _commit()
+
+        assert conn.execute("SELECT id FROM transactions").fetchall() == before
+
+    def test_rules_categorize_derived_rows(self, conn):
+        conn.execute("""
+            INSERT INTO category_rules (id, active, priority, field, operator, pattern, set_category, set_subcategory, set_is_transfer)
+            VALUES (uuid(), TRUE, 10, 'description', 'contains', 'salaire', 'Revenus', 'Salaire', NULL)
+        """)
+        _seed_raw(conn, [
+            (datetime(2025, 7, 1), "salaire", 2000.0),
+            (datetime(2025, 7, 2), "cafe", -3.5),
+        ])
+        result = _commit()
+        assert result.rules_applied == 1
+        assert conn.execute("SELECT description, category, subcategory FROM transactions ORDER BY ts").fetchall() == [
+            ("salaire", "Revenus", "Salaire"),
+            ("cafe", None, None),
+        ]
+
+    def test_regex_rule_re2_rejects(self, conn):
+        # Lookbehind: RE2 can't compile it, so the rule runs through the Python UDF
+        conn.execute("""
+            INSERT INTO category_rules (id, active, priority, field, operator, pattern, set_category)
+            VALUES (uuid(), TRUE, 10, 'description', 'regex', '(?<!pre)salaire', 'Revenus')
+        """)
+        invalidate_rule_cache()
+        _seed_raw(conn, [
+            (datetime(2025, 7, 1), "salaire juillet", 2000.0),
+            (datetime(2025, 7, 2), "presalaire", 100.0),
+        ])
+        assert _commit().rules_applied == 1
+        assert conn.execute("SELECT description, category FROM transactions ORDER BY ts").fetchall() == [
+            ("salaire juillet", "Revenus"),
+            ("presalaire", None),
+        ]
+
+    def _override(self, conn, description, created_at, **fields):
+        txn_id = conn.execute("SELECT id FROM transactions WHERE description = ?", [description]).fetchone()[0]
+        conn.execute("""
+            INSERT INTO txn_overrides (id, txn_id, set_category, set_subcategory, set_is_transfer, created_at)
+            VALUES (uuid(), ?, ?, ?, ?, ?)
+        """, [txn_id, fields.get("category"), fields.get("subcategory"), fields.get("is_transfer"), created_at])
+        return txn_id
+
+    def test_overrides_survive_recommit(self, conn):
+        _seed_raw(conn, [
+            (datetime(2025, 7, 1), "salaire", 2000.0),
+            (datetime(2025, 7, 2), "virement", -500.0),
+        ])
+        _commit()
+        salary_id = self._override(conn, "salaire", datetime(2025, 8, 1), category="Old", subcategory="Old")
+        self._override(conn, "salaire", datetime(2025, 8, 2), category="Revenus")
+        self._override(conn, "virement", datetime(2025, 8, 1), is_transfer=True)
+
+        result = _commit()
+
+        assert result.transactions_derived == 2
+        # Each field from the last override setting it, as the edits left the
+        # row; the overridden transaction keeps its id
+        assert conn.execute("SELECT id, category, subcategory FROM transactions WHERE description = 'salaire'").fetchone() == (salary_id, "Revenus", "Old")
+        assert conn.execute("SELECT is_transfer FROM transactions WHERE description = 'virement'").fetchone() == (True,)
+        assert conn.execute("SELECT COUNT(*) FROM transactions").fetchone()[0] == 2
+
+    def test_recommit_writes_only_changed_rows(self, conn):
+        _seed_raw(conn, [
+            (datetime(2025, 7, 1), "salaire", 2000.0),
+            (datetime(2025, 7, 2), "cafe", -3.5),
+            (datetime(2025, 7, 3), "loyer", -900.0),
+        ])
+        _commit()
+        ids = conn.execute("SELECT raw_id, id FROM transactions").fetchall()
+        assert all(txn_id == derived_txn_id(raw_id) for raw_id, txn_id in ids)
+
+        conn.execute("""
+            INSERT INTO category_rules (id, active, priority, field, operator, pattern, set_category)
+            VALUES (uuid(), TRUE, 10, 'description', 'equals', 'cafe', 'Food')
+        """)
+        invalidate_rule_cache()
+        with patch("api.import_commit.logger") as logger:
+            _commit()
+        logger.info.assert_called_with("derived_transactions_merged", derived=3, written=1, deleted=0)
+        assert sorted(conn.execute("SELECT raw_id, id FROM transactions").fetchall()) == sorted(ids)
+
+    def test_batch_scoped_commit(self, conn):
+        _seed_raw(conn, [(datetime(2025, 7, 1), "salaire", 2000.0)], bank="BNP")
+        _commit()
+        revolut = _seed_raw(conn, [
+            (datetime(2025, 7, 30), "uber", -20.0),
+            (datetime(2025, 8, 1), "cinema", -12.0),
+        ], bank="Revolut")
+
+        conn.execute("UPDATE rollup_monthly SET net = 1 WHERE account_id = 'BNP'")  # must stay untouched
+
+        result = _commit(period=None, import_batch_ids=[revolut])
+
+        assert result.transactions_derived == 2
+        assert result.accounts_processed == ["Revolut"]
+        assert result.period_month.isoformat() == "2025-07-01"
+        # Only the Revolut cells for July and August are rebuilt
+        assert conn.execute("SELECT account_id, month::VARCHAR, net FROM rollup_monthly ORDER BY 1, 2").fetchall() == [
+            ("BNP", "2025-07-01", 1.0), ("Revolut", "2025-07-01", -20.0), ("Revolut", "2025-08-01", -12.0),
+        ]
+        assert conn.execute("SELECT COUNT(*) FROM rollup_dirty").fetchone()[0] == 0
+        assert conn.execute("SELECT account_id, COUNT(*) FROM transactions GROUP BY 1 ORDER BY 1").fetchall() == [
+            ("BNP", 1), ("Revolut", 2),
+        ]
+
+class TestAutoTransfers:
+    def test_confirms_confident_pairs_touching_the_commit(self, conn):
+        _seed_raw(conn, [
+            (datetime(2025, 7, 31), "virement vers revolut", -250.0),
+            (datetime(2025, 7, 10), "carte", -40.0),
+            (datetime(2025, 7, 5), "retrait", -15.0),
+        ], bank="BNP")
+        _seed_raw(conn, [(datetime(2025, 7, 5), "depot", 15.0)], bank="Boursorama")
+        assert _commit(detect_transfers=False).transfers_confirmed == 0
+        revolut = _seed_raw(conn, [
+            (datetime(2025, 7, 31), "top-up", 250.0),
+            (datetime(2025, 7, 11), "top-up", 40.0),
+        ], bank="Revolut")
+
+        result = _commit(period=None, import_batch_ids=[revolut], detect_transfers=True)
+
+        # Same day + keyword clears the threshold; the one-day pair without a
+        # keyword doesn't, and the BNP/Boursorama pair isn't part of this commit
+        assert result.transfers_confirmed == 1
+        assert conn.execute("""
+            SELECT account_id, amount FROM transactions WHERE is_transfer ORDER BY 1
+        """).fetchall() == [("BNP", -250.0), ("Revolut", 250.0)]
+        assert conn.execute("SELECT DISTINCT note FROM txn_overrides").fetchall() == [("Auto-confirmed transfer",)]
+        # The BNP cell is rebuilt although the commit only covered Revolut
+        assert verify_rollup_monthly(date(2025, 7, 1)) == []
+        assert conn.execute("SELECT COUNT(*) FROM rollup_dirty").fetchone()[0] == 0
+
+    def test_recommit_keeps_manual_category(self, conn):
+        _seed_raw(conn, [(datetime(2025, 7, 31), "virement vers revolut", -250.0)], bank="BNP")
+        _seed_raw(conn, [(datetime(2025, 7, 31), "top-up", 250.0)], bank="Revolut")
+        _commit(detect_transfers=False)
+        bnp_id = conn.execute("SELECT id FROM transactions WHERE account_id = 'BNP'").fetchone()[0]
+        asyncio.run(update_transaction(str(bnp_id), TransactionUpdateRequest(category="Epargne")))
+
+        assert _commit(detect_transfers=True).transfers_confirmed == 1
+        # The transfer override only sets is_transfer: the manual category stays
+        _commit()
+        assert conn.execute("SELECT category, is_transfer FROM transactions WHERE id = ?",
+                            [bnp_id]).fetchone() == ("Epargne", True)
+
+    def test_off_by_default(self, conn):
+        _seed_raw(conn, [(datetime(2025, 7, 31), "virement", -250.0)], bank="BNP")
+        _seed_raw(conn, [(datetime(2025, 7, 31), "virement", 250.0)], bank="Revolut")
+        assert _commit().transfers_confirmed == 0
+        with patch("api.import_commit.settings.auto_transfers", True):
+            assert _commit().transfers_confirmed == 1
@@ -1,36 +1,187 @@
+import json
+import math
+import uuid
+from datetime import date, datetime
+from unittest.mock import patch
+
+import duckdb
+import pandas as pd
+import pytest
+
+from db import query_stats
+from db.duck import _run_migrations
+from db.query_stats import InstrumentedCursor, QueryStats
+from etl.common import (
+    parse_amount, parse_amounts, extract_merchant, extract_merchants, parse_dates, insert_raw_rows
+)
+from etl.duck_ingest import ingest_csv_duckdb
 from etl.bnp import load_bnp_csv
 from etl.boursorama import load_boursorama_csv
 from etl.revolut import load_revolut_csv
+from services.metrics import import_rows_inserted, import_rows_parsed
+
+BNP_SAMPLE = (
+    "Compte de chèques ****6388;Solde au 12/08/2025;3248 66;EUR;;;\n"
+    ";;;;;;\n"
+    "Date operation;Categorie operation;Sous Categorie;Libelle;Montant\n"
+    "05-07-2025;Revenus;Virement;VIREMENT;1 234,50\n"
+    "06-07-2025;Paiements;Carte;CARTE CAFE;-12,34\n"
+).encode("cp1252")
+
+BOURSORAMA_SAMPLE = (
+    "dateOp;dateVal;label;category;categoryParent;supplierFound;amount;comment;accountNum;accountLabel;accountbalance\n"
+    "2025-07-01;2025-07-01;CARTE 30/06/25 SUPERMARCHE;Courses;Maison;;-45.20;;000123;Compte joint;2500.00\n"
+).encode("cp1252")
+
+REVOLUT_SAMPLE = (
+    "Type,Product,Started Date,Completed Date,Description,Amount,Fee,Currency,State,Balance\n"
+    "CARD_PAYMENT,Current,2025-07-01 10:00:00,2025-07-01 10:01:00,COFFEE,-3.50,0.00,GBP,COMPLETED,1000.00\n"
+).encode("utf-8")
 
 def test_bnp_loader_basic():
-    content = (
-        "Compte de chèques ****6388;Solde au 12/08/2025;3248 66;EUR;;;\n"
-        ";;;;;;\n"
-        "Date operation;Categorie operation;Sous Categorie;Libelle;Montant\n"
-        "05-07-2025;Revenus;Virement;VIREMENT;1 234,50\n"
-        "06-07-2025;Paiements;Carte;CARTE CAFE;-12,34\n"
-    ).encode("cp1252")
-    rows = load_bnp_csv(content)
+    rows = load_bnp_csv(BNP_SAMPLE)
     assert len(rows) == 2
     assert rows[0]["amount"] == 1234.50
     assert rows[1]["amount"] == -12.34
 
 def test_boursorama_loader_basic():
-    content = (
-        "dateOp;dateVal;label;category;categoryParent;supplierFound;amount;comment;accountNum;accountLabel;accountbalance\n"
-        "2025-07-01;2025-07-01;CARTE 30/06/25 SUPERMARCHE;Courses;Maison;;-45.20;;000123;Compte joint;2500.00\n"
-    ).encode("cp1252")
-    rows = load_boursorama_csv(content)
+    rows = load_boursorama_csv(BOURSORAMA_SAMPLE)
     assert len(rows) == 1
     assert rows[0]["amount"] == -45.20
     assert rows[0]["currency"] == "EUR"
 
 def test_revolut_loader_basic():
+    rows = load_revolut_csv(REVOLUT_SAMPLE)
+    assert len(rows) == 1
+    assert rows[0]["amount"] == -3.50
+    assert rows[0]["currency"] == "GBP"
+
+def test_parse_amounts_matches_parse_amount():
+    samples = ["1 234,50", "-12,34", "1.234,5", "45.20", "", None, "abc12,5x", "1e2", "+3"]
+    for decimal_comma in (True, False):
+        parsed = parse_amounts(pd.Series(samples, dtype=object), decimal_comma=decimal_comma)
+        assert parsed.tolist() == [parse_amount(s, decimal_comma=decimal_comma) for s in samples]
+
+def test_extract_merchants_matches_extract_merchant():
+    samples = ["card 12/07/25 CAFE", "VIREMENT  REF: 998 SALAIRE", "", "x" * 80]
+    assert extract_merchants(pd.Series(samples)).tolist() == [extract_merchant(s) for s in samples]
+
+def test_parse_dates_tries_formats_in_order():
+    parsed = parse_dates(pd.Series(["2025-07-01", "02/07/2025", " 03-07-2025 ", "bad"]),
+                         ['%Y-%m-%d', '%d-%m-%Y', '%d/%m/%Y'])
+    assert parsed[:3].tolist() == [datetime(2025, 7, 1), datetime(2025, 7, 2), datetime(2025, 7, 3)]
+    assert pd.isna(parsed[3])
+
+def test_bnp_loader_skips_unparseable_rows():
+    content = (
+        "Compte de chèques ****6388;;;;\n"
+        ";;;;\n"
+        "Date operation;Categorie operation;Sous Categorie;Libelle;Montant\n"
+        "05-07-2025;Revenus;Virement;virement   salaire;1 234,50\n"
+        ";;;;\n"
+        "32-07-2025;Paiements;Carte;BAD DATE;-1,00\n"
+    ).encode("cp1252")
+    rows = load_bnp_csv(content)
+    assert len(rows) == 1
+    assert rows[0]["ts"].day == 5
+    assert rows[0]["merchant"] == "VIREMENT SALAIRE"
+    assert rows[0]["account_label"] == "Compte de chèques"
+    assert rows[0]["extra"]["categorie"] == "Revenus"
+
+def test_revolut_loader_filters_state_and_applies_fee():
     content = (
         "Type,Product,Started Date,Completed Date,Description,Amount,Fee,Currency,State,Balance\n"
-        "CARD_PAYMENT,Current,2025-07-01 10:00:00,2025-07-01 10:01:00,COFFEE,-3.50,0.00,GBP,COMPLETED,1000.00\n"
+        "TRANSFER,Current,2025-07-01,2025-07-01 09:00:00,TOP UP,-10.00,0.50,gbp,COMPLETED,\n"
+        "CARD_PAYMENT,Current,2025-07-02,2025-07-02 09:00:00,PENDING,-1.00,0.00,GBP,PENDING,\n"
     ).encode("utf-8")
     rows = load_revolut_csv(content)
     assert len(rows) == 1
-    assert rows[0]["amount"] == -3.50
+    assert rows[0]["amount"] == -10.50
     assert rows[0]["currency"] == "GBP"
+    assert rows[0]["extra"]["balance"] is None
+
+def _test_db(bank):
+    conn = duckdb.connect()
+    _run_migrations(conn)
+    import_id = str(uuid.uuid4())
+    conn.execute(
+        "INSERT INTO imports(id, bank, period_month, file_sha256, source_file) VALUES (?, ?, '2025-07-01', 'sha', 'test.csv')",
+        [import_id, bank]
+    )
+    return conn, import_id
+
+def test_insert_raw_rows_bulk():
+    conn, import_id = _test_db("Boursorama")
+    rows = load_boursorama_csv(BOURSORAMA_SAMPLE) * 3
+    with patch('etl.common.get_conn', return_value=conn):
+        assert insert_raw_rows(rows, import_id, "Boursorama", "user-1") == 3
+    stored = conn.execute("SELECT COUNT(DISTINCT id), SUM(amount), MIN(extra) FROM transactions_raw").fetchone()
+    assert stored[0] == 3
+    assert round(stored[1], 2) == -135.60
+    extra = json.loads(stored[2])
+    assert extra["category_parent"] == "Maison"
+    assert extra["supplier_found"] is None  # NaN cells are stored as JSON null
+    assert conn.execute("SELECT DISTINCT month FROM transactions_raw").fetchall() == [(date(2025, 7, 1),)]
+
+def _duckdb_ingest(bank, content):
+    conn, import_id = _test_db(bank)
+    count = ingest_csv_duckdb(content, bank, import_id, conn=conn)
+    rows = conn.execute("""
+        SELECT ts, description, merchant, amount_raw, amount, currency, account_label, extra, month
+        FROM transactions_raw ORDER BY rowid
+    """).fetchall()
+    columns = ['ts', 'description', 'merchant', 'amount_raw', 'amount', 'currency', 'account_label', 'extra', 'month']
+    rows = [dict(zip(columns, row)) for row in rows]
+    for row in rows:
+        row['extra'] = json.loads(row['extra'])
+    return count, rows
+
+def _assert_same_rows(duck_rows, pandas_rows):
+    assert len(duck_rows) == len(pandas_rows)
+    for duck_row, pandas_row in zip(duck_rows, pandas_rows):
+        for key in ['ts', 'description', 'merchant', 'amount_raw', 'amount', 'currency', 'account_label']:
+            assert duck_row[key] == pandas_row[key], key
+        for key, value in pandas_row['extra'].items():
+            if isinstance(value, float) and math.isnan(value):
+                value = None
+            if key != 'raw_row':
+                assert duck_row['extra'][key] == value, key
+
+def test_duckdb_ingest_matches_bnp_loader():
+    count, rows = _duckdb_ingest("BNP", BNP_SAMPLE)
+    assert count == 2
+    _assert_same_rows(rows, load_bnp_csv(BNP_SAMPLE))
+    assert all(row['month'] == date(row['ts'].year, row['ts'].month, 1) for row in rows)
+
+def test_duckdb_ingest_parses_csv_once():
+    conn, import_id = _test_db("Revolut")
+    content = REVOLUT_SAMPLE + (
+        "CARD_PAYMENT,Current,2025-07-03,2025-07-03 09:00:00,PENDING,-1.00,0.00,GBP,PENDING,\n"
+    ).encode("utf-8")
+    stats = QueryStats()
+    parsed, inserted = import_rows_parsed.value(bank="Revolut"), import_rows_inserted.value(bank="Revolut")
+    with patch.object(query_stats, "query_stats", stats):
+        assert ingest_csv_duckdb(content, "Revolut", import_id, conn=InstrumentedCursor(conn)) == 1
+    reads = [s["statement"] for s in stats.snapshot() if "read_csv" in s["statement"]]
+    assert len(reads) == 1
+    # The pending row is read but filtered out
+    assert import_rows_parsed.value(bank="Revolut") == parsed + 2
+    assert import_rows_inserted.value(bank="Revolut") == inserted + 1
+
+def test_duckdb_ingest_matches_boursorama_loader():
+    count, rows = _duckdb_ingest("Boursorama", BOURSORAMA_SAMPLE)
+    assert count == 1
+    _assert_same_rows(rows, load_boursorama_csv(BOURSORAMA_SAMPLE))
+
+def test_duckdb_ingest_matches_revolut_loader():
+    content = REVOLUT_SAMPLE + (
+        "TOPUP,Current,2025-07-02,2025-07-02 09:00:00,Café REF 42,20.00,0.25,gbp,COMPLETED,\n"
+        "CARD_PAYMENT,Current,2025-07-03,2025-07-03 09:00:00,PENDING,-1.00,0.00,GBP,PENDING,\n"
+    ).encode("utf-8")
+    count, rows = _duckdb_ingest("Revolut", content)
+    assert count == 2
+    _assert_same_rows(rows, load_revolut_csv(content))
+
+def test_duckdb_ingest_missing_columns():
+    with pytest.raises(ValueError, match="Missing required columns"):
+        _duckdb_ingest("Revolut", b"Type,Amount\nX,1.00\n")
@@ -0,0 +1,82 @@
+import sys
+import os
+import uuid
+from datetime import date, datetime
+from unittest.mock import patch
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app import app
+from etl.common import insert_raw_rows
+from services import metrics
+from services.metrics import Counter, Histogram, import_rows_inserted
+
+client = TestClient(app)
+
+@pytest.fixture
+def registry():
+    """Metrics created in a test stay out of the app's registry."""
+    with patch.object(metrics, "_REGISTRY", []):
+        yield metrics._REGISTRY
+
+def _samples(text):
+    return {line.rsplit(" ", 1)[0]: float(line.rsplit(" ", 1)[1])
+            for line in text.splitlines() if line and not line.startswith("#")}
+
+class TestExposition:
+    def test_counter(self, registry):
+        counter = Counter("jobs_total", "Jobs.", ["kind"])
+        counter.inc(kind="a")
+        counter.inc(2, kind='say "hi"\n')
+        assert counter.render() == [
+            "# HELP jobs_total Jobs.",
+            "# TYPE jobs_total counter",
+            'jobs_total{kind="a"} 1',
+            'jobs_total{kind="say \\"hi\\"\\n"} 2',
+        ]
+
+    def test_histogram_buckets_are_cumulative(self, registry):
+        histogram = Histogram("job_seconds", "Job time.", buckets=(0.1, 1.0))
+        for value in (0.05, 0.5, 0.7, 3.0):
+            histogram.observe(value)
+        assert histogram.render()[2:] == [
+            'job_seconds_bucket{le="0.1"} 1',
+            'job_seconds_bucket{le="1.0"} 3',
+            'job_seconds_bucket{le="+Inf"} 4',
+            "job_seconds_sum 4.25",
+            "job_seconds_count 4",
+        ]
+
+class TestMetricsEndpoint:
+    def test_scrape(self, conn):
+        assert client.post("/api/pl/summary", json={"month": "2025-07"}).status_code == 200
+        response = client.get("/api/metrics")
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+
+        samples = _samples(response.text)
+        assert samples['http_requests_total{method="POST",route="/api/pl/summary",status="200"}'] >= 1
+        assert samples['http_request_duration_seconds_count{method="POST",route="/api/pl/summary"}'] >= 1
+        assert 'cache_hit_ratio{cache="pl_summary"}' in samples
+        assert 'cache_entries{cache="rule_regex"}' in samples
+        assert any(key.startswith("duckdb_memory_bytes{") for key in samples)
+        assert any(key.startswith("db_query_duration_seconds_bucket{") and 'route="POST /api/pl/summary"' in key
+                   for key in samples)
+
+    def test_unmatched_routes_share_a_label(self, conn):
+        client.get("/api/nope/123")
+        client.get("/api/nope/456")
+        samples = _samples(client.get("/api/metrics").text)
+        assert samples['http_requests_total{method="GET",route="unmatched",status="404"}'] >= 2
+
+    def test_rows_inserted_per_bank(self, conn):
+        import_id = str(uuid.uuid4())
+        conn.execute("INSERT INTO imports(id, bank, period_month, file_sha256, source_file) VALUES (?, 'Revolut', ?, 'sha', 'f.csv')",
+                     [import_id, date(2025, 7, 1)])
+        before = import_rows_inserted.value(bank="Revolut")
+        rows = [{"ts": datetime(2025, 7, day), "description": "x", "merchant": "x", "amount": -1.0,
+                 "currency": "EUR", "account_label": "Main"} for day in (1, 2, 3)]
+        insert_raw_rows(rows, import_id, "Revolut", None)
+        assert import_rows_inserted.value(bank="Revolut") == before + 3
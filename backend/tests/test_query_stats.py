@@ -0,0 +1,96 @@
+import json
+import sys
+import os
+from unittest.mock import patch
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import duckdb
+import pytest
+from fastapi.testclient import TestClient
+
+from app import app
+from db import query_stats as qs
+from db.duck import execute_query, execute_update, get_conn, transaction
+from db.query_stats import InstrumentedCursor, QueryStats, normalize_sql
+
+client = TestClient(app)
+
+@pytest.fixture
+def stats():
+    stats = QueryStats()
+    with patch.object(qs, "query_stats", stats):
+        yield stats
+
+def _by_statement(stats):
+    return {(s["statement"], s["route"]): s for s in stats.snapshot()}
+
+class TestNormalizeSql:
+    def test_literals_become_placeholders(self):
+        assert normalize_sql("SELECT * FROM t WHERE a = 'x''y' AND b > 42 AND c = -1.5  -- note\n;") == \
+            "SELECT * FROM t WHERE a = ? AND b > ? AND c = ?"
+
+    def test_identifiers_keep_their_digits(self):
+        assert normalize_sql("SELECT t1.x FROM t1 WHERE month >= INTERVAL 11 MONTH") == \
+            "SELECT t1.x FROM t1 WHERE month >= INTERVAL ? MONTH"
+
+    def test_lists_collapse(self):
+        assert normalize_sql("SELECT 1 FROM t WHERE id IN (?, ?, ?)") == normalize_sql("SELECT 1 FROM t WHERE id IN (?,?)")
+        assert normalize_sql("INSERT INTO t VALUES (?, ?), (?, ?), (?, ?)") == "INSERT INTO t VALUES (?, ...), ..."
+        assert normalize_sql("INSERT INTO t SELECT * FROM _bulk_" + "ab12" * 8) == "INSERT INTO t SELECT * FROM _bulk_?"
+
+class TestInstrumentedCursor:
+    def test_records_statements_with_rows(self, conn, stats):
+        conn.execute("CREATE TABLE t AS SELECT range AS x FROM range(10)")
+        for bound in (3, 5):
+            execute_query("SELECT x FROM t WHERE x < ?", [bound])
+        with transaction():
+            execute_update("DELETE FROM t WHERE x = ?", [1])
+
+        recorded = _by_statement(stats)
+        select = recorded[("SELECT x FROM t WHERE x < ?", "")]
+        assert select["count"] == 2 and select["rows"] == 8
+        assert select["buckets"][-1][1] == 2
+        assert recorded[("DELETE FROM t WHERE x = ?", "")]["count"] == 1
+        assert recorded[("COMMIT", "")]["count"] == 1
+
+    def test_unfetched_statement_recorded_on_next(self, conn, stats):
+        cursor = get_conn()
+        cursor.execute("CREATE TABLE u (x INTEGER)")
+        assert ("CREATE TABLE u (x INTEGER)", "") not in _by_statement(stats)
+        cursor.execute("SELECT COUNT(*) FROM u").fetchone()
+        recorded = _by_statement(stats)
+        assert recorded[("CREATE TABLE u (x INTEGER)", "")]["rows"] == 0
+        assert recorded[("SELECT COUNT(*) FROM u", "")]["rows"] == 1
+
+    def test_missing_fetch_methods_raise(self, stats):
+        class OldCursor:
+            def fetchall(self):
+                return []
+        cursor = InstrumentedCursor(OldCursor())
+        assert cursor.fetchall() == []
+        with pytest.raises(AttributeError):
+            cursor.to_arrow_table
+
+    def test_slow_query_log_and_profile(self, tmp_path, stats):
+        database = duckdb.connect()
+        with patch.object(qs.settings, "slow_query_ms", 0), \
+             patch.object(qs.settings, "slow_query_profile_dir", str(tmp_path)), \
+             patch.object(qs.logger, "warning") as warning:
+            cursor = InstrumentedCursor(database.cursor())
+            cursor.execute("SELECT SUM(range) FROM range(1000)").fetchall()
+            cursor.close()
+
+        event, fields = warning.call_args.args[0], warning.call_args.kwargs
+        assert event == "slow_query"
+        assert fields["statement"] == "SELECT SUM(range) FROM range(?)" and fields["rows"] == 1
+        # The JSON layout differs between DuckDB versions; both nest operators under children
+        assert "children" in json.load(open(fields["profile"]))
+        # The per-cursor scratch profile goes away with the cursor
+        assert [p.name for p in tmp_path.iterdir() if p.name.startswith(".cursor-")] == []
+        database.close()
+
+    def test_route_attribution(self, conn, stats):
+        response = client.post("/api/pl/summary", json={"month": "2025-07"})
+        assert response.status_code == 200
+        routes = {s["route"] for s in stats.snapshot()}
+        assert routes == {"POST /api/pl/summary"}
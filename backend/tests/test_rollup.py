@@ -0,0 +1,272 @@
+import asyncio
+import random
+import sys
+import os
+import uuid
+from datetime import date, datetime, timedelta
+from unittest.mock import patch
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app import app
+from db import query_stats
+from db.query_stats import QueryStats
+from api import pl
+from api.tx import update_transaction
+from models.dto import TransactionUpdateRequest
+from services.rollup import (
+    apply_rollup_delta, mark_rollup_dirty, period_bounds, rebuild_rollup_monthly, rebuild_rollup_periods,
+    refresh_dirty_rollups, verify_rollup_monthly
+)
+from services.result_cache import LRUCache, etag_matches
+from services.transfers import confirm_transfers
+
+JULY = date(2025, 7, 1)
+USER_ID = str(uuid.uuid4())
+
+client = TestClient(app)
+
+@pytest.fixture(autouse=True)
+def summary_cache():
+    with patch.object(pl, "_summary_cache", LRUCache(8)):
+        yield
+
+def _summary(headers=None, **body):
+    return client.post("/api/pl/summary", json={"month": "2025-07", **body}, headers=headers or {})
+
+def _seed(conn, rows):
+    """Insert derived July transactions: (account_id, day, category, amount)."""
+    return _seed_dated(conn, [(account_id, datetime(2025, 7, day), category, amount)
+                              for account_id, day, category, amount in rows])
+
+def _seed_dated(conn, rows):
+    """Insert derived transactions (account_id, ts, category, amount) and rebuild their months."""
+    import_id = str(uuid.uuid4())
+    conn.execute("INSERT INTO imports(id, bank, period_month, file_sha256, source_file) VALUES (?, 'BNP', ?, 'sha', 'f.csv')",
+                 [import_id, JULY])
+    ids = []
+    for account_id, ts, category, amount in rows:
+        raw_id, txn_id = str(uuid.uuid4()), str(uuid.uuid4())
+        month = date(ts.year, ts.month, 1)
+        conn.execute("INSERT INTO transactions_raw (id, import_batch_id, bank, ts, month, amount, currency) VALUES (?, ?, ?, ?, ?, ?, 'EUR')",
+                     [raw_id, import_id, account_id, ts, month, amount])
+        conn.execute("""
+            INSERT INTO transactions (id, raw_id, ts, month, account_id, category, amount, currency, import_batch_id)
+            VALUES (?, ?, ?, ?, ?, ?, ?, 'EUR', ?)
+        """, [txn_id, raw_id, ts, month, account_id, category, amount, import_id])
+        ids.append(txn_id)
+    for month in sorted({date(ts.year, ts.month, 1) for _, ts, _, _ in rows}):
+        rebuild_rollup_monthly(month, USER_ID)
+    return ids
+
+class TestRollupDelta:
+    def test_recategorize_moves_contribution(self, conn):
+        ids = _seed(conn, [("BNP", 1, "Food", -10.0), ("BNP", 2, "Food", -5.0), ("BNP", 3, None, 100.0)])
+
+        asyncio.run(update_transaction(ids[0], TransactionUpdateRequest(category="Leisure")))
+        asyncio.run(update_transaction(ids[2], TransactionUpdateRequest(category="Salary", subcategory="Main")))
+
+        assert verify_rollup_monthly(JULY) == []
+        assert conn.execute("SELECT category, subcategory, expense, txn_count FROM rollup_monthly ORDER BY 1").fetchall() == [
+            ("Food", "", 5.0, 1), ("Leisure", "", 10.0, 1), ("Salary", "Main", 0.0, 1),
+        ]
+
+    def test_confirmed_transfers_leave_pl(self, conn):
+        ids = _seed(conn, [("BNP", 1, None, -250.0), ("Revolut", 1, None, 250.0)])
+
+        confirm_transfers(["p0"], [ids])
+
+        assert verify_rollup_monthly(JULY) == []
+        assert conn.execute("SELECT SUM(net), SUM(txn_count) FROM rollup_monthly").fetchone() == (0.0, 2)
+
+    def test_random_edits_match_full_rebuild(self, conn):
+        rng = random.Random(11)
+        categories = [None, "Food", "Rent", "Fun"]
+        ids = _seed(conn, [(rng.choice(["BNP", "Revolut"]), rng.randint(1, 28), rng.choice(categories),
+                            round(rng.uniform(-100, 100), 2)) for _ in range(50)])
+        columns = ['account_id', 'ts', 'category', 'subcategory', 'amount', 'is_transfer']
+
+        for _ in range(200):
+            txn_id = rng.choice(ids)
+            old = dict(zip(columns, conn.execute(f"SELECT {', '.join(columns)} FROM transactions WHERE id = ?", [txn_id]).fetchone()))
+            new = {**old, 'category': rng.choice(categories), 'is_transfer': rng.random() < 0.2}
+            conn.execute("UPDATE transactions SET category = ?, is_transfer = ? WHERE id = ?",
+                         [new['category'], new['is_transfer'], txn_id])
+            apply_rollup_delta(old, new)
+
+        assert verify_rollup_monthly(JULY) == []
+
+    def test_verify_reports_drift(self, conn):
+        _seed(conn, [("BNP", 1, "Food", -10.0)])
+        conn.execute("UPDATE rollup_monthly SET expense = 99")
+        assert [(d['category'], d['expected_expense'], d['actual_expense']) for d in verify_rollup_monthly(JULY)] == [
+            ("Food", 10.0, 99.0),
+        ]
+
+class TestDirtyRollups:
+    def test_summary_read_does_not_rebuild_clean_month(self, conn):
+        _seed(conn, [("BNP", 1, "Food", -10.0)])
+        with patch("services.rollup._rebuild_rollup_cells") as rebuild:
+            response = _summary()
+        rebuild.assert_not_called()
+        assert response.json()["summary"]["expense"] == 10.0
+
+    def test_summary_rebuilds_only_dirty_cells(self, conn):
+        ids = _seed(conn, [("BNP", 1, "Food", -10.0), ("Revolut", 1, "Food", -7.0)])
+        conn.execute("UPDATE transactions SET amount = -30 WHERE id = ?", [ids[0]])
+        conn.execute("UPDATE rollup_monthly SET net = 1 WHERE account_id = 'Revolut'")
+        mark_rollup_dirty([("BNP", JULY)])
+
+        _summary(accounts=["BNP"])
+
+        assert conn.execute("SELECT account_id, net FROM rollup_monthly ORDER BY 1").fetchall() == [
+            ("BNP", -30.0), ("Revolut", 1.0),
+        ]
+        assert refresh_dirty_rollups() == 0
+
+class TestSummaryCache:
+    def test_unchanged_data_revalidates_with_304(self, conn):
+        _seed(conn, [("BNP", 1, "Food", -10.0)])
+        first = _summary()
+        etag = first.headers["ETag"]
+
+        with patch("api.pl.build_pl_summary") as build:
+            again = _summary(headers={"If-None-Match": etag})
+            repeated = _summary()
+        build.assert_not_called()
+        assert again.status_code == 304 and again.headers["ETag"] == etag
+        assert repeated.json() == first.json()
+
+    def test_write_invalidates(self, conn):
+        ids = _seed(conn, [("BNP", 1, "Food", -10.0)])
+        etag = _summary().headers["ETag"]
+
+        asyncio.run(update_transaction(ids[0], TransactionUpdateRequest(category="Leisure")))
+
+        response = _summary(headers={"If-None-Match": etag})
+        assert response.status_code == 200 and response.headers["ETag"] != etag
+        assert [row["category"] for row in response.json()["rows"]] == ["Leisure"]
+
+    def test_account_set_is_order_insensitive(self, conn):
+        _seed(conn, [("BNP", 1, "Food", -10.0), ("Revolut", 1, "Food", -5.0)])
+        etag = _summary(accounts=["BNP", "Revolut"]).headers["ETag"]
+        assert _summary(headers={"If-None-Match": etag}, accounts=["Revolut", "BNP"]).status_code == 304
+        assert _summary(headers={"If-None-Match": etag}, accounts=["BNP"]).status_code == 200
+
+    def test_lru_eviction(self):
+        cache = LRUCache(2)
+        cache.put("a", 1)
+        cache.put("b", 2)
+        cache.get("a")
+        cache.put("c", 3)
+        assert cache.get("b") is None and cache.get("a")[0] == 1 and len(cache) == 2
+
+    def test_etag_matching(self):
+        assert etag_matches('W/"x", "y"', '"y"')
+        assert etag_matches('W/"y"', '"y"')
+        assert etag_matches("*", '"y"')
+        assert not etag_matches(None, '"y"')
+
+def _periods(conn):
+    return conn.execute("""
+        SELECT grain, period_start, period_end, account_id, category, subcategory,
+               round(income, 6), round(expense, 6), round(net, 6), txn_count
+        FROM rollup_period ORDER BY ALL
+    """).fetchall()
+
+class TestRollupPeriods:
+    def test_period_bounds(self):
+        assert period_bounds('week', date(2025, 7, 31)) == (date(2025, 7, 28), date(2025, 8, 3))
+        assert period_bounds('quarter', date(2025, 8, 15)) == (date(2025, 7, 1), date(2025, 9, 30))
+        assert period_bounds('year', date(2025, 8, 15)) == (date(2025, 1, 1), date(2025, 12, 31))
+        assert period_bounds('ttm', date(2025, 2, 10)) == (date(2024, 3, 1), date(2025, 2, 28))
+
+    def test_incremental_tiers_match_full_rebuild(self, conn):
+        rng = random.Random(13)
+        categories = [None, "Food", "Rent", "Fun"]
+        rows = [(rng.choice(["BNP", "Revolut"]), datetime(2024, 1, 1) + timedelta(days=rng.randint(0, 600)),
+                 rng.choice(categories), round(rng.uniform(-100, 100), 2)) for _ in range(120)]
+        ids = _seed_dated(conn, rows[:60])
+        ids += _seed_dated(conn, rows[60:])  # extends the range on both ends
+
+        for txn_id in rng.sample(ids, 30):
+            asyncio.run(update_transaction(txn_id, TransactionUpdateRequest(category=rng.choice(["Food", "Travel"]))))
+        conn.execute("UPDATE transactions SET amount = amount * 2 WHERE account_id = 'BNP'")
+        mark_rollup_dirty(conn.execute("SELECT DISTINCT 'BNP', month FROM rollup_monthly").fetchall())
+        refresh_dirty_rollups()
+
+        incremental = _periods(conn)
+        rebuild_rollup_periods()
+        assert incremental == _periods(conn)
+        assert {row[0] for row in incremental} == {"week", "quarter", "year", "ttm"}
+
+    def test_edit_touches_only_its_period_cells(self, conn):
+        txn_id, _ = _seed_dated(conn, [("BNP", datetime(2025, 3, 5), "Food", -10.0),
+                                       ("BNP", datetime(2025, 6, 5), "Rent", -500.0)])
+        assert conn.execute("SELECT last_end FROM rollup_period_extent").fetchall() == [(date(2025, 6, 30),)]
+
+        stats = QueryStats()
+        with patch.object(query_stats, "query_stats", stats):
+            asyncio.run(update_transaction(txn_id, TransactionUpdateRequest(category="Travel")))
+        statements = [s["statement"] for s in stats.snapshot()]
+        # The Food cells it empties are deleted by key; no statement scans rollup_period
+        assert not any("MAX(period_end)" in s or "WHERE txn_count" in s for s in statements)
+        assert any(s.startswith("DELETE FROM rollup_period WHERE (grain = ?") for s in statements)
+        # Windows past the last month with data are not created
+        assert conn.execute("SELECT MAX(period_end) FROM rollup_period WHERE grain = 'ttm'").fetchone()[0] == date(2025, 6, 30)
+
+        incremental = _periods(conn)
+        rebuild_rollup_periods()
+        assert incremental == _periods(conn)
+
+    def test_year_is_sum_of_months(self, conn):
+        _seed_dated(conn, [("BNP", datetime(2025, 1, 5), "Food", -10.0), ("BNP", datetime(2025, 3, 5), "Food", -5.0),
+                           ("BNP", datetime(2025, 7, 1), "Salary", 100.0), ("BNP", datetime(2024, 12, 31), "Food", -1.0)])
+
+        year = client.post("/api/pl/period", json={"grain": "year", "date": "2025-07"}).json()
+        assert year["summary"]["net"] == 85.0 and year["summary"]["delta_prev"] == 86.0
+        assert [(r["category"], r["net"]) for r in year["rows"]] == [("Food", -15.0), ("Salary", 100.0)]
+
+        ttm = client.post("/api/pl/period", json={"grain": "ttm", "date": "2025-03"}).json()
+        assert ttm["summary"]["period_start"] == "2024-04-01" and ttm["summary"]["net"] == -16.0
+
+        series = client.post("/api/pl/series", json={"grain": "quarter", "start": "2024-10", "end": "2025-09-30"}).json()
+        assert [(p["period_start"], p["net"]) for p in series["periods"]] == [
+            ("2024-10-01", -1.0), ("2025-01-01", -15.0), ("2025-07-01", 100.0),
+        ]
+
+class TestRangeMatrix:
+    def test_matches_monthly_summaries(self, conn):
+        rng = random.Random(17)
+        _seed_dated(conn, [(rng.choice(["BNP", "Revolut"]), datetime(2024, 11, 1) + timedelta(days=rng.randint(0, 240)),
+                            rng.choice([None, "Food", "Rent", "Fun"]), round(rng.uniform(-100, 100), 2))
+                           for _ in range(150)])
+        _seed_dated(conn, [("BNP", datetime(2024, 12, 3), "Gift", 50.0)])  # only before the range
+
+        matrix = client.post("/api/pl/range", json={"start": "2025-01", "end": "2025-06", "accounts": ["BNP"]}).json()
+
+        assert len(matrix["months"]) == 6
+        assert "Gift" not in [row["category"] for row in matrix["rows"]]
+        for i, month in enumerate(matrix["months"]):
+            summary = _summary(month=month[:7], accounts=["BNP"]).json()
+            assert matrix["monthly"][i]["net"] == summary["summary"]["net"]
+            assert matrix["monthly"][i]["delta_mom"] == pytest.approx(summary["summary"]["delta_mom"], abs=0.011)
+            by_category = {row["category"]: row["net"] for row in summary["rows"]}
+            for row in matrix["rows"]:
+                assert row["net_by_month"][i] == by_category.get(row["category"], 0.0)
+        assert matrix["totals"]["net"] == pytest.approx(sum(m["net"] for m in matrix["monthly"]), abs=0.05)
+
+    def test_rebuilt_month_drops_vanished_cells(self, conn):
+        _seed_dated(conn, [("BNP", datetime(2025, 1, 5), "Fun", -20.0), ("BNP", datetime(2025, 1, 6), "Food", -5.0)])
+        conn.execute("UPDATE transactions SET category = 'Food' WHERE category = 'Fun'")
+        mark_rollup_dirty([("BNP", date(2025, 1, 1))])
+
+        matrix = client.post("/api/pl/range", json={"start": "2025-01", "end": "2025-01"}).json()
+
+        # The month is re-aggregated in place: Food is updated and Fun deleted
+        assert [(row["category"], row["net_by_month"]) for row in matrix["rows"]] == [("Food", [-25.0])]
+
+    def test_rejects_inverted_range(self, conn):
+        assert client.post("/api/pl/range", json={"start": "2025-06", "end": "2025-01"}).status_code == 400
@@ -0,0 +1,133 @@
+import json
+import random
+import sys
+import os
+import uuid
+from datetime import datetime, timedelta
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+from services.rule_matcher import AhoCorasick, RuleMatcher
+from services.rules_engine import (
+    apply_rules, categorize_sql, get_rule_matcher, invalidate_rule_cache, _rule_matches, _rule_regex_search
+)
+
+RULES = [
+    # (priority, field, operator, pattern, set_category, set_subcategory, set_is_transfer)
+    (100, "description", "contains", "VIREMENT", "Transfers", None, True),
+    (90, "merchant", "startswith", "carte", "Shopping", "Card", None),
+    (90, "merchant", "equals", "AMAZON MARKETPLACE", "Shopping", "Online", False),
+    (80, "description", "regex", r"\d{6}", "Income", "", None),
+    (70, "merchant", "regex", r"uber(?!\s*eats)", "Transport", "Taxi", None),
+    (60, "description", "regex", r"prlv (edf|engie)", "Utilities", None, None),
+    (50, "description", "regex", "([unclosed", "Broken", None, None),
+    (40, "merchant", "contains", "o'neill", "Shopping", "Clothes", None),
+    (30, "description", "contains", "café", "Food", "Coffee", None),
+    (20, "merchant", "contains", "", None, "Misc", None),
+]
+
+DESCRIPTIONS = [
+    "CARTE CAFE DU COIN", "VIREMENT SALAIRE REF 123456", "PRLV SEPA EDF", "prlv engie",
+    "AMAZON MARKETPLACE", "UBER   TRIP", "UBER EATS", "O'NEILL STORE", "Café de Flore",
+    "", "  spaced  ", "ACHAT 42",
+]
+
+def _rules():
+    rules = []
+    for priority, field, operator, pattern, category, subcategory, is_transfer in RULES:
+        rules.append({
+            'id': str(uuid.uuid4()), 'active': True, 'priority': priority, 'field': field,
+            'operator': operator, 'pattern': pattern, 'set_category': category,
+            'set_subcategory': subcategory, 'set_is_transfer': is_transfer,
+        })
+    return rules
+
+def _corpus(n=400):
+    rng = random.Random(7)
+    rows = []
+    for i in range(n):
+        bank = rng.choice(["BNP", "Boursorama", "Revolut"])
+        description = rng.choice(DESCRIPTIONS)
+        extra = {'balance': rng.choice([None, 1234.5])}
+        if bank == "Boursorama":
+            extra['category_parent'] = rng.choice(["", "  ", "Maison", " Loisirs "])
+            extra['category'] = rng.choice(["", "Courses", " Sorties"])
+        rows.append({
+            'id': str(uuid.uuid4()), 'import_batch_id': str(uuid.uuid4()), 'bank': bank,
+            'ts': datetime(2025, 7, 1) + timedelta(hours=i), 'description': description,
+            'merchant': rng.choice([description.upper(), "", None]), 'amount_raw': "1",
+            'amount': round(rng.uniform(-500, 500), 2), 'currency': "EUR",
+            'account_label': "Compte", 'extra': json.dumps(extra),
+        })
+    return rows
+
+def _load_raw(conn, rows):
+    columns = ['id', 'import_batch_id', 'bank', 'ts', 'description', 'merchant',
+               'amount_raw', 'amount', 'currency', 'account_label', 'extra']
+    conn.execute("CREATE TEMP TABLE raw_corpus (id TEXT, import_batch_id TEXT, bank TEXT, ts TIMESTAMP, "
+                 "description TEXT, merchant TEXT, amount_raw TEXT, amount DOUBLE, currency TEXT, "
+                 "account_label TEXT, extra TEXT)")
+    conn.executemany(f"INSERT INTO raw_corpus VALUES ({', '.join('?' for _ in columns)})",
+                     [[row[c] for c in columns] for row in rows])
+    return "SELECT * FROM raw_corpus"
+
+def _run_sql(conn, raw_sql, rules):
+    cursor = conn.execute(categorize_sql(raw_sql, rules=rules, conn=conn))
+    columns = [d[0] for d in cursor.description]
+    return {row[0]: dict(zip(columns, row)) for row in cursor.fetchall()}
+
+class TestCategorizeSql:
+    def test_matches_apply_rules(self, conn):
+        rows = _corpus()
+        rules = _rules()
+        expected = apply_rules(rows, rules=rules)
+        actual = _run_sql(conn, _load_raw(conn, rows), rules)
+
+        assert len(actual) == len(expected)
+        for derived in expected:
+            assert actual[derived['raw_id']] == derived
+
+    def test_first_match_by_priority(self, conn):
+        rows = [r for r in _corpus() if r['bank'] == "BNP" and r['description'] == "VIREMENT SALAIRE REF 123456"]
+        actual = _run_sql(conn, _load_raw(conn, rows), _rules())
+        # contains VIREMENT (priority 100) wins over the \d{6} regex (priority 80)
+        assert {(d['category'], d['is_transfer']) for d in actual.values()} == {("Transfers", True)}
+
+    def test_no_rules(self, conn):
+        rows = _corpus(50)
+        expected = apply_rules(rows, rules=[])
+        actual = _run_sql(conn, _load_raw(conn, rows), [])
+        for derived in expected:
+            assert actual[derived['raw_id']] == derived
+
+    def test_python_regex_skips_null_fields(self):
+        # DuckDB 1.0 hands NULLs to the Python fallback
+        assert _rule_regex_search(None, r"(?<!pre)salaire") is False
+        assert _rule_regex_search("salaire juillet", r"(?<!pre)salaire") is True
+
+class TestRuleMatcher:
+    def test_matcher_matches_linear_scan(self):
+        rules = _rules()
+        matcher = RuleMatcher(rules)
+        for row in _corpus():
+            derived = {'merchant': row['merchant'], 'description': row['description']}
+            expected = next((r for r in rules if _rule_matches(r, derived)), None)
+            assert matcher.match(derived) is expected
+
+    def test_aho_corasick_overlapping_patterns(self):
+        automaton = AhoCorasick([("he", 0), ("she", 1), ("hers", 2), ("his", 3)])
+        assert automaton.search("ushers") == {0, 1, 2}
+        assert automaton.search("xyz") == set()
+
+    def test_cached_until_rules_change(self, conn):
+        matcher = get_rule_matcher()
+        assert get_rule_matcher() is matcher
+
+        conn.execute("""
+            INSERT INTO category_rules (id, active, priority, field, operator, pattern, set_category)
+            VALUES (uuid(), TRUE, 10, 'merchant', 'contains', 'edf', 'Utilities')
+        """)
+        assert get_rule_matcher() is matcher
+
+        invalidate_rule_cache()
+        assert get_rule_matcher().match({'merchant': 'PRLV EDF'})['set_category'] == "Utilities"
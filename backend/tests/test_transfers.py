@@ -0,0 +1,227 @@
+import random
+import sys
+import os
+import uuid
+from datetime import date, datetime, timedelta
+from unittest.mock import patch
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+from db import query_stats
+from db.query_stats import QueryStats
+from services.rollup import get_rollup_summary, rebuild_rollup_monthly, rebuild_rollup_periods, verify_rollup_monthly
+from services.transfers import confirm_transfers, find_transfer_candidates, get_potential_transfers, propose_transfers
+
+JAN = date(2025, 1, 1)
+
+def _seed(conn, rows):
+    """Insert derived transactions (account_id, day, amount[, description[, currency]]); returns their ids."""
+    import_id = str(uuid.uuid4())
+    conn.execute("INSERT INTO imports(id, bank, period_month, file_sha256, source_file) VALUES (?, 'BNP', ?, 'sha', 'f.csv')",
+                 [import_id, JAN])
+    ids = []
+    for account_id, day, amount, *extra in rows:
+        description, currency = (extra + ["PAYMENT", "EUR"][len(extra):])[:2]
+        raw_id, txn_id = str(uuid.uuid4()), str(uuid.uuid4())
+        ts = datetime.combine(day, datetime.min.time())
+        conn.execute("INSERT INTO transactions_raw (id, import_batch_id, bank, ts, month, amount, currency) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                     [raw_id, import_id, account_id, ts, day.replace(day=1), amount, currency])
+        conn.execute("""
+            INSERT INTO transactions (id, raw_id, ts, month, account_id, description, amount, currency, import_batch_id)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, [txn_id, raw_id, ts, day.replace(day=1), account_id, description, amount, currency, import_id])
+        ids.append(txn_id)
+    return ids
+
+def _pairs(proposals):
+    return {tuple(p["transaction_ids"]) for p in proposals}
+
+class TestTransferMatcher:
+    def test_pairs_across_month_edge(self, conn):
+        out, inn = _seed(conn, [("BNP", date(2025, 1, 31), -250.0), ("Revolut", date(2025, 2, 1), 250.0)])
+
+        for month in (JAN, date(2025, 2, 1)):
+            proposals = propose_transfers(month)
+            assert _pairs(proposals) == {(out, inn)}
+        assert proposals[0]["from_account"] == "BNP" and proposals[0]["to_account"] == "Revolut"
+        assert proposals[0]["date_difference_days"] == 1
+        # Neither leg in range: not proposed
+        assert propose_transfers(date(2025, 3, 1)) == []
+
+    def test_window(self, conn):
+        _seed(conn, [("BNP", date(2025, 1, 10), -40.0), ("Revolut", date(2025, 1, 13), 40.0)])
+        assert propose_transfers(JAN) == []
+        assert len(propose_transfers(JAN, window_days=3)) == 1
+
+    def test_one_to_one(self, conn):
+        out1, out2, in1, in2 = _seed(conn, [
+            ("BNP", date(2025, 1, 10), -100.0),
+            ("BNP", date(2025, 1, 11), -100.0, "VIR SEPA vers Revolut"),
+            ("Revolut", date(2025, 1, 11), 100.0),
+            ("Boursorama", date(2025, 1, 12), 100.0),
+        ])
+        candidates = find_transfer_candidates(JAN, date(2025, 1, 31), window_days=2)
+        assert len(candidates) == 4
+        proposals = propose_transfers(JAN, window_days=2)
+        # Same day + transfer keyword wins first, the leftover legs pair up next
+        assert [p["transaction_ids"] for p in proposals] == [[out2, in1], [out1, in2]]
+        assert proposals[0]["confidence"] > proposals[1]["confidence"]
+
+    def test_ignores_same_account_and_marked_transfers(self, conn):
+        out, inn, other = _seed(conn, [("BNP", date(2025, 1, 5), -20.0), ("BNP", date(2025, 1, 5), 20.0),
+                                       ("Revolut", date(2025, 1, 5), 20.0)])
+        assert _pairs(propose_transfers(JAN)) == {(out, other)}
+        conn.execute("UPDATE transactions SET is_transfer = TRUE WHERE id = ?", [other])
+        assert propose_transfers(JAN) == []
+
+    def test_matches_brute_force(self, conn):
+        rng = random.Random(7)
+        accounts = ["BNP", "Revolut", "Boursorama"]
+        rows = [(rng.choice(accounts), JAN + timedelta(days=rng.randrange(90)),
+                 rng.choice([-1, 1]) * rng.choice([10.0, 20.0, 25.5, 100.0])) for _ in range(300)]
+        ids = _seed(conn, rows)
+        start, end, window = date(2025, 2, 1), date(2025, 2, 28), 2
+
+        expected = set()
+        for i, (acct1, d1, amt1) in enumerate(rows):
+            for j, (acct2, d2, amt2) in enumerate(rows):
+                if (amt1 < 0 < amt2 and -amt1 == amt2 and acct1 != acct2 and abs((d2 - d1).days) <= window
+                        and (start <= d1 <= end or start <= d2 <= end)):
+                    expected.add((ids[i], ids[j]))
+
+        candidates = find_transfer_candidates(start, end, window_days=window)
+        assert {(c["id1"], c["id2"]) for c in candidates} == expected
+
+        proposals = propose_transfers(start=start, end=end, window_days=window, limit=None)
+        used = [txn_id for p in proposals for txn_id in p["transaction_ids"]]
+        assert len(used) == len(set(used))
+        assert _pairs(proposals) <= expected
+
+class TestCrossCurrency:
+    def test_converted_amounts_within_tolerance(self, conn):
+        conn.execute("INSERT INTO fx_rates VALUES (?, 'GBP', 'EUR', 1.18), (?, 'EUR', 'USD', 1.1)", [JAN, JAN])
+        eur_gbp, gbp, usd_out, usd, eur_in, _, _ = _seed(conn, [
+            ("BNP", date(2025, 1, 10), -120.0, "VIR Revolut"),
+            ("Revolut", date(2025, 1, 10), 100.0, "Top-up", "GBP"),    # 118 EUR: within 2%
+            ("BNP", date(2025, 1, 12), -100.0),
+            ("Wise", date(2025, 1, 12), 110.0, "PAYMENT", "USD"),       # rate stored EUR -> USD
+            ("Revolut", date(2025, 1, 15), 50.0, "PAYMENT", "GBP"),     # 59 EUR: too far from 50
+            ("BNP", date(2025, 1, 15), -50.0),
+            ("Wise", date(2025, 1, 20), 30.0, "PAYMENT", "CHF"),        # no rate
+        ])
+        candidates = find_transfer_candidates(JAN, date(2025, 1, 31))
+        assert {(c["id1"], c["id2"]) for c in candidates} == {(eur_gbp, gbp), (usd_out, usd)}
+        assert find_transfer_candidates(JAN, date(2025, 1, 31), fx_tolerance=0.01)[0]["id2"] == usd
+        assert find_transfer_candidates(JAN, date(2025, 1, 31), fx_tolerance=0) == []
+
+        proposal = propose_transfers(JAN)[0]
+        assert proposal["transaction_ids"] == [eur_gbp, gbp]
+        assert proposal["amount"] == 120.0 and proposal["to_amount"] == 100.0
+        assert proposal["currencies"] == ["EUR", "GBP"]
+
+    def test_same_number_in_other_currency_is_no_match(self, conn):
+        _seed(conn, [("BNP", date(2025, 1, 5), -20.0), ("Revolut", date(2025, 1, 5), 20.0, "PAYMENT", "GBP")])
+        assert propose_transfers(JAN) == []
+
+    def test_matches_brute_force(self, conn):
+        rates = {"EUR": 1.0, "GBP": 1.17, "USD": 0.93}
+        conn.execute("INSERT INTO fx_rates VALUES (?, 'GBP', 'EUR', 1.17), (?, 'USD', 'EUR', 0.93)", [JAN, JAN])
+        rng = random.Random(11)
+        rows = [(rng.choice(["BNP", "Revolut", "Wise"]), JAN + timedelta(days=rng.randrange(31)),
+                 rng.choice([-1, 1]) * round(rng.uniform(10, 14), 2), "PAYMENT", rng.choice(list(rates)))
+                for _ in range(400)]
+        ids = _seed(conn, rows)
+        tolerance, window = 0.03, 1
+
+        expected = set()
+        for i, (acct1, d1, amt1, _, ccy1) in enumerate(rows):
+            for j, (acct2, d2, amt2, _, ccy2) in enumerate(rows):
+                if not (amt1 < 0 < amt2 and acct1 != acct2 and abs((d2 - d1).days) <= window):
+                    continue
+                eur1, eur2 = -amt1 * rates[ccy1], amt2 * rates[ccy2]
+                if (ccy1 == ccy2 and -amt1 == amt2) or (
+                        ccy1 != ccy2 and abs(eur1 - eur2) <= tolerance * max(eur1, eur2)):
+                    expected.add((ids[i], ids[j]))
+
+        candidates = find_transfer_candidates(JAN, date(2025, 1, 31), window_days=window, fx_tolerance=tolerance)
+        assert len(expected) > 100
+        assert {(c["id1"], c["id2"]) for c in candidates} == expected
+
+class TestScoring:
+    def test_description_similarity(self, conn):
+        out1, in1, out2, in2 = _seed(conn, [
+            ("BNP", date(2025, 1, 10), -80.0, "Epargne LIVRET Épargne 10/01"),
+            ("Boursorama", date(2025, 1, 11), 80.0, "epargne livret"),
+            ("BNP", date(2025, 1, 20), -80.0, "CARTE AMAZON"),
+            ("Boursorama", date(2025, 1, 21), 80.0, "RETRAIT DAB"),
+        ])
+        by_pair = {(c["id1"], c["id2"]): c for c in find_transfer_candidates(JAN, date(2025, 1, 31))}
+        assert by_pair[(out1, in1)]["similarity"] == 1.0
+        assert by_pair[(out2, in2)]["similarity"] == 0.0
+        assert by_pair[(out1, in1)]["confidence"] > by_pair[(out2, in2)]["confidence"]
+
+    def test_account_pair_prior(self, conn):
+        out, inn = _seed(conn, [("BNP", date(2025, 1, 3), -60.0), ("Revolut", date(2025, 1, 3), 60.0)])
+        confirm_transfers([], [[out, inn]])
+        assert conn.execute("SELECT COUNT(DISTINCT transfer_pair_id) FROM txn_overrides").fetchone()[0] == 1
+
+        out, revolut, _ = _seed(conn, [("BNP", date(2025, 1, 20), -75.0), ("Revolut", date(2025, 1, 20), 75.0),
+                                       ("Boursorama", date(2025, 1, 20), 75.0)])
+        candidates = {c["to_acct"]: c for c in find_transfer_candidates(JAN, date(2025, 1, 31))}
+        assert candidates["Revolut"]["confirmed_pairs"] == 1 and candidates["Boursorama"]["confirmed_pairs"] == 0
+        assert candidates["Revolut"]["confidence"] > candidates["Boursorama"]["confidence"]
+        # The account pair transfers were confirmed for before wins the tie
+        assert propose_transfers(JAN)[0]["transaction_ids"] == [out, revolut]
+
+    def test_potential_transfers_ranked_by_confidence(self, conn):
+        target, plain, similar = _seed(conn, [("BNP", date(2025, 1, 10), -30.0, "VIR vers Revolut"),
+                                              ("Boursorama", date(2025, 1, 10), 30.0, "DEPOT"),
+                                              ("Revolut", date(2025, 1, 11), 30.0, "Top-up from BNP vers Revolut")])
+        matches = get_potential_transfers(target)
+        assert [str(m["id"]) for m in matches] == [plain, similar]
+        assert [m["date_diff"] for m in matches] == [0, 1]
+        assert matches[0]["confidence"] > matches[1]["confidence"]
+        assert [str(m["id"]) for m in get_potential_transfers(similar)] == [target]
+
+class TestConfirmTransfers:
+    def test_bulk_confirm_refreshes_rollups(self, conn):
+        rows = []
+        for i in range(200):
+            day = date(2025, 1, 1 + i % 28)
+            rows += [("BNP", day, -(10.0 + i)), ("Revolut", day, 10.0 + i)]
+        rows.append(("BNP", date(2025, 1, 15), -42.0))
+        _seed(conn, rows)
+        rebuild_rollup_monthly(JAN, None)
+        pairs = [proposal["transaction_ids"] for proposal in propose_transfers(JAN, limit=None)]
+        assert len(pairs) == 200
+
+        stats = QueryStats()
+        with patch.object(query_stats, "query_stats", stats):
+            result = confirm_transfers([], pairs)
+
+        # One statement each for the overrides and the flags, whatever the pair count
+        counts = {s["statement"]: s["count"] for s in stats.snapshot()}
+        for prefix in ("INSERT INTO txn_overrides", "UPDATE transactions"):
+            assert [count for statement, count in counts.items() if statement.startswith(prefix)] == [1]
+        assert result == {"confirmed_transactions": 400, "confirmed_pairs": 200}
+        assert conn.execute("SELECT COUNT(*) FROM txn_overrides WHERE set_is_transfer").fetchone()[0] == 400
+        assert verify_rollup_monthly(JAN) == []
+        assert get_rollup_summary(JAN)["net"] == -42.0
+        assert conn.execute("SELECT COUNT(*) FROM rollup_dirty").fetchone()[0] == 0
+        # The refresh replaced the period cells in place, as a full rebuild would
+        periods = ("SELECT * REPLACE (round(income, 6) AS income, round(expense, 6) AS expense, round(net, 6) AS net) "
+                   "FROM rollup_period ORDER BY ALL")
+        refreshed = conn.execute(periods).fetchall()
+        rebuild_rollup_periods()
+        assert conn.execute(periods).fetchall() == refreshed
+
+    def test_all_or_nothing(self, conn):
+        out, inn, out2, in2 = _seed(conn, [("BNP", date(2025, 1, 5), -20.0), ("Revolut", date(2025, 1, 5), 20.0),
+                                           ("BNP", date(2025, 1, 6), -30.0), ("Revolut", date(2025, 1, 6), 30.0)])
+        with pytest.raises(ValueError, match="not found"):
+            confirm_transfers([], [[out, inn], [out2, str(uuid.uuid4())]])
+        with pytest.raises(ValueError, match="more than one pair"):
+            confirm_transfers([], [[out, inn], [out, in2]])
+        assert conn.execute("SELECT COUNT(*) FROM txn_overrides").fetchone()[0] == 0
+        assert conn.execute("SELECT COUNT(*) FROM transactions WHERE is_transfer").fetchone()[0] == 0
@@ -9,6 +9,12 @@ import {
   ImportCommitResponse,
   PLSummaryRequest,
   PLSummaryResponse,
+  PLPeriodRequest,
+  PLPeriodResponse,
+  PLSeriesRequest,
+  PLSeriesResponse,
+  PLRangeRequest,
+  PLRangeResponse,
   TransactionListRequest,
   TransactionListResponse
 } from '@/types/api.types';
@@ -17,6 +23,8 @@ const API_URL = process.env.NEXT_PUBLIC_API_URL || 'http://localhost:8000';
 
 class APIClient {
   private baseURL: string;
+  // Last response and ETag per revalidated request, reused on 304 Not Modified
+  private etagCache = new Map<string, { etag: string; data: unknown }>();
   
   constructor() {
     this.baseURL = API_URL;
@@ -36,6 +44,7 @@ class APIClient {
   }
   
   public clearToken(): void {
+    this.etagCache.clear();
     if (typeof window !== 'undefined') {
       localStorage.removeItem('token');
     }
@@ -43,7 +52,8 @@ class APIClient {
   
   private async request<T>(
     endpoint: string,
-    options: RequestInit = {}
+    options: RequestInit = {},
+    revalidate = false
   ): Promise<T> {
     const token = this.getToken();
     
@@ -51,6 +61,12 @@ class APIClient {
       ...options.headers,
     };
     
+    const cacheKey = `${endpoint}:${options.body ?? ''}`;
+    const cached = revalidate ? this.etagCache.get(cacheKey) : undefined;
+    if (cached) {
+      headers['If-None-Match'] = cached.etag;
+    }
+    
     // Always add Authorization header if token exists, except for login/register
     const isPublicEndpoint = endpoint === '/api/auth/login' || endpoint === '/api/auth/register';
     if (token && !isPublicEndpoint) {
@@ -76,6 +92,10 @@ class APIClient {
       headers,
     });
     
+    if (cached && response.status === 304) {
+      return cached.data as T;
+    }
+    
     if (!response.ok) {
       if (response.status === 401) {
         this.clearToken();
@@ -108,7 +128,12 @@ class APIClient {
       throw new Error(errorMessage);
     }
     
-    return response.json();
+    const data = await response.json();
+    const etag = revalidate ? response.headers.get('ETag') : null;
+    if (etag) {
+      this.etagCache.set(cacheKey, { etag, data });
+    }
+    return data;
   }
   
   // Authentication methods
@@ -184,7 +209,28 @@ class APIClient {
     return this.request<PLSummaryResponse>('/api/pl/summary', {
       method: 'POST',
       body: JSON.stringify(params),
-    });
+    }, true);
+  }
+  
+  async getPLPeriod(params: PLPeriodRequest): Promise<PLPeriodResponse> {
+    return this.request<PLPeriodResponse>('/api/pl/period', {
+      method: 'POST',
+      body: JSON.stringify(params),
+    }, true);
+  }
+  
+  async getPLRange(params: PLRangeRequest): Promise<PLRangeResponse> {
+    return this.request<PLRangeResponse>('/api/pl/range', {
+      method: 'POST',
+      body: JSON.stringify(params),
+    }, true);
+  }
+  
+  async getPLSeries(params: PLSeriesRequest): Promise<PLSeriesResponse> {
+    return this.request<PLSeriesResponse>('/api/pl/series', {
+      method: 'POST',
+      body: JSON.stringify(params),
+    }, true);
   }
   
   // Transaction methods
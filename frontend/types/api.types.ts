@@ -38,8 +38,10 @@ export interface UploadResponse {
 
 // Import commit types
 export interface ImportCommitRequest {
-  period_month: string;
+  period_month?: string;
   accounts?: string[];
+  import_batch_ids?: string[];
+  detect_transfers?: boolean;
 }
 
 export interface ImportCommitResponse {
@@ -49,6 +51,7 @@ export interface ImportCommitResponse {
   rules_applied: number;
   rollup_updated: boolean;
   uncategorized_count: number;
+  transfers_confirmed?: number;
 }
 
 // P&L types
@@ -88,6 +91,104 @@ export interface PLSummaryResponse {
   };
 }
 
+export type PLGrain = 'week' | 'quarter' | 'year' | 'ttm';
+
+export interface PLPeriodRequest {
+  grain: PLGrain;
+  date: string;  // YYYY-MM-DD or YYYY-MM inside the period (ttm: its last month)
+  accounts?: string[];
+  currency_view?: 'native' | 'eur';
+}
+
+export interface PLPeriodSummary {
+  grain: PLGrain;
+  period_start: string;
+  period_end: string;
+  income: number;
+  expense: number;
+  net: number;
+  delta_prev: number;
+  savings_rate: number;
+}
+
+export interface PLPeriodResponse {
+  summary: PLPeriodSummary;
+  rows: CategoryRow[];
+  filters: {
+    grain: PLGrain;
+    period_start: string;
+    accounts: string[];
+  };
+}
+
+export interface PLRangeRequest {
+  start: string;  // YYYY-MM
+  end: string;    // YYYY-MM
+  accounts?: string[];
+  currency_view?: 'native' | 'eur';
+}
+
+export interface PLRangeTotals {
+  income: number;
+  expense: number;
+  net: number;
+  txn_count: number;
+  savings_rate: number;
+}
+
+// net_by_month / delta_mom are aligned with PLRangeResponse.months
+export interface PLRangeSubRow extends PLRangeTotals {
+  name: string;
+  net_by_month: number[];
+  delta_mom: number[];
+}
+
+export interface PLRangeRow extends PLRangeTotals {
+  category: string;
+  net_by_month: number[];
+  delta_mom: number[];
+  subs: PLRangeSubRow[];
+}
+
+export interface PLRangeResponse {
+  months: string[];
+  totals: PLRangeTotals;
+  monthly: (PLRangeTotals & { month: string; delta_mom: number })[];
+  rows: PLRangeRow[];
+  filters: {
+    start: string;
+    end: string;
+    accounts: string[];
+  };
+}
+
+export interface PLSeriesRequest {
+  grain: PLGrain | 'month';
+  start: string;
+  end: string;
+  accounts?: string[];
+  currency_view?: 'native' | 'eur';
+}
+
+export interface PLSeriesPoint {
+  period_start: string;
+  period_end: string;
+  income: number;
+  expense: number;
+  net: number;
+  txn_count: number;
+}
+
+export interface PLSeriesResponse {
+  periods: PLSeriesPoint[];
+  filters: {
+    grain: PLGrain | 'month';
+    start: string;
+    end: string;
+    accounts: string[];
+  };
+}
+
 // Transaction types
 export interface TransactionListRequest {
   month?: string;